@@ -0,0 +1,73 @@
+from django.conf import settings
+from django.core.cache import InvalidCacheBackendError , caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+from .models import User
+
+DEFAULT_TIMEOUT = 60
+
+
+def user_cache():
+    # the 'users' alias when configured (see CACHES), else the default cache
+    try:
+        return caches[getattr(settings, 'USER_CACHE_ALIAS', 'users')]
+    except InvalidCacheBackendError:
+        return caches['default']
+
+
+def user_key(user_id):
+    return f'accounts:user:{user_id}'
+
+
+def cache_timeout():
+    return getattr(settings, 'USER_CACHE_TIMEOUT', DEFAULT_TIMEOUT)
+
+
+def cached_user(user_id):
+    # the user behind a token's id claim, None if there is none; misses are not cached
+    key = user_key(user_id)
+    user = user_cache().get(key)
+    if user is None:
+        user = User.objects.filter(**{api_settings.USER_ID_FIELD: user_id}).first()
+        if user is not None:
+            user_cache().set(key, user, cache_timeout())
+    return user
+
+
+async def acached_user(user_id):
+    key = user_key(user_id)
+    user = await user_cache().aget(key)
+    if user is None:
+        user = await User.objects.filter(**{api_settings.USER_ID_FIELD: user_id}).afirst()
+        if user is not None:
+            await user_cache().aset(key, user, cache_timeout())
+    return user
+
+
+def forget_user(user_id):
+    # called on every user save / delete (see accounts.signals); queryset.update() calls
+    # that change is_active or the password must call it themselves
+    user_cache().delete(user_key(user_id))
+
+
+# JWTAuthentication with the per-request user lookup served from the user cache;
+# the inactive-user and revoked-token checks still run on every request
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return super().get_user(validated_token)  # raises InvalidToken
+
+        user = cached_user(user_id)
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN and (
+            validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password)
+        ):
+            raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+        return user
@@ -0,0 +1,11 @@
+from django.db.models.signals import post_delete , post_save
+from django.dispatch import receiver
+from .authentication import forget_user
+from .models import User
+
+
+# cached users must never outlive a profile update or a deactivation
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def drop_cached_user(sender, instance, **kwargs):
+    forget_user(instance.pk)
@@ -1,3 +1,34 @@
 from django.test import TestCase
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from .authentication import user_cache , user_key
+from .models import User
 
-# Create your tests here.
+
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        user_cache().clear()
+        self.user = User.objects.create_user(email='analyst@example.com', password='pass', first_name='A', last_name='B')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+
+    def test_user_is_loaded_once(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get('/api/v1/profile/').status_code, 200)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/v1/profile/').data['email'], 'analyst@example.com')
+
+    def test_profile_update_drops_the_cached_user(self):
+        self.client.get('/api/v1/profile/')
+        response = self.client.put('/api/v1/profile/update', {'first_name': 'New', 'last_name': 'Name', 'company_name': 'Co'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(user_cache().get(user_key(self.user.pk)))
+        self.assertEqual(self.client.get('/api/v1/profile/').data['first_name'], 'New')
+
+    def test_deactivated_user_is_rejected_immediately(self):
+        self.assertEqual(self.client.get('/api/v1/profile/').status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/v1/profile/').status_code, 401)
+        self.user.delete()
+        self.assertEqual(self.client.get('/api/v1/profile/').status_code, 401)
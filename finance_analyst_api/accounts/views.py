@@ -4,6 +4,7 @@ from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
 from .serializers import RegisterSerializer, LoginSerializer, UserSerializer , UpdateUserSerializer
 from rest_framework.views import APIView
+from .models import User
 
 # user register view
 class RegisterView(generics.CreateAPIView):
@@ -48,7 +49,10 @@ class UpdateUserView(generics.UpdateAPIView):
     serializer_class = UpdateUserSerializer
     permission_classes = [permissions.IsAuthenticated]
     def put(self, request, *args, **kwargs):
-        serializer = UpdateUserSerializer(request.user, data=request.data)
+        # request.user may come from the user cache; save over a fresh row so no stale
+        # field is written back (the save drops the cache entry, see accounts.signals)
+        user = User.objects.get(pk=request.user.pk)
+        serializer = UpdateUserSerializer(user, data=request.data)
         if serializer.is_valid():
             serializer.save()
             return Response(serializer.data, status=status.HTTP_200_OK)
@@ -58,6 +58,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    'forecasting.instrumentation.InstrumentationMiddleware',  # inactive unless FORECASTING_INSTRUMENTATION
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -95,6 +96,33 @@ DATABASES = {
     'default': env.db('DATABASE_URL'),
 }
 
+# Caches
+# 'forecasting' holds serialized API responses keyed on model revisions. It is a
+# local-memory LRU per process by default; point FORECASTING_CACHE_URL at redis or
+# memcached to share it between workers.
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+    'forecasting': env.cache('FORECASTING_CACHE_URL', default='locmemcache://forecasting?max_entries=5000'),
+    # users resolved from JWTs (accounts.authentication); entries are dropped on every user
+    # save, and USER_CACHE_TIMEOUT bounds how long another process may serve a stale one
+    # unless USER_CACHE_URL points at a shared cache
+    'users': env.cache('USER_CACHE_URL', default='locmemcache://users?max_entries=10000'),
+}
+USER_CACHE_TIMEOUT = env.int('USER_CACHE_TIMEOUT', default=60)
+FORECASTING_CACHE_TIMEOUT = env.int('FORECASTING_CACHE_TIMEOUT', default=60 * 60)
+
+# columnar line item snapshots (forecasting.columnar), one directory per model revision and
+# model version; point it at local disk, the files are memory-mapped by every worker
+FORECASTING_SNAPSHOT_DIR = env.str('FORECASTING_SNAPSHOT_DIR', default=str(BASE_DIR / 'snapshots'))
+
+# opt-in request instrumentation: Server-Timing headers, per-endpoint percentiles over the
+# last FORECASTING_INSTRUMENTATION_WINDOW requests at /api/v1/instrumentation/stats/ (for the
+# emails in FORECASTING_STATS_USERS) and a warning for every query slower than the threshold
+FORECASTING_INSTRUMENTATION = env.bool('FORECASTING_INSTRUMENTATION', default=False)
+FORECASTING_INSTRUMENTATION_WINDOW = env.int('FORECASTING_INSTRUMENTATION_WINDOW', default=1000)
+FORECASTING_SLOW_QUERY_MS = env.float('FORECASTING_SLOW_QUERY_MS', default=200)
+FORECASTING_STATS_USERS = env.list('FORECASTING_STATS_USERS', default=[])
+
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",  # frontend dev server
     "https://your-frontend-domain.com",
@@ -131,7 +159,7 @@ AUTH_PASSWORD_VALIDATORS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.CachedJWTAuthentication',
     ],
      'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -0,0 +1,138 @@
+from functools import wraps
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.urls import remove_query_param , replace_query_param
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from accounts.authentication import acached_user
+from .engine import ScenarioMatrix
+from .models import FinancialModel , LineItem , Scenario
+from .pagination import MAX_PAGE_SIZE
+from .serializers import FinanceModelSerializer , ScenarioModelSerializer , LineItemModelSerializer , LineItemFlatSerializer
+from .views import id_params
+
+# Async twins of the hot read endpoints (list + summary) under /api/v1/async/.
+# DRF views are synchronous, so these are plain Django async views: under ASGI each
+# request awaits its queries on the event loop instead of holding a worker thread.
+# Responses have the same shape as the DRF endpoints; the response cache is not used.
+
+
+def json_response(data, status=200):
+    return HttpResponse(JSONRenderer().render(data), status=status, content_type='application/json')
+
+
+async def authenticate(request):
+    # the JWT checks are CPU only; the user comes from the user cache (one query on a miss)
+    authenticator = JWTAuthentication()
+    header = authenticator.get_header(request)
+    if header is None:
+        return None
+    try:
+        # a malformed header ('Bearer', 'Bearer a b') fails like an invalid token
+        raw_token = authenticator.get_raw_token(header)
+        if raw_token is None:
+            return None
+        token = authenticator.get_validated_token(raw_token)
+    except AuthenticationFailed:
+        return None
+    user_id = token.get(jwt_settings.USER_ID_CLAIM)
+    if user_id is None:
+        return None
+    user = await acached_user(user_id)
+    return user if user is not None and user.is_active else None
+
+
+def async_read_view(view):
+    # GET only, authenticated like the DRF views (401 without a valid access token);
+    # a ValidationError from parsing the query string is a 400
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method != 'GET':
+            return json_response({"detail": f'Method "{request.method}" not allowed.'}, status=405)
+        request.user = await authenticate(request)
+        if request.user is None:
+            return json_response({"detail": "Authentication credentials were not provided."}, status=401)
+        try:
+            return await view(request, *args, **kwargs)
+        except ValidationError as error:
+            return json_response(error.detail, status=400)
+    return wrapper
+
+
+def page_link(request, number):
+    url = request.build_absolute_uri()
+    if number == 1:
+        return remove_query_param(url, 'page')
+    return replace_query_param(url, 'page', number)
+
+
+async def paginate(request, queryset, serializer_class):
+    # ForecastingPagination's page-number mode: ?page, ?page_size (capped), ?count=false
+    try:
+        page_size = min(max(1, int(request.GET.get('page_size', settings.REST_FRAMEWORK['PAGE_SIZE']))), MAX_PAGE_SIZE)
+    except ValueError:
+        page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+    try:
+        number = max(1, int(request.GET.get('page', 1)))
+    except ValueError:
+        number = 1
+    offset = (number - 1) * page_size
+
+    # one extra row tells whether there is a next page
+    rows = [row async for row in queryset[offset:offset + page_size + 1]]
+    has_next = len(rows) > page_size
+    data = {
+        'next': page_link(request, number + 1) if has_next else None,
+        'previous': page_link(request, number - 1) if number > 1 else None,
+        'results': serializer_class(rows[:page_size], many=True).data,
+    }
+    if request.GET.get('count', '').lower() in ('0', 'false', 'no'):
+        return json_response(data)
+    if not rows and number > 1:
+        return json_response({"detail": "Invalid page."}, status=404)
+    return json_response({'count': await queryset.acount(), **data})
+
+
+@async_read_view
+async def finance_model_list(request):
+    queryset = FinancialModel.objects.owned_by(request.user).order_by('id')
+    return await paginate(request, queryset, FinanceModelSerializer)
+
+
+@async_read_view
+async def finance_model_summary(request, pk):
+    model = await FinancialModel.objects.owned_by(request.user).filter(pk=pk).afirst()
+    if model is None:
+        return json_response({"detail": "Not found."}, status=404)
+    scenario_ids = id_params(request, 'scenario_id')
+    if request.GET.get('source') == 'line_items':
+        matrix = await sync_to_async(ScenarioMatrix.for_model)(model.id, scenario_ids=scenario_ids)
+    else:
+        matrix = await ScenarioMatrix.afrom_rollups(model.id, scenario_ids=scenario_ids)
+    return json_response({"model_id": model.id, **matrix.summary()})
+
+
+@async_read_view
+async def scenario_list(request):
+    queryset = Scenario.objects.owned_by(request.user).select_related('model')
+    model_ids = id_params(request, 'model_id')
+    if model_ids:
+        queryset = queryset.filter(model_id=model_ids[-1])
+    return await paginate(request, queryset.order_by('id'), ScenarioModelSerializer)
+
+
+@async_read_view
+async def line_item_list(request):
+    if request.GET.get('flat', '').lower() in ('1', 'true', 'yes'):
+        queryset, serializer_class = LineItem.objects.owned_by(request.user), LineItemFlatSerializer
+    else:
+        queryset = LineItem.objects.owned_by(request.user).select_related('model', 'scenario__model', 'period')
+        serializer_class = LineItemModelSerializer
+    model_ids = id_params(request, 'model_id')
+    if model_ids:
+        queryset = queryset.filter(model_id=model_ids[-1])
+    return await paginate(request, queryset.order_by('id'), serializer_class)
@@ -0,0 +1,70 @@
+import hashlib
+from django.conf import settings
+from django.core.cache import InvalidCacheBackendError , caches
+from django.db.models import Count , Max , Sum
+from rest_framework import status
+from rest_framework.response import Response
+from .models import FinancialModel
+
+DEFAULT_TIMEOUT = 60 * 60
+
+
+def get_cache():
+    # the 'forecasting' alias when configured (see CACHES), else the default cache
+    try:
+        return caches[getattr(settings, 'FORECASTING_CACHE_ALIAS', 'forecasting')]
+    except InvalidCacheBackendError:
+        return caches['default']
+
+
+def models_version(models):
+    # one row that changes whenever a model in the queryset is written, added or removed:
+    # revisions only grow, and a removal drops the count or changes the max id
+    version = models.order_by().aggregate(count=Count('id'), last=Max('id'), revisions=Sum('revision'))
+    return f"{version['count']}.{version['last'] or 0}.{version['revisions'] or 0}"
+
+
+def response_key(request, scope, version):
+    # the user is part of the key: querysets and permissions are per user
+    digest = hashlib.sha1(f'{request.get_full_path()}|{request.accepted_media_type}'.encode()).hexdigest()
+    return f'forecasting:{scope}:{request.user.id}:{version}:{digest}'
+
+
+def cached_response(request, scope, version, build):
+    # Serve build()'s data from the cache under a key derived from the model revision(s),
+    # answering a matching If-None-Match with 304 before anything is read or built.
+    key = response_key(request, scope, version)
+    etag = f'W/"{hashlib.sha1(key.encode()).hexdigest()}"'
+    headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+    if etag in [tag.strip() for tag in request.META.get('HTTP_IF_NONE_MATCH', '').split(',')]:
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    backend = get_cache()
+    data = backend.get(key)
+    if data is None:
+        response = build()
+        if response.status_code != status.HTTP_200_OK:
+            return response
+        data = response.data
+        backend.set(key, data, getattr(settings, 'FORECASTING_CACHE_TIMEOUT', DEFAULT_TIMEOUT))
+    return Response(data, headers=headers)
+
+
+# list() served through cached_response, versioned on the models the rows belong to
+class RevisionCachedListMixin:
+    cache_scope = None
+
+    def cached_models(self):
+        # models whose revisions cover the list; narrowed to ?model_id= when given
+        models = FinancialModel.objects.owned_by(self.request.user)
+        model_id = self.request.query_params.get('model_id')
+        if model_id is not None:
+            models = models.filter(id=model_id)
+        return models
+
+    def list(self, request, *args, **kwargs):
+        try:
+            version = models_version(self.cached_models())
+        except (TypeError, ValueError):
+            return super().list(request, *args, **kwargs)
+        return cached_response(request, self.cache_scope, version, lambda: super(RevisionCachedListMixin, self).list(request, *args, **kwargs))
@@ -0,0 +1,195 @@
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+import numpy as np
+from django.conf import settings
+from .engine import CATEGORIES , CATEGORY_INDEX , OTHER , ScenarioMatrix , to_cents
+from .models import FinancialModel , LineItem , Scenario
+from .versions import version_line_items
+
+# Columnar snapshots of a model's line items for compute jobs: one .npy file per column,
+# read back with np.load(mmap_mode='r') so a job maps the pages instead of reading rows
+# and boxing Decimals. A directory holds
+#   cents.npy     int64  amount in cents
+#   scenario.npy  int32  index into meta['scenarios'] (ordered by id)
+#   period.npy    int32  index into meta['periods'] (ordered by start_date)
+#   name.npy      int32  index into meta['names'], the dictionary of line item names
+#   category.npy  int8   index into meta['categories']
+#   meta.json     the tables above plus model id, revision / version number and row count
+# Live snapshots live in <FORECASTING_SNAPSHOT_DIR>/<model id>/r<revision> and are written
+# again only once the model's revision has moved; version snapshots (v<number>) never change.
+
+FORMAT = 1
+COLUMNS = {
+    'cents': np.int64,
+    'scenario': np.int32,
+    'period': np.int32,
+    'name': np.int32,
+    'category': np.int8,
+}
+ROW_FIELDS = ('scenario_id', 'period_id', 'name', 'category', 'amount')
+ITERATOR_CHUNK_SIZE = 2000
+
+
+def snapshot_root():
+    return Path(getattr(settings, 'FORECASTING_SNAPSHOT_DIR', Path(settings.BASE_DIR) / 'snapshots'))
+
+
+def model_dir(model_id):
+    return snapshot_root() / str(model_id)
+
+
+def encode(rows, periods):
+    # rows of ROW_FIELDS -> (columns, name table); periods are ordered and cover every row
+    period_index = {period['id']: index for index, period in enumerate(periods)}
+    scenario_col, period_col, name_col, category_col, amount_col = zip(*rows) if rows else ((),) * 5
+    scenario_ids, scenario_codes = np.unique(np.asarray(scenario_col, dtype=np.int64), return_inverse=True)
+    names = {}
+    columns = {
+        'cents': to_cents(amount_col),
+        'scenario': scenario_codes,
+        'period': np.fromiter((period_index[pk] for pk in period_col), dtype=np.int64, count=len(rows)),
+        'name': np.fromiter((names.setdefault(name, len(names)) for name in name_col), dtype=np.int64, count=len(rows)),
+        'category': np.fromiter((CATEGORY_INDEX.get(category, OTHER) for category in category_col), dtype=np.int64, count=len(rows)),
+    }
+    return {column: values.astype(COLUMNS[column]) for column, values in columns.items()}, scenario_ids.tolist(), list(names)
+
+
+def write(path, rows, scenario_names, meta):
+    # written to a sibling temp directory and renamed into place, so a reader never sees
+    # half a snapshot; when another process got there first its copy is kept
+    scenario_ids = sorted({row[0] for row in rows})
+    periods = [
+        {**period, 'start_date': period['start_date'].isoformat(), 'end_date': period['end_date'].isoformat()}
+        for period in ScenarioMatrix.period_queryset({row[1] for row in rows})
+    ]
+    columns, scenario_ids, names = encode(rows, periods)
+    meta = {
+        **meta, 'format': FORMAT, 'rows': len(rows), 'categories': CATEGORIES, 'names': names, 'periods': periods,
+        'scenarios': [{'id': pk, 'name': scenario_names.get(pk)} for pk in scenario_ids],
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    staging = Path(tempfile.mkdtemp(prefix=f'.{path.name}-', dir=path.parent))
+    try:
+        for column, values in columns.items():
+            np.save(staging / f'{column}.npy', values)
+        (staging / 'meta.json').write_text(json.dumps(meta))
+        os.rename(staging, path)
+    except OSError:
+        shutil.rmtree(staging, ignore_errors=True)
+        if not (path / 'meta.json').exists():
+            raise
+    return Snapshot(path)
+
+
+# A snapshot directory opened for reading; the columns are read-only memory maps
+class Snapshot:
+    def __init__(self, path):
+        self.path = Path(path)
+        self.meta = json.loads((self.path / 'meta.json').read_text())
+        if self.meta.get('format') != FORMAT:
+            raise ValueError(f"Unsupported snapshot format in {self.path}.")
+        # np.load cannot map an empty array, those are read normally
+        mode = 'r' if self.meta['rows'] else None
+        self.columns = {column: np.load(self.path / f'{column}.npy', mmap_mode=mode) for column in COLUMNS}
+
+    def __len__(self):
+        return self.meta['rows']
+
+    def __getitem__(self, column):
+        return self.columns[column]
+
+    @property
+    def scenarios(self):
+        return self.meta['scenarios']
+
+    @property
+    def periods(self):
+        return self.meta['periods']
+
+    @property
+    def names(self):
+        return self.meta['names']
+
+    def mask(self, scenario_ids=None, categories=None, names=None):
+        # boolean row filter; ids and names missing from the snapshot match nothing
+        selected = np.ones(len(self), dtype=bool)
+        for column, table, wanted in (
+            ('scenario', [scenario['id'] for scenario in self.scenarios], scenario_ids),
+            ('category', self.meta['categories'], categories),
+            ('name', self.names, names),
+        ):
+            if wanted:
+                wanted = {str(value) for value in wanted}
+                codes = [code for code, value in enumerate(table) if str(value) in wanted]
+                selected &= np.isin(self.columns[column], codes)
+        return selected
+
+    def matrix(self, scenario_ids=None):
+        # the ScenarioMatrix for_model() would build, without touching the database
+        selected = self.mask(scenario_ids=scenario_ids)
+        scenario_codes, period_codes = self['scenario'][selected], self['period'][selected]
+        scenarios_used, scenario_codes = np.unique(scenario_codes, return_inverse=True)
+        periods_used, period_codes = np.unique(period_codes, return_inverse=True)
+        values = np.zeros((len(scenarios_used), len(periods_used), len(CATEGORIES)), dtype=np.int64)
+        np.add.at(values, (scenario_codes, period_codes, self['category'][selected]), self['cents'][selected])
+        return ScenarioMatrix(
+            [dict(self.scenarios[code]) for code in scenarios_used],
+            [dict(self.periods[code]) for code in periods_used],
+            values,
+        )
+
+
+def live_rows(model_id):
+    return list(LineItem.objects.filter(model_id=model_id).order_by('id').values_list(*ROW_FIELDS).iterator(chunk_size=ITERATOR_CHUNK_SIZE))
+
+
+def current_revision(model_id):
+    return FinancialModel.objects.filter(pk=model_id).values_list('revision', flat=True).get()
+
+
+def live_snapshot(model_id):
+    # the snapshot of the model's current revision, written on first use; older revisions
+    # of the model are removed once a newer one is in place
+    revision = current_revision(model_id)
+    while True:
+        path = model_dir(model_id) / f'r{revision}'
+        if (path / 'meta.json').exists():
+            return Snapshot(path)
+        rows = live_rows(model_id)
+        # a write while we read would file newer rows under the older revision
+        read, revision = revision, current_revision(model_id)
+        if read == revision:
+            break
+    names = dict(Scenario.objects.filter(model_id=model_id).values_list('id', 'name'))
+    snapshot = write(path, rows, names, {'model_id': model_id, 'revision': revision})
+    prune(model_id, keep=path.name)
+    return snapshot
+
+
+def version_snapshot(version):
+    path = model_dir(version.model_id) / f'v{version.number}'
+    if (path / 'meta.json').exists():
+        return Snapshot(path)
+    rows = list(version_line_items(version.model_id, version.number).order_by('id').values_list(*ROW_FIELDS))
+    names = {int(pk): name for pk, name in version.scenarios.items()}
+    return write(path, rows, names, {'model_id': version.model_id, 'version': version.number})
+
+
+def prune(model_id, keep=None):
+    # drops the model's live snapshots other than `keep`; version snapshots stay
+    removed = 0
+    root = model_dir(model_id)
+    if not root.is_dir():
+        return removed
+    for path in root.iterdir():
+        if path.name.startswith('r') and path.name != keep:
+            shutil.rmtree(path, ignore_errors=True)
+            removed += 1
+    return removed
+
+
+def delete_snapshots(model_id):
+    shutil.rmtree(model_dir(model_id), ignore_errors=True)
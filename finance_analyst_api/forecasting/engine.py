@@ -0,0 +1,150 @@
+import numpy as np
+from decimal import Decimal
+from .models import LineItem , Period , PeriodRollup , Scenario
+
+# category axis of the matrix, in the order the model declares them
+CATEGORIES = [choice for choice, _ in LineItem.CATEGORY_CHOICES]
+CATEGORY_INDEX = {category: index for index, category in enumerate(CATEGORIES)}
+OTHER = CATEGORY_INDEX['Other']
+
+
+def to_cents(amounts):
+    # Decimal amounts -> exact int64 cents
+    return np.fromiter((int(amount.scaleb(2)) for amount in amounts), dtype=np.int64, count=len(amounts))
+
+
+def from_cents(cents):
+    return str(Decimal(int(cents)).scaleb(-2))
+
+
+def encode_categories(categories):
+    return np.fromiter((CATEGORY_INDEX.get(category, OTHER) for category in categories), dtype=np.int64, count=len(categories))
+
+
+def ratio(numerator, denominator):
+    # element-wise ratio, None where the denominator is zero
+    numerator = np.asarray(numerator, dtype=np.float64)
+    denominator = np.asarray(denominator, dtype=np.float64)
+    out = np.divide(numerator, denominator, out=np.full(numerator.shape, np.nan), where=denominator != 0)
+    return [None if np.isnan(value) else round(float(value), 4) for value in out.ravel()]
+
+
+# Columnar scenario x period x category matrix of a model's line items (int64 cents)
+class ScenarioMatrix:
+    def __init__(self, scenarios, periods, values):
+        self.scenarios = scenarios  # [{'id', 'name'}] in axis order
+        self.periods = periods      # [{'id', 'label', ...}] ordered by start_date
+        self.values = values        # shape (len(scenarios), len(periods), len(CATEGORIES))
+
+    @classmethod
+    def for_model(cls, model_id, scenario_ids=None):
+        # straight from line items
+        queryset = LineItem.objects.filter(model_id=model_id)
+        if scenario_ids:
+            queryset = queryset.filter(scenario_id__in=scenario_ids)
+        return cls.from_rows(queryset.values_list('scenario_id', 'period_id', 'category', 'amount'))
+
+    @classmethod
+    def from_rollups(cls, model_id, scenario_ids=None):
+        # from the pre-aggregated PeriodRollup rows: O(scenarios x periods x categories)
+        queryset = PeriodRollup.objects.filter(model_id=model_id)
+        if scenario_ids:
+            queryset = queryset.filter(scenario_id__in=scenario_ids)
+        return cls.from_rows(queryset.values_list('scenario_id', 'period_id', 'category', 'total'))
+
+    @classmethod
+    def from_rows(cls, queryset):
+        # rows of (scenario_id, period_id, category, amount)
+        rows = list(queryset)
+        if not rows:
+            return cls.build(rows, [], {})
+        scenario_ids, period_ids = cls.axis_ids(rows)
+        periods = list(cls.period_queryset(period_ids))
+        names = dict(Scenario.objects.filter(id__in=scenario_ids).values_list('id', 'name'))
+        return cls.build(rows, periods, names)
+
+    @classmethod
+    async def afrom_rows(cls, queryset):
+        # same as from_rows with async ORM queries, for the ASGI read endpoints
+        rows = [row async for row in queryset]
+        if not rows:
+            return cls.build(rows, [], {})
+        scenario_ids, period_ids = cls.axis_ids(rows)
+        periods = [period async for period in cls.period_queryset(period_ids)]
+        names = {pk: name async for pk, name in Scenario.objects.filter(id__in=scenario_ids).values_list('id', 'name')}
+        return cls.build(rows, periods, names)
+
+    @classmethod
+    async def afrom_rollups(cls, model_id, scenario_ids=None):
+        queryset = PeriodRollup.objects.filter(model_id=model_id)
+        if scenario_ids:
+            queryset = queryset.filter(scenario_id__in=scenario_ids)
+        return await cls.afrom_rows(queryset.values_list('scenario_id', 'period_id', 'category', 'total'))
+
+    @staticmethod
+    def axis_ids(rows):
+        return sorted({row[0] for row in rows}), sorted({row[1] for row in rows})
+
+    @staticmethod
+    def period_queryset(period_ids):
+        # the period axis is ordered chronologically rather than by primary key
+        return (
+            Period.objects.filter(id__in=period_ids)
+            .order_by('start_date', 'id')
+            .values('id', 'label', 'start_date', 'end_date', 'period_type')
+        )
+
+    @classmethod
+    def build(cls, rows, periods, names):
+        if not rows:
+            return cls([], [], np.zeros((0, 0, len(CATEGORIES)), dtype=np.int64))
+
+        scenario_col, period_col, category_col, amount_col = zip(*rows)
+        scenario_ids, scenario_codes = np.unique(np.asarray(scenario_col, dtype=np.int64), return_inverse=True)
+        period_ids, period_codes = np.unique(np.asarray(period_col, dtype=np.int64), return_inverse=True)
+        position = np.empty(len(period_ids), dtype=np.int64)
+        position[np.searchsorted(period_ids, [period['id'] for period in periods])] = np.arange(len(periods))
+        period_codes = position[period_codes]
+        scenarios = [{'id': int(pk), 'name': names.get(int(pk))} for pk in scenario_ids]
+
+        values = np.zeros((len(scenarios), len(periods), len(CATEGORIES)), dtype=np.int64)
+        np.add.at(values, (scenario_codes, period_codes, encode_categories(category_col)), to_cents(amount_col))
+        return cls(scenarios, periods, values)
+
+    def category(self, name):
+        return self.values[..., CATEGORY_INDEX[name]]
+
+    def net_income(self):
+        return self.category('Revenue') - self.category('Expense')
+
+    def _totals(self, values):
+        # values has the category axis last; returns money strings plus derived figures
+        revenue = values[..., CATEGORY_INDEX['Revenue']]
+        expense = values[..., CATEGORY_INDEX['Expense']]
+        net = revenue - expense
+        return {
+            'totals': {category: from_cents(values[..., index]) for index, category in enumerate(CATEGORIES)},
+            'net_income': from_cents(net),
+            'net_margin': ratio(net, revenue)[0],
+            'expense_ratio': ratio(expense, revenue)[0],
+            'balance_check': from_cents(
+                values[..., CATEGORY_INDEX['Asset']]
+                - values[..., CATEGORY_INDEX['Liability']]
+                - values[..., CATEGORY_INDEX['Equity']]
+            ),
+        }
+
+    def summary(self):
+        by_scenario = self.values.sum(axis=1)
+        scenarios = []
+        for s, scenario in enumerate(self.scenarios):
+            periods = [
+                {'id': period['id'], 'label': period['label'], **self._totals(self.values[s, p])}
+                for p, period in enumerate(self.periods)
+            ]
+            scenarios.append({**scenario, **self._totals(by_scenario[s]), 'periods': periods})
+        return {
+            'categories': CATEGORIES,
+            'periods': [{'id': period['id'], 'label': period['label']} for period in self.periods],
+            'scenarios': scenarios,
+        }
@@ -0,0 +1,63 @@
+import csv
+import json
+from .models import LineItem
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+ITERATOR_CHUNK_SIZE = 2000
+
+# (output column, queryset lookup)
+EXPORT_COLUMNS = [
+    ('id', 'id'),
+    ('scenario_id', 'scenario_id'),
+    ('scenario', 'scenario__name'),
+    ('period_id', 'period_id'),
+    ('period', 'period__label'),
+    ('period_start', 'period__start_date'),
+    ('period_end', 'period__end_date'),
+    ('name', 'name'),
+    ('category', 'category'),
+    ('amount', 'amount'),
+]
+HEADER = [column for column, _ in EXPORT_COLUMNS]
+
+
+# file-like object whose write() hands the line back, so csv.writer can feed a generator
+class Echo:
+    def write(self, value):
+        return value
+
+
+def export_queryset(model_id, scenario_ids=None, categories=None, period_start=None, period_end=None):
+    queryset = LineItem.objects.filter(model_id=model_id)
+    if scenario_ids:
+        queryset = queryset.filter(scenario_id__in=scenario_ids)
+    if categories:
+        queryset = queryset.filter(category__in=categories)
+    if period_start:
+        queryset = queryset.filter(period__start_date__gte=period_start)
+    if period_end:
+        queryset = queryset.filter(period__end_date__lte=period_end)
+    return queryset.order_by('id').values_list(*[lookup for _, lookup in EXPORT_COLUMNS])
+
+
+def stream_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(HEADER)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def stream_ndjson(rows):
+    for row in rows:
+        yield json.dumps(dict(zip(HEADER, row)), default=str) + '\n'
+
+
+def stream_rows(queryset, export_format):
+    # plain tuples through a server-side cursor (chunked fetches on backends without one)
+    rows = queryset.iterator(chunk_size=ITERATOR_CHUNK_SIZE)
+    if export_format == 'ndjson':
+        return stream_ndjson(rows)
+    return stream_csv(rows)
@@ -0,0 +1,177 @@
+from datetime import timedelta
+from decimal import Decimal
+import numpy as np
+from django.db import transaction
+from django.db.models import Sum
+from .ingest import store_items
+from .models import LineItem , Period
+from .periods import STEP_MONTHS , add_months , link_periods , period_label
+
+METHODS = ('trend', 'seasonal_naive', 'exponential_smoothing', 'linear_regression')
+MAX_HORIZON = 120
+SEASON_LENGTH = {'monthly': 12, 'quarterly': 4, 'yearly': 1}
+AMOUNT_FIELD = LineItem._meta.get_field('amount')
+AMOUNT_LIMIT = 10.0 ** (AMOUNT_FIELD.max_digits - AMOUNT_FIELD.decimal_places) - 0.01
+
+
+# History of every (name, category) series of a scenario as one (series, periods) matrix.
+# Only periods of the scenario's dominant period type are used; derived formula items
+# are left out, they are re-derived from the forecast inputs.
+def load_history(model_id, scenario_id, history=None):
+    rows = list(
+        LineItem.objects.filter(model_id=model_id, scenario_id=scenario_id, formula__isnull=True)
+        .values('name', 'category', 'period_id')
+        .annotate(total=Sum('amount'))
+        .order_by()
+    )
+    periods = list(
+        Period.objects.filter(id__in={row['period_id'] for row in rows})
+        .order_by('start_date', 'id')
+        .values('id', 'label', 'start_date', 'end_date', 'period_type')
+    )
+    if not periods:
+        return [], [], np.zeros((0, 0))
+    types = [period['period_type'] for period in periods]
+    period_type = max(set(types), key=types.count)
+    periods = [period for period in periods if period['period_type'] == period_type]
+    if history:
+        periods = periods[-history:]
+
+    position = {period['id']: index for index, period in enumerate(periods)}
+    rows = [row for row in rows if row['period_id'] in position]
+    keys = sorted({(row['name'], row['category']) for row in rows})
+    key_index = {key: index for index, key in enumerate(keys)}
+    values = np.zeros((len(keys), len(periods)))
+    if rows:
+        np.add.at(
+            values,
+            (
+                np.fromiter((key_index[(row['name'], row['category'])] for row in rows), dtype=np.intp, count=len(rows)),
+                np.fromiter((position[row['period_id']] for row in rows), dtype=np.intp, count=len(rows)),
+            ),
+            np.fromiter((float(row['total']) for row in rows), dtype=np.float64, count=len(rows)),
+        )
+    return keys, periods, values
+
+
+# Every method maps a (series, periods) history to a (series, horizon) forecast.
+
+def trend(values, horizon):
+    # drift: the average change between the first and last observation, carried forward
+    steps = np.arange(1, horizon + 1)
+    length = values.shape[1]
+    slope = (values[:, -1] - values[:, 0]) / (length - 1) if length > 1 else np.zeros(values.shape[0])
+    return values[:, -1:] + slope[:, None] * steps
+
+
+def seasonal_naive(values, horizon, season_length):
+    # repeat the last full season; falls back to the last value with less history
+    length = values.shape[1]
+    if season_length < 1 or length < season_length:
+        return np.repeat(values[:, -1:], horizon, axis=1)
+    columns = length - season_length + np.arange(horizon) % season_length
+    return values[:, columns]
+
+
+def exponential_smoothing(values, horizon, alpha, beta=None):
+    # simple exponential smoothing, or Holt's linear trend when beta is given;
+    # the loop runs over periods, every series is updated at once
+    level = values[:, 0].copy()
+    slope = values[:, 1] - values[:, 0] if beta is not None and values.shape[1] > 1 else np.zeros(values.shape[0])
+    for column in range(1, values.shape[1]):
+        previous = level
+        level = alpha * values[:, column] + (1 - alpha) * (level + slope)
+        if beta is not None:
+            slope = beta * (level - previous) + (1 - beta) * slope
+    return level[:, None] + slope[:, None] * np.arange(1, horizon + 1)
+
+
+def linear_regression(values, horizon):
+    # ordinary least squares on the period index, solved for all series in closed form
+    length = values.shape[1]
+    t = np.arange(length, dtype=np.float64)
+    centered = t - t.mean()
+    denominator = centered @ centered
+    means = values.mean(axis=1)
+    slope = (values - means[:, None]) @ centered / denominator if denominator else np.zeros(values.shape[0])
+    future = np.arange(length, length + horizon, dtype=np.float64) - t.mean()
+    return means[:, None] + slope[:, None] * future
+
+
+def project(values, horizon, method, season_length=None, alpha=0.5, beta=None):
+    if method == 'trend':
+        result = trend(values, horizon)
+    elif method == 'seasonal_naive':
+        result = seasonal_naive(values, horizon, season_length)
+    elif method == 'exponential_smoothing':
+        result = exponential_smoothing(values, horizon, alpha, beta)
+    elif method == 'linear_regression':
+        result = linear_regression(values, horizon)
+    else:
+        raise ValueError(f"Unknown method '{method}'.")
+    # series that never went negative aren't forecast below zero
+    result = np.where((values.min(axis=1) >= 0)[:, None], np.maximum(result, 0.0), result)
+    return np.clip(np.round(result, 2), -AMOUNT_LIMIT, AMOUNT_LIMIT)
+
+
+def future_periods(last_period, horizon, user):
+    # the horizon's periods, reusing the user's existing rows and creating the rest in one insert
+    period_type = last_period['period_type']
+    months = STEP_MONTHS.get(period_type, 1)
+    start = last_period['end_date'] + timedelta(days=1)
+    spans = []
+    for _ in range(horizon):
+        end = add_months(start, months) - timedelta(days=1)
+        spans.append((start, end))
+        start = end + timedelta(days=1)
+
+    existing = {}
+    for period in (
+        Period.objects.owned_by(user).filter(period_type=period_type, start_date__in=[span[0] for span in spans])
+        .order_by('id')
+        .values('id', 'label', 'start_date', 'end_date')
+    ):
+        existing.setdefault((period['start_date'], period['end_date']), period)
+    missing = [
+        Period(label=period_label(start, period_type), start_date=start, end_date=end, period_type=period_type, user=user)
+        for start, end in spans if (start, end) not in existing
+    ]
+    for period in Period.objects.bulk_create(missing):
+        existing[(period.start_date, period.end_date)] = {'id': period.id, 'label': period.label}
+    if missing:
+        link_periods(user)
+    return [{'id': existing[span]['id'], 'label': existing[span]['label']} for span in spans], len(missing)
+
+
+def forecast(model_id, scenario_id, user, horizon, method='trend', season_length=None, alpha=0.5, beta=None,
+             history=None, dry_run=False):
+    keys, periods, values = load_history(model_id, scenario_id, history)
+    if not keys:
+        return {'method': method, 'series': 0, 'history': [], 'periods': [], 'created_periods': 0, 'created': 0}
+    if season_length is None:
+        season_length = SEASON_LENGTH.get(periods[-1]['period_type'], 1)
+    projected = project(values, horizon, method, season_length, alpha, beta)
+
+    result = {
+        'method': method,
+        'series': len(keys),
+        'history': [{'id': period['id'], 'label': period['label']} for period in periods],
+    }
+    if dry_run:
+        return {
+            **result,
+            'forecast': [
+                {'name': name, 'category': category, 'values': projected[index].tolist()}
+                for index, (name, category) in enumerate(keys)
+            ],
+        }
+
+    with transaction.atomic():
+        targets, created_periods = future_periods(periods[-1], horizon, user)
+        items = [
+            (model_id, scenario_id, target['id'], name, category, Decimal(f'{amount:.2f}'))
+            for index, (name, category) in enumerate(keys)
+            for target, amount in zip(targets, projected[index].tolist())
+        ]
+        store_items(items)
+    return {**result, 'periods': targets, 'created_periods': created_periods, 'created': len(items)}
@@ -0,0 +1,237 @@
+import ast
+import re
+from collections import defaultdict
+from decimal import Decimal
+import numpy as np
+from django.db import transaction
+from django.db.models import Sum
+from .models import Assumption , FinancialModel , Formula , LineItem
+from .rollups import apply_deltas
+
+# [Name With Spaces] references; bare identifiers work for simple names
+REFERENCE = re.compile(r'\[([^\[\]]+)\]')
+BINARY_OPERATORS = {
+    ast.Add: np.add,
+    ast.Sub: np.subtract,
+    ast.Mult: np.multiply,
+    ast.Div: np.divide,
+    ast.Pow: np.power,
+}
+UNARY_OPERATORS = {ast.USub: np.negative, ast.UAdd: np.positive}
+FUNCTIONS = {'min': np.minimum, 'max': np.maximum, 'abs': np.abs}
+AMOUNT_LIMIT = Decimal(10) ** (LineItem._meta.get_field('amount').max_digits - 2)
+CENT = Decimal('0.01')
+
+
+class FormulaError(ValueError):
+    pass
+
+
+# a parsed expression with the names it reads
+class CompiledFormula:
+    def __init__(self, formula):
+        self.id = formula.id
+        self.name = formula.name
+        self.category = formula.category
+        self.references = {}
+        source = REFERENCE.sub(self._placeholder, formula.expression)
+        try:
+            self.tree = ast.parse(source, mode='eval').body
+        except SyntaxError as error:
+            raise FormulaError(f"Invalid expression: {error.msg}")
+        self.dependencies = set()
+        self._check(self.tree)
+
+    def _placeholder(self, match):
+        placeholder = f'__ref{len(self.references)}'
+        self.references[placeholder] = match.group(1).strip()
+        return placeholder
+
+    def _check(self, node):
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+            return
+        if isinstance(node, ast.Name):
+            self.dependencies.add(self.references.get(node.id, node.id))
+        elif isinstance(node, ast.BinOp) and type(node.op) in BINARY_OPERATORS:
+            self._check(node.left)
+            self._check(node.right)
+        elif isinstance(node, ast.UnaryOp) and type(node.op) in UNARY_OPERATORS:
+            self._check(node.operand)
+        elif isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in FUNCTIONS and not node.keywords:
+            for argument in node.args:
+                self._check(argument)
+        else:
+            raise FormulaError(f"Unsupported syntax in expression: {type(node).__name__}")
+
+    def evaluate(self, lookup, node=None):
+        node = self.tree if node is None else node
+        if isinstance(node, ast.Constant):
+            # float64, so 2 ** -1 works and 10 ** 30 overflows to inf instead of wrapping
+            return np.float64(node.value)
+        if isinstance(node, ast.Name):
+            return lookup(self.references.get(node.id, node.id))
+        if isinstance(node, ast.BinOp):
+            return BINARY_OPERATORS[type(node.op)](self.evaluate(lookup, node.left), self.evaluate(lookup, node.right))
+        if isinstance(node, ast.UnaryOp):
+            return UNARY_OPERATORS[type(node.op)](self.evaluate(lookup, node.operand))
+        function = FUNCTIONS[node.func.id]
+        arguments = [self.evaluate(lookup, argument) for argument in node.args]
+        return function(*arguments) if function is np.abs else _reduce(function, arguments)
+
+
+def _reduce(function, arguments):
+    result = arguments[0]
+    for argument in arguments[1:]:
+        result = function(result, argument)
+    return result
+
+
+def compile_formulas(formulas):
+    # -> compiled formulas in dependency order; raises FormulaError on cycles
+    compiled = {formula.name: CompiledFormula(formula) for formula in formulas}
+    order = []
+    state = {}
+
+    def visit(name, path):
+        if state.get(name) == 'done':
+            return
+        if state.get(name) == 'visiting':
+            raise FormulaError(f"Circular reference: {' -> '.join(path + [name])}")
+        state[name] = 'visiting'
+        for dependency in sorted(compiled[name].dependencies):
+            if dependency in compiled:
+                visit(dependency, path + [name])
+        state[name] = 'done'
+        order.append(compiled[name])
+
+    for name in sorted(compiled):
+        visit(name, [])
+    return order
+
+
+def downstream(order, changed_names):
+    # formulas whose value depends, directly or transitively, on any changed name
+    dirty = set(changed_names)
+    affected = []
+    for formula in order:
+        if formula.name in dirty or formula.dependencies & dirty:
+            dirty.add(formula.name)
+            affected.append(formula)
+    return affected
+
+
+def to_amount(value):
+    # None when the value can't be stored as a LineItem amount (NaN, inf, too large)
+    if not np.isfinite(value) or abs(value) >= float(AMOUNT_LIMIT):
+        return None
+    amount = Decimal(repr(float(value))).quantize(CENT)
+    return amount if abs(amount) < AMOUNT_LIMIT else None
+
+
+def recompute(model_id, changed_names=None, scenario_ids=None, period_ids=None, strict=False):
+    # Re-derive formula line items. With changed_names only the formulas downstream of
+    # those names are evaluated, and only in the given scenarios / periods; everything
+    # is one vectorized pass over a (scenario, period) grid per formula.
+    # Cells without a storable amount (division by zero, overflow) get no line item, or
+    # raise FormulaError when strict (formula writes report them to the client).
+    formulas = list(Formula.objects.filter(model_id=model_id))
+    if not formulas:
+        return 0
+    order = compile_formulas(formulas)
+    targets = order if changed_names is None else downstream(order, changed_names)
+    if not targets:
+        return 0
+
+    # cells are the (scenario, period) pairs holding hand-entered line items
+    inputs = LineItem.objects.filter(model_id=model_id, formula__isnull=True)
+    derived = LineItem.objects.filter(formula_id__in=[formula.id for formula in targets])
+    if scenario_ids:
+        inputs = inputs.filter(scenario_id__in=scenario_ids)
+        derived = derived.filter(scenario_id__in=scenario_ids)
+    if period_ids:
+        inputs = inputs.filter(period_id__in=period_ids)
+        derived = derived.filter(period_id__in=period_ids)
+    cells = set(inputs.values_list('scenario_id', 'period_id').distinct())
+    scenarios = sorted({scenario for scenario, _ in cells} | set(derived.values_list('scenario_id', flat=True)))
+    periods = sorted({period for _, period in cells} | set(derived.values_list('period_id', flat=True)))
+    s_index = {pk: i for i, pk in enumerate(scenarios)}
+    p_index = {pk: i for i, pk in enumerate(periods)}
+    shape = (len(scenarios), len(periods))
+
+    # everything the targets read that they don't produce themselves
+    needed = set().union(*(formula.dependencies for formula in targets)) - {formula.name for formula in targets}
+    values = {}
+    rows = (
+        LineItem.objects.filter(model_id=model_id, scenario_id__in=scenarios, period_id__in=periods, name__in=needed)
+        .values('scenario_id', 'period_id', 'name')
+        .annotate(total=Sum('amount'))
+        .order_by()
+    )
+    for row in rows:
+        grid = values.setdefault(row['name'], np.zeros(shape))
+        grid[s_index[row['scenario_id']], p_index[row['period_id']]] += float(row['total'])
+    assumptions = {}
+    for scenario_id, name, value in Assumption.objects.filter(
+        model_id=model_id, scenario_id__in=scenarios, name__in=needed - set(values),
+    ).values_list('scenario_id', 'name', 'value'):
+        assumptions.setdefault(name, np.zeros((len(scenarios), 1)))[s_index[scenario_id], 0] = float(value)
+
+    def lookup(name):
+        if name in values:
+            return values[name]
+        return assumptions.get(name, 0.0)
+
+    with np.errstate(all='ignore'):
+        for formula in targets:
+            values[formula.name] = np.broadcast_to(np.asarray(formula.evaluate(lookup), dtype=np.float64), shape)
+
+    # diff against the stored cells and write only what changed
+    existing = {
+        (row['formula_id'], row['scenario_id'], row['period_id']): row
+        for row in derived.values('id', 'formula_id', 'scenario_id', 'period_id', 'name', 'category', 'amount')
+    }
+    deltas = defaultdict(lambda: [Decimal(0), 0])
+    to_create, to_update = [], []
+    for formula in targets:
+        grid = values[formula.name]
+        for scenario_id, period_id in cells:
+            amount = to_amount(grid[s_index[scenario_id], p_index[period_id]])
+            if amount is None:
+                if strict:
+                    raise FormulaError(
+                        f"'{formula.name}' has no valid amount in scenario {scenario_id}, period {period_id} "
+                        f"(division by zero or a result of {AMOUNT_LIMIT:.0E} or more)."
+                    )
+                continue  # left in existing, so a stored cell is removed below
+            current = existing.pop((formula.id, scenario_id, period_id), None)
+            key = (model_id, scenario_id, period_id, formula.category)
+            if current is None:
+                to_create.append(LineItem(
+                    model_id=model_id, scenario_id=scenario_id, period_id=period_id, formula_id=formula.id,
+                    name=formula.name, category=formula.category, amount=amount,
+                ))
+                deltas[key][0] += amount
+                deltas[key][1] += 1
+            elif current['category'] != formula.category:
+                # the cell moves to another rollup row
+                to_update.append(LineItem(id=current['id'], name=formula.name, category=formula.category, amount=amount))
+                previous = deltas[(model_id, scenario_id, period_id, current['category'])]
+                previous[0] -= current['amount']
+                previous[1] -= 1
+                deltas[key][0] += amount
+                deltas[key][1] += 1
+            elif current['amount'] != amount or current['name'] != formula.name:
+                to_update.append(LineItem(id=current['id'], name=formula.name, category=formula.category, amount=amount))
+                deltas[key][0] += amount - current['amount']
+    # derived cells whose inputs are gone; deleting them goes through the usual signals
+    stale = [row['id'] for row in existing.values()]
+
+    changed = len(to_create) + len(to_update) + len(stale)
+    if changed:
+        with transaction.atomic():
+            LineItem.objects.bulk_create(to_create, batch_size=1000)
+            LineItem.objects.bulk_update(to_update, ['name', 'category', 'amount'], batch_size=1000)
+            LineItem.objects.filter(id__in=stale).delete()
+            apply_deltas(deltas)
+            FinancialModel.bump_revision(model_id)
+    return changed
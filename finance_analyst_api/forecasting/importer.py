@@ -0,0 +1,161 @@
+import csv
+import logging
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from django.conf import settings
+from django.db import close_old_connections , connections
+from django.utils import timezone
+from .ingest import ingest_line_items
+from .models import ImportJob
+
+BATCH_ROWS = 5000
+# uploads up to this size are imported within the request, bigger ones by a worker
+INLINE_MAX_BYTES = 1024 * 1024
+MAX_STORED_ERRORS = 1000
+EXCEL_EXTENSIONS = ('.xlsx', '.xlsm')
+CSV_EXTENSIONS = ('.csv',)
+SUPPORTED_EXTENSIONS = EXCEL_EXTENSIONS + CSV_EXTENSIONS
+
+logger = logging.getLogger(__name__)
+_executor = None
+
+
+class UnsupportedFile(ValueError):
+    pass
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        workers = getattr(settings, 'FORECASTING_IMPORT_WORKERS', 2)
+        _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='line-item-import')
+    return _executor
+
+
+def normalize_header(value):
+    return str(value or '').strip().lower().replace(' ', '_')
+
+
+def cell_value(value):
+    # Excel stores money as binary floats; keep the cents the user typed
+    if isinstance(value, float):
+        return str(round(value, 2))
+    return value
+
+
+def iter_excel(path, sheet=None):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise UnsupportedFile("Excel import requires openpyxl to be installed.")
+    # read-only mode streams rows from the sheet XML instead of loading the workbook
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        if sheet and sheet not in workbook.sheetnames:
+            raise UnsupportedFile(f"Sheet '{sheet}' not found.")
+        rows = (workbook[sheet] if sheet else workbook.active).iter_rows(values_only=True)
+        header = [normalize_header(cell) for cell in next(rows, ())]
+        for values in rows:
+            if all(value is None or value == '' for value in values):
+                continue
+            yield {key: cell_value(value) for key, value in zip(header, values) if key}
+    finally:
+        workbook.close()
+
+
+def iter_csv(path):
+    with open(path, newline='', encoding='utf-8-sig') as handle:
+        for row in csv.DictReader(handle):
+            yield {normalize_header(key): value for key, value in row.items() if key}
+
+
+def iter_rows(path, file_name, sheet=None):
+    extension = os.path.splitext(file_name)[1].lower()
+    if extension in EXCEL_EXTENSIONS:
+        return iter_excel(path, sheet)
+    if extension in CSV_EXTENSIONS:
+        return iter_csv(path)
+    raise UnsupportedFile(f"Unsupported file type '{extension}'. Upload .xlsx or .csv.")
+
+
+def import_rows(rows, user, defaults=None, progress=None):
+    # validate and insert in batches; each batch commits on its own so progress is visible
+    totals = {'processed_rows': 0, 'created_rows': 0, 'failed_rows': 0, 'errors': []}
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, BATCH_ROWS))
+        if not batch:
+            break
+        result = ingest_line_items(batch, user, defaults=defaults, partial=True)
+        for error in result['errors'][:MAX_STORED_ERRORS - len(totals['errors'])]:
+            # spreadsheet row number: 1-based, after the header row
+            totals['errors'].append({**error, 'row': totals['processed_rows'] + error['row'] + 2})
+        totals['processed_rows'] += len(batch)
+        totals['created_rows'] += result['created']
+        totals['failed_rows'] += result['failed']
+        if progress is not None:
+            progress(totals)
+    return totals
+
+
+def save_upload(upload):
+    # copy the upload to a file that outlives the request
+    extension = os.path.splitext(upload.name)[1].lower()
+    if extension not in SUPPORTED_EXTENSIONS:
+        raise UnsupportedFile(f"Unsupported file type '{extension}'. Upload .xlsx or .csv.")
+    with tempfile.NamedTemporaryFile(suffix=extension, delete=False) as handle:
+        for chunk in upload.chunks():
+            handle.write(chunk)
+    return handle.name
+
+
+def process_import_job(job_id, path, defaults=None, sheet=None):
+    job = ImportJob.objects.select_related('user').get(pk=job_id)
+    ImportJob.objects.filter(pk=job_id).update(status='running')
+
+    def progress(totals):
+        ImportJob.objects.filter(pk=job_id).update(
+            processed_rows=totals['processed_rows'], created_rows=totals['created_rows'], failed_rows=totals['failed_rows'],
+        )
+
+    try:
+        totals = import_rows(iter_rows(path, job.file_name, sheet), job.user, defaults, progress)
+    except Exception as error:
+        ImportJob.objects.filter(pk=job_id).update(status='failed', detail=str(error), finished_at=timezone.now())
+        raise
+    finally:
+        os.unlink(path)
+    ImportJob.objects.filter(pk=job_id).update(status='done', finished_at=timezone.now(), **totals)
+
+
+def record_failure(job_id, error):
+    # whatever escaped process_import_job, also from outside the row import
+    logger.exception("Import job %s failed", job_id)
+    ImportJob.objects.filter(pk=job_id).update(status='failed', detail=str(error), finished_at=timezone.now())
+
+
+def run_import_job(job_id, path, defaults=None, sheet=None):
+    # worker thread entry point: the thread owns its own database connection
+    close_old_connections()
+    try:
+        process_import_job(job_id, path, defaults, sheet)
+    except Exception as error:
+        record_failure(job_id, error)
+    finally:
+        connections.close_all()
+
+
+def start_import(upload, user, defaults=None, sheet=None):
+    path = save_upload(upload)
+    job = ImportJob.objects.create(user=user, file_name=upload.name)
+    if upload.size <= INLINE_MAX_BYTES:
+        try:
+            process_import_job(job.pk, path, defaults, sheet)
+        except Exception as error:
+            record_failure(job.pk, error)
+    else:
+        get_executor().submit(run_import_job, job.pk, path, defaults, sheet)
+    job.refresh_from_db()
+    return job
@@ -0,0 +1,206 @@
+import logging
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+import numpy as np
+from asgiref.sync import iscoroutinefunction , markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from rest_framework import permissions
+from rest_framework.serializers import BaseSerializer
+
+# Opt-in request instrumentation (FORECASTING_INSTRUMENTATION=True): per request the view,
+# latency, SQL count / time, serializer time and response size. Emitted as Server-Timing,
+# kept as rolling per-endpoint windows for the stats endpoint, slow queries logged with
+# the view that issued them. Everything is per process.
+
+logger = logging.getLogger(__name__)
+PERCENTILES = (50, 90, 95, 99)
+# columns of a sample: latency, sql time, serializer time (ms), query count, response bytes
+COLUMNS = ('latency_ms', 'sql_ms', 'serializer_ms', 'queries', 'response_bytes')
+SQL_PREVIEW = 500
+
+# the request being measured; copied into sync_to_async threads, so async views count too
+current = ContextVar('forecasting_request_metrics', default=None)
+lock = threading.Lock()
+endpoints = {}
+installed = False
+
+
+def enabled():
+    return getattr(settings, 'FORECASTING_INSTRUMENTATION', False)
+
+
+def slow_query_ms():
+    return getattr(settings, 'FORECASTING_SLOW_QUERY_MS', 200)
+
+
+def window_size():
+    return getattr(settings, 'FORECASTING_INSTRUMENTATION_WINDOW', 1000)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.view = None
+        self.endpoint = None
+        self.queries = 0
+        self.sql_time = 0.0
+        self.serializer_time = 0.0
+        self.serializing = 0  # nesting depth, nested serializers are counted once
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        metrics.queries += 1
+        metrics.sql_time += elapsed
+        if elapsed * 1000 >= slow_query_ms():
+            logger.warning("Slow query (%.1f ms) from %s: %s", elapsed * 1000, metrics.view or 'unresolved view', sql[:SQL_PREVIEW])
+
+
+def add_wrapper(sender=None, connection=None, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def wrap_open_connections():
+    # connections opened before install() missed connection_created
+    for connection in connections.all(initialized_only=True):
+        add_wrapper(connection=connection)
+
+
+def timed_data(data):
+    def wrapper(serializer):
+        metrics = current.get()
+        if metrics is None:
+            return data.fget(serializer)
+        metrics.serializing += 1
+        started = time.perf_counter()
+        try:
+            return data.fget(serializer)
+        finally:
+            metrics.serializing -= 1
+            if not metrics.serializing:
+                metrics.serializer_time += time.perf_counter() - started
+    return property(wrapper)
+
+
+def install():
+    # hooks new connections and BaseSerializer.data once; both are no-ops outside an
+    # instrumented request
+    global installed
+    with lock:
+        if installed:
+            return
+        connection_created.connect(add_wrapper, dispatch_uid='forecasting-instrumentation')
+        BaseSerializer.data = timed_data(BaseSerializer.data)
+        installed = True
+
+
+def describe_view(request, view_func):
+    # 'FinanceModelView.summary' for DRF views, the function's path otherwise
+    cls = getattr(view_func, 'cls', None)
+    if cls is None:
+        return f'{view_func.__module__}.{view_func.__name__}'
+    action = (getattr(view_func, 'actions', None) or {}).get(request.method.lower())
+    return f'{cls.__name__}.{action}' if action else cls.__name__
+
+
+def observe(endpoint, sample):
+    with lock:
+        if endpoint not in endpoints:
+            endpoints[endpoint] = deque(maxlen=window_size())
+        endpoints[endpoint].append(sample)
+
+
+def endpoint_stats():
+    with lock:
+        windows = {endpoint: np.array(samples, dtype=np.float64) for endpoint, samples in endpoints.items()}
+    result = {}
+    for endpoint, values in sorted(windows.items()):
+        result[endpoint] = {'samples': len(values)}
+        for index, column in enumerate(COLUMNS):
+            points = np.percentile(values[:, index], PERCENTILES)
+            result[endpoint][column] = {f'p{p}': round(float(value), 3) for p, value in zip(PERCENTILES, points)}
+    return result
+
+
+def reset_stats():
+    with lock:
+        endpoints.clear()
+
+
+def server_timing(metrics, total):
+    return ', '.join([
+        f'db;dur={metrics.sql_time * 1000:.2f};desc="{metrics.queries} queries"',
+        f'serialize;dur={metrics.serializer_time * 1000:.2f}',
+        f'total;dur={total * 1000:.2f}',
+    ])
+
+
+class InstrumentationMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not enabled():
+            raise MiddlewareNotUsed()
+        install()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = current.set(metrics)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current.reset(token)
+        return self.finish(request, response, metrics, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = current.set(metrics)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current.reset(token)
+        return self.finish(request, response, metrics, time.perf_counter() - started)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # runs in the thread the view's queries use, also for async views (Django adapts
+        # sync process_view with sync_to_async), so that thread's connections get wrapped
+        wrap_open_connections()
+        metrics = current.get()
+        if metrics is not None:
+            metrics.view = describe_view(request, view_func)
+            metrics.endpoint = f'{request.method} {request.resolver_match.view_name or metrics.view}'
+
+    def finish(self, request, response, metrics, total):
+        # streamed bodies are not measured, their size is unknown here
+        size = 0 if response.streaming else len(response.content)
+        response['Server-Timing'] = server_timing(metrics, total)
+        observe(metrics.endpoint or f'{request.method} <unresolved>', (
+            total * 1000, metrics.sql_time * 1000, metrics.serializer_time * 1000, metrics.queries, size,
+        ))
+        return response
+
+
+# FORECASTING_STATS_USERS lists the emails allowed to read the stats
+class CanReadInstrumentation(permissions.BasePermission):
+    def has_permission(self, request, view):
+        return request.user.email in getattr(settings, 'FORECASTING_STATS_USERS', ())
@@ -0,0 +1,105 @@
+import numpy as np
+from django.conf import settings
+from django.db.models import Sum
+from .engine import ScenarioMatrix , to_cents
+from .models import LineItem
+
+# Expense line items counted as cost of goods sold for the gross margin
+DEFAULT_COGS_NAMES = ('COGS', 'Cost of Goods Sold', 'Cost of Sales', 'Cost of Revenue')
+
+# name -> (numerator, denominator) over the figures built in figures();
+# line items only carry categories, so Asset / Liability stand in for the current ones
+RATIOS = {
+    'gross_margin': ('gross_profit', 'revenue'),
+    'net_margin': ('net_income', 'revenue'),
+    'current_ratio': ('assets', 'liabilities'),
+    'debt_to_equity': ('liabilities', 'equity'),
+    'return_on_equity': ('net_income', 'equity'),
+    'return_on_assets': ('net_income', 'assets'),
+    'asset_turnover': ('revenue', 'assets'),
+}
+# income statement figures add up over periods, balance sheet ones are read at the last period
+FLOWS = ('revenue', 'expense', 'cogs', 'gross_profit', 'net_income')
+STOCKS = ('assets', 'liabilities', 'equity')
+
+
+def cogs_names():
+    return getattr(settings, 'FORECASTING_COGS_NAMES', DEFAULT_COGS_NAMES)
+
+
+def load_cogs(model_id, matrix):
+    # (scenarios, periods) cents of the COGS line items, one aggregate query
+    cogs = np.zeros(matrix.values.shape[:2], dtype=np.int64)
+    scenario_index = {scenario['id']: index for index, scenario in enumerate(matrix.scenarios)}
+    period_index = {period['id']: index for index, period in enumerate(matrix.periods)}
+    rows = list(
+        LineItem.objects.filter(model_id=model_id, category='Expense', name__in=cogs_names(), scenario_id__in=list(scenario_index))
+        .values('scenario_id', 'period_id')
+        .annotate(total=Sum('amount'))
+        .order_by()
+        .values_list('scenario_id', 'period_id', 'total')
+    )
+    rows = [row for row in rows if row[1] in period_index]
+    if rows:
+        cogs[[scenario_index[row[0]] for row in rows], [period_index[row[1]] for row in rows]] = to_cents([row[2] for row in rows])
+    return cogs
+
+
+def figures(matrix, cogs):
+    # every input of RATIOS as a (scenarios, periods) float array in currency units
+    revenue = matrix.category('Revenue') / 100.0
+    expense = matrix.category('Expense') / 100.0
+    cogs = cogs / 100.0
+    return {
+        'revenue': revenue,
+        'expense': expense,
+        'cogs': cogs,
+        'gross_profit': revenue - cogs,
+        'net_income': revenue - expense,
+        'assets': matrix.category('Asset') / 100.0,
+        'liabilities': matrix.category('Liability') / 100.0,
+        'equity': matrix.category('Equity') / 100.0,
+    }
+
+
+def ratios(values):
+    # every ratio at once; NaN where the denominator is zero
+    result = {}
+    for name, (numerator, denominator) in RATIOS.items():
+        top, bottom = values[numerator], values[denominator]
+        result[name] = np.divide(top, bottom, out=np.full(top.shape, np.nan), where=bottom != 0)
+    return result
+
+
+def clean(values):
+    return [None if np.isnan(value) else round(value, 4) for value in np.asarray(values, dtype=np.float64).tolist()]
+
+
+def compute_kpis(model_id, scenario_ids=None):
+    matrix = ScenarioMatrix.from_rollups(model_id, scenario_ids=scenario_ids)
+    values = figures(matrix, load_cogs(model_id, matrix))
+    by_period = ratios(values)
+    if matrix.periods:
+        overall = ratios({
+            **{name: values[name].sum(axis=1) for name in FLOWS},
+            **{name: values[name][:, -1] for name in STOCKS},
+        })
+    else:
+        overall = {name: np.full(len(matrix.scenarios), np.nan) for name in RATIOS}
+
+    scenarios = []
+    for s, scenario in enumerate(matrix.scenarios):
+        columns = {name: clean(by_period[name][s]) for name in RATIOS}
+        scenarios.append({
+            **scenario,
+            'ratios': {name: clean([overall[name][s]])[0] for name in RATIOS},
+            'periods': [
+                {'id': period['id'], 'label': period['label'], **{name: columns[name][p] for name in RATIOS}}
+                for p, period in enumerate(matrix.periods)
+            ],
+        })
+    return {
+        'ratios': list(RATIOS),
+        'periods': [{'id': period['id'], 'label': period['label']} for period in matrix.periods],
+        'scenarios': scenarios,
+    }
@@ -0,0 +1,255 @@
+import json
+import subprocess
+import time
+import uuid
+from datetime import datetime , timezone
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand , CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext , override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from accounts.models import User
+from forecasting.cache import get_cache
+from forecasting.models import Assumption , FinancialModel , Formula , LineItem , ModelVersion , Period , Scenario
+from forecasting.synthetic import DEFAULT_PASSWORD
+from forecasting.urls import router
+
+API_PREFIX = '/api/v1/'
+PERCENTILES = (50, 95, 99)
+
+# query strings for GET actions that need more than the pk
+ACTION_QUERIES = {
+    ('finance-model', 'variance'): lambda ids: f"?budget_id={ids['scenarios'][0]}&actual_id={ids['scenarios'][-1]}",
+    ('scenario', 'diff'): lambda ids: f"?other={ids['scenarios'][-1]}",
+}
+# bodies of the POST actions that only compute; the writing ones run with --writes
+COMPUTE_PAYLOADS = {
+    ('finance-model', 'simulate'): lambda ids: {'scenario_id': ids['scenarios'][0], 'trials': 1000, 'seed': 0},
+    ('finance-model', 'valuation'): lambda ids: {'discount_rates': [0.08, 0.1, 0.12]},
+    ('finance-model', 'sensitivity'): lambda ids: {
+        'scenario_id': ids['scenarios'][0], 'ranges': [{'name': 'Growth', 'low': 0, 'high': 10, 'steps': 5}],
+    },
+    ('finance-model', 'forecast'): lambda ids: {'scenario_id': ids['scenarios'][0], 'periods': 12, 'dry_run': True},
+}
+WRITE_PAYLOADS = {
+    ('finance-model', 'recompute'): lambda ids: {},
+    ('finance-model', 'versions'): lambda ids: {'label': 'benchmark'},
+    ('scenario', 'clone'): lambda ids: {'name': 'Benchmark clone'},
+}
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def case(name, method, path, data=None, auth=True):
+    return {'name': name, 'method': method, 'path': path, 'data': data, 'auth': auth}
+
+
+class Command(BaseCommand):
+    help = (
+        "Time every router endpoint in forecasting/urls.py (list, retrieve and detail actions), the async "
+        "read paths and the auth endpoints against the local database; prints JSON with throughput, "
+        "p50/p95/p99 latency and query counts. Load data with generate_data first."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', default='bench0@example.com', help="Email of the user whose data is read.")
+        parser.add_argument('--password', default=DEFAULT_PASSWORD, help="The user's password, for the login endpoint.")
+        parser.add_argument('--iterations', type=int, default=20, help="Timed requests per endpoint.")
+        parser.add_argument('--warmup', type=int, default=2, help="Untimed requests per endpoint first.")
+        parser.add_argument('--warm-cache', action='store_true', help="Keep the response cache between requests (cleared by default).")
+        parser.add_argument('--writes', action='store_true', help="Also time endpoints that write (register, profile update, recompute, versions, clone).")
+        parser.add_argument('--only', action='append', default=[], help="Run only endpoints whose name contains this text (repeatable).")
+        parser.add_argument('--label', default='', help="Free text stored with the results, e.g. a branch name.")
+        parser.add_argument('--output', help="Write the JSON report here instead of stdout.")
+        parser.add_argument('--compare', help="Earlier JSON report to compare p95 latency and query counts against.")
+        parser.add_argument('--fail-threshold', type=float, help="With --compare: exit non-zero when p95 grows by more than this percent or queries grow.")
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1 or options['warmup'] < 0:
+            raise CommandError("--iterations must be positive and --warmup not negative.")
+        user = User.objects.filter(email=options['user']).first()
+        if user is None:
+            raise CommandError(f"No user {options['user']}; run generate_data first or pass --user.")
+        ids = self.object_ids(user)
+        cases = [
+            item for item in self.cases(user, ids, options)
+            if not options['only'] or any(text in item['name'] for text in options['only'])
+        ]
+
+        token = str(RefreshToken.for_user(user).access_token)
+        client = Client()
+        results = []
+        # the test client sends Host: testserver
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            for item in cases:
+                results.append(self.measure(client, token, item, options))
+                self.stderr.write(self.summary_line(results[-1]))
+
+        report = {
+            'meta': {
+                'started_at': datetime.now(timezone.utc).isoformat(),
+                'label': options['label'],
+                'git_revision': git_revision(),
+                'database': connection.vendor,
+                'iterations': options['iterations'],
+                'warmup': options['warmup'],
+                'cache': 'warm' if options['warm_cache'] else 'cold',
+                'dataset': ids['dataset'],
+            },
+            'results': results,
+        }
+        text = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                handle.write(text + '\n')
+        else:
+            self.stdout.write(text)
+        if options['compare']:
+            self.compare(options['compare'], report, options['fail_threshold'])
+
+    def object_ids(self, user):
+        # the user's model with the most line items, and one object of every other kind
+        model = (
+            FinancialModel.objects.filter(user=user).annotate(items=Count('line_items')).order_by('-items', 'id').first()
+        )
+        if model is None:
+            raise CommandError(f"{user.email} has no financial models.")
+        scenarios = list(Scenario.objects.filter(model=model).order_by('id').values_list('id', flat=True))
+        version = ModelVersion.objects.filter(model=model).order_by('-number').values_list('number', flat=True).first()
+        return {
+            'model': model.id,
+            'scenarios': scenarios,
+            'version': version,
+            'objects': {
+                'finance-model': model.id,
+                'period': Period.objects.filter(user=user).order_by('id').values_list('id', flat=True).first(),
+                'scenario': scenarios[0] if scenarios else None,
+                'line-item': LineItem.objects.filter(model=model).order_by('id').values_list('id', flat=True).first(),
+                'assumption': Assumption.objects.filter(model=model).order_by('id').values_list('id', flat=True).first(),
+                'formula': Formula.objects.filter(model=model).order_by('id').values_list('id', flat=True).first(),
+            },
+            'dataset': {
+                'model_id': model.id,
+                'scenarios': len(scenarios),
+                'periods': Period.objects.filter(user=user).count(),
+                'line_items': model.items,
+            },
+        }
+
+    def cases(self, user, ids, options):
+        payloads = {**COMPUTE_PAYLOADS, **(WRITE_PAYLOADS if options['writes'] else {})}
+        for prefix, viewset, _basename in router.registry:
+            pk = ids['objects'].get(prefix)
+            query = '' if prefix in ('finance-model', 'period') else f"?model_id={ids['model']}"
+            yield case(f'{prefix} list', 'GET', f'{prefix}/{query}')
+            if pk is None:
+                continue
+            yield case(f'{prefix} retrieve', 'GET', f'{prefix}/{pk}/')
+            for action in viewset.get_extra_actions():
+                url_path = action.url_path
+                if not action.detail:
+                    continue  # the list-level actions are uploads and calendar writes
+                if '(?P<number>' in url_path:
+                    if ids['version'] is None:
+                        continue
+                    url_path = url_path.replace(r'(?P<number>\d+)', str(ids['version']))
+                key = (prefix, action.__name__)
+                name = f'{prefix} {action.__name__}'
+                if not ids['scenarios'] and (key in ACTION_QUERIES or key in payloads):
+                    continue
+                for method in action.mapping:
+                    if method == 'get':
+                        query = ACTION_QUERIES[key](ids) if key in ACTION_QUERIES else ''
+                        yield case(name, 'GET', f'{prefix}/{pk}/{url_path}/{query}')
+                    elif method == 'post' and key in payloads:
+                        yield case(f'{name} (post)', 'POST', f'{prefix}/{pk}/{url_path}/', payloads[key](ids))
+
+        # the async read paths next to their DRF twins
+        yield case('async finance-model list', 'GET', 'async/finance-model/')
+        yield case('async finance-model summary', 'GET', f"async/finance-model/{ids['model']}/summary/")
+        yield case('async scenario list', 'GET', f"async/scenario/?model_id={ids['model']}")
+        yield case('async line-item list', 'GET', f"async/line-item/?model_id={ids['model']}")
+
+        yield case('auth login', 'POST', 'login/', {'email': user.email, 'password': options['password']}, auth=False)
+        yield case('auth profile', 'GET', 'profile/')
+        if options['writes']:
+            yield case('auth register', 'POST', 'register/', lambda: {
+                'email': f'register-{uuid.uuid4().hex}@example.com', 'password': 'benchmark-pass', 'first_name': 'B', 'last_name': 'R',
+            }, auth=False)
+            yield case('auth profile update', 'PUT', 'profile/update', {
+                'first_name': user.first_name, 'last_name': user.last_name, 'company_name': user.company_name,
+            })
+
+    def request(self, client, token, item):
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {token}'} if item['auth'] else {}
+        path = API_PREFIX + item['path']
+        data = item['data']() if callable(item['data']) else item['data']
+        if item['method'] == 'GET':
+            response = client.get(path, **headers)
+        else:
+            response = getattr(client, item['method'].lower())(path, json.dumps(data), content_type='application/json', **headers)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return response.status_code
+
+    def measure(self, client, token, item, options):
+        for _ in range(options['warmup']):
+            self.request(client, token, item)
+        latencies, queries, statuses = [], [], []
+        for _ in range(options['iterations']):
+            if not options['warm_cache']:
+                get_cache().clear()
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                statuses.append(self.request(client, token, item))
+                latencies.append((time.perf_counter() - started) * 1000)
+            queries.append(len(captured))
+        latencies = np.array(latencies)
+        return {
+            'name': item['name'],
+            'method': item['method'],
+            'path': API_PREFIX + item['path'],
+            'status': max(set(statuses), key=statuses.count),
+            'errors': sum(1 for status in statuses if status >= 400),
+            'iterations': len(statuses),
+            'throughput_rps': round(len(latencies) / (latencies.sum() / 1000), 2) if latencies.sum() else None,
+            'latency_ms': {
+                **{f'p{p}': round(float(value), 3) for p, value in zip(PERCENTILES, np.percentile(latencies, PERCENTILES))},
+                'mean': round(float(latencies.mean()), 3),
+                'max': round(float(latencies.max()), 3),
+            },
+            'queries': {'mean': round(float(np.mean(queries)), 2), 'max': int(max(queries))},
+        }
+
+    def summary_line(self, result):
+        latency = result['latency_ms']
+        return (
+            f"{result['method']:<5}{result['name']:<42}{result['status']:>4}  p50 {latency['p50']:>9.2f}  "
+            f"p95 {latency['p95']:>9.2f}  p99 {latency['p99']:>9.2f} ms  queries {result['queries']['max']}"
+        )
+
+    def compare(self, path, report, threshold):
+        with open(path) as handle:
+            baseline = {result['name']: result for result in json.load(handle)['results']}
+        regressions = []
+        self.stderr.write(f"\n{'endpoint':<47}{'p95 before':>12}{'p95 now':>12}{'change':>9}{'queries':>12}")
+        for result in report['results']:
+            before = baseline.get(result['name'])
+            if before is None:
+                continue
+            old, new = before['latency_ms']['p95'], result['latency_ms']['p95']
+            change = (new - old) / old * 100 if old else 0.0
+            queries = f"{before['queries']['max']} -> {result['queries']['max']}"
+            self.stderr.write(f"{result['name']:<47}{old:>12.2f}{new:>12.2f}{change:>8.1f}%{queries:>12}")
+            if threshold is not None and (change > threshold or result['queries']['max'] > before['queries']['max']):
+                regressions.append(result['name'])
+        if regressions:
+            raise CommandError(f"Regressed beyond {threshold}%: {', '.join(regressions)}")
@@ -0,0 +1,73 @@
+import re
+from django.core.management.base import BaseCommand , CommandError
+from django.db import connection
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from accounts.models import User
+from forecasting.export import export_queryset
+from forecasting.models import LineItem
+from forecasting.views import FinanceModelView , PeriodView , ScenarioView , LineItemView
+
+# plan lines that mean "read the whole table"
+SEQ_SCAN_PATTERNS = {
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+    'sqlite': re.compile(r'\bSCAN (\w+)\s*$', re.MULTILINE),
+}
+
+# (label, viewset, query params) - the filters the frontend actually sends
+VIEWSET_QUERIES = [
+    ('finance-model list', FinanceModelView, {}),
+    ('period list by period_type', PeriodView, {'period_type': 'monthly'}),
+    ('period list by period_type + start_date', PeriodView, {'period_type': 'monthly', 'start_date': '2025-01-01'}),
+    ('period list by start_date + end_date', PeriodView, {'start_date': '2025-01-01', 'end_date': '2025-01-31'}),
+    ('scenario list by model_id', ScenarioView, {'model_id': 1}),
+    ('line-item list', LineItemView, {}),
+    ('line-item list by model_id', LineItemView, {'model_id': 1}),
+    ('line-item flat list by model_id', LineItemView, {'model_id': 1, 'flat': 'true'}),
+]
+
+
+class Command(BaseCommand):
+    help = "Run EXPLAIN on the querysets behind each forecasting viewset and flag sequential scans."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plans', action='store_true', help="Print the full plan of every query.")
+        parser.add_argument('--fail-on-seq-scan', action='store_true', help="Exit non-zero if any query scans a whole table.")
+
+    def handle(self, *args, **options):
+        pattern = SEQ_SCAN_PATTERNS.get(connection.vendor)
+        if pattern is None:
+            self.stdout.write(self.style.WARNING(f"No scan detection for '{connection.vendor}', plans are printed unchecked."))
+            options['verbose_plans'] = True
+
+        flagged = []
+        for label, queryset in self.hot_queries():
+            plan = queryset.explain()
+            scans = sorted(set(pattern.findall(plan))) if pattern else []
+            if scans:
+                flagged.append(label)
+                self.stdout.write(self.style.WARNING(f"SEQ SCAN  {label}: {', '.join(scans)}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"INDEXED   {label}"))
+            if options['verbose_plans'] or scans:
+                for line in plan.splitlines():
+                    self.stdout.write(f"    {line}")
+
+        if flagged and options['fail_on_seq_scan']:
+            raise CommandError(f"{len(flagged)} queries use sequential scans: {', '.join(flagged)}")
+
+    def hot_queries(self):
+        user = User.objects.order_by('created_at').first() or User(email='explain@example.com')
+        factory = APIRequestFactory()
+        for label, viewset, params in VIEWSET_QUERIES:
+            request = Request(factory.get('/', params))
+            request.user = user
+            view = viewset(request=request, action='list', format_kwarg=None, args=(), kwargs={})
+            queryset = view.filter_queryset(view.get_queryset())
+            # the paginated SELECT, not the unbounded one
+            yield label, queryset[:10]
+
+        # compute paths outside the viewsets
+        yield 'summary matrix by model_id', LineItem.objects.filter(model_id=1).values_list('scenario_id', 'period_id', 'category', 'amount')
+        yield 'export by model_id + scenario', export_queryset(1, scenario_ids=[1])
+        yield 'export by model_id + category', export_queryset(1, categories=['Revenue'])
@@ -0,0 +1,59 @@
+import time
+from datetime import date
+from django.core.management.base import BaseCommand , CommandError
+from accounts.models import User
+from forecasting import synthetic
+from forecasting.ingest import DEFAULT_CHUNK_SIZE , MAX_CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate synthetic tenants for benchmarks: users, financial models, scenarios, a monthly "
+        "calendar and one line item per name, scenario and month, written in bulk. Deterministic per --seed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1)
+        parser.add_argument('--models', type=int, default=1, help="Financial models per user.")
+        parser.add_argument('--scenarios', type=int, default=3, help="Scenarios per model.")
+        parser.add_argument('--periods', type=int, default=36, help="Months per user calendar (quarters and years are added).")
+        parser.add_argument('--items', type=int, default=12, help="Line item names per scenario and month.")
+        parser.add_argument('--start', type=date.fromisoformat, default=synthetic.DEFAULT_START, help="First month, YYYY-MM-DD.")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--prefix', default='bench', help="Users are <prefix><n>@example.com.")
+        parser.add_argument('--password', default=synthetic.DEFAULT_PASSWORD)
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--reset', action='store_true', help="Delete earlier users with the same prefix (and their data) first.")
+
+    def handle(self, *args, **options):
+        for option in ('users', 'models', 'scenarios', 'periods', 'items'):
+            if options[option] < 1:
+                raise CommandError(f"--{option} must be positive.")
+        if not 1 <= options['chunk_size'] <= MAX_CHUNK_SIZE:
+            raise CommandError(f"--chunk-size must be between 1 and {MAX_CHUNK_SIZE}.")
+
+        existing = User.objects.filter(email__regex=rf"^{options['prefix']}[0-9]+@example\.com$")
+        if existing.exists():
+            if not options['reset']:
+                raise CommandError(f"Users {options['prefix']}<n>@example.com already exist; pass --reset to replace them.")
+            existing.delete()
+
+        total = options['users'] * options['models'] * options['scenarios'] * options['periods'] * options['items']
+        self.stdout.write(f"Generating {total} line items ...")
+        started = time.perf_counter()
+
+        def progress(counts):
+            self.stdout.write(f"  {counts['models']} models, {counts['line_items']} line items ({time.perf_counter() - started:.1f}s)")
+
+        counts = synthetic.generate(
+            users=options['users'], models=options['models'], scenarios=options['scenarios'], periods=options['periods'],
+            items=options['items'], start=options['start'], seed=options['seed'], prefix=options['prefix'],
+            chunk_size=options['chunk_size'], password=options['password'],
+            progress=progress if options['verbosity'] > 1 else None,
+        )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {counts['users']} users, {counts['models']} models, {counts['scenarios']} scenarios, "
+            f"{counts['periods']} periods and {counts['line_items']} line items in {elapsed:.1f}s "
+            f"({counts['line_items'] / elapsed if elapsed else 0:.0f} rows/s)."
+        ))
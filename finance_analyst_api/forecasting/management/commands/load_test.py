@@ -0,0 +1,155 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.request import Request , urlopen
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand , CommandError
+from django.test import AsyncClient , Client
+from django.test.utils import override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from accounts.models import User
+from forecasting.models import FinancialModel
+
+API_PREFIX = '/api/v1/'
+
+
+def endpoints(model_id):
+    # (label, DRF path, async path) pairs of the hot dashboard reads
+    return [
+        ('finance-model list', 'finance-model/', 'async/finance-model/'),
+        ('summary', f'finance-model/{model_id}/summary/', f'async/finance-model/{model_id}/summary/'),
+        ('scenario list', f'scenario/?model_id={model_id}', f'async/scenario/?model_id={model_id}'),
+        ('line-item list', f'line-item/?model_id={model_id}&flat=true', f'async/line-item/?model_id={model_id}&flat=true'),
+    ]
+
+
+def with_param(path, name, value):
+    return f"{path}{'&' if '?' in path else '?'}{name}={value}"
+
+
+class Command(BaseCommand):
+    help = (
+        "Fire concurrent GETs at the DRF (WSGI) and async (ASGI) read endpoints and compare req/s. "
+        "In-process by default; --wsgi-url / --asgi-url measure running servers instead "
+        "(e.g. gunicorn core.wsgi vs uvicorn core.asgi)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help="Email of the user to authenticate as (default: owner of the first model).")
+        parser.add_argument('--model', type=int, help="Financial model id for the summary / list filters.")
+        parser.add_argument('--concurrency', type=int, default=32, help="Requests in flight at once.")
+        parser.add_argument('--requests', type=int, default=500, help="Requests per endpoint and server type.")
+        parser.add_argument('--bust-cache', action='store_true', help="Make every URL unique so the DRF response cache never hits.")
+        parser.add_argument('--wsgi-url', help="Base URL of a running WSGI server, e.g. http://127.0.0.1:8000")
+        parser.add_argument('--asgi-url', help="Base URL of a running ASGI server, e.g. http://127.0.0.1:8001")
+
+    def handle(self, *args, **options):
+        if bool(options['wsgi_url']) != bool(options['asgi_url']):
+            raise CommandError("Pass both --wsgi-url and --asgi-url, or neither for an in-process run.")
+        if options['concurrency'] < 1 or options['requests'] < 1:
+            raise CommandError("--concurrency and --requests must be positive.")
+        model = self.pick_model(options)
+        token = str(RefreshToken.for_user(model.user).access_token)
+        self.concurrency = options['concurrency']
+        self.total = options['requests']
+        self.bust_cache = options['bust_cache']
+
+        self.stdout.write(
+            f"{self.total} requests per run, concurrency {self.concurrency}, model {model.id} "
+            f"({'live servers' if options['wsgi_url'] else 'in-process'})"
+        )
+        self.stdout.write(f"{'endpoint':<22}{'server':<7}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'errors':>8}")
+        for label, sync_path, async_path in endpoints(model.id):
+            if options['wsgi_url']:
+                wsgi = self.run_threads(self.live_get(options['wsgi_url'], token), sync_path)
+                asgi = self.run_threads(self.live_get(options['asgi_url'], token), async_path)
+            else:
+                # the test clients send Host: testserver
+                with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                    wsgi = self.run_threads(self.wsgi_get(token), sync_path)
+                    asgi = asyncio.run(self.run_async(token, async_path))
+            for server, result in (('wsgi', wsgi), ('asgi', asgi)):
+                self.report(label, server, result)
+            if wsgi['rate']:
+                self.stdout.write(self.style.SUCCESS(f"{'':<22}asgi / wsgi: {asgi['rate'] / wsgi['rate']:.2f}x"))
+
+    def pick_model(self, options):
+        models = FinancialModel.objects.select_related('user').order_by('id')
+        if options['user']:
+            user = User.objects.filter(email=options['user']).first()
+            if user is None:
+                raise CommandError(f"No user with email {options['user']}.")
+            models = models.filter(user=user)
+        if options['model']:
+            models = models.filter(id=options['model'])
+        model = models.first()
+        if model is None:
+            raise CommandError("No financial model to load test; create one (or pass --user / --model).")
+        return model
+
+    def path(self, path, index):
+        path = API_PREFIX + path
+        return with_param(path, 'nocache', index) if self.bust_cache else path
+
+    def wsgi_get(self, token):
+        # django.test.Client drives the WSGI handler; one client per worker thread
+        local = threading.local()
+
+        def get(path):
+            if not hasattr(local, 'client'):
+                local.client = Client()
+            return local.client.get(path, HTTP_AUTHORIZATION=f'Bearer {token}').status_code
+        return get
+
+    def live_get(self, base_url, token):
+        def get(path):
+            request = Request(base_url.rstrip('/') + path, headers={'Authorization': f'Bearer {token}'})
+            try:
+                with urlopen(request) as response:
+                    response.read()
+                    return response.status
+            except OSError as error:
+                return getattr(error, 'code', 599)  # HTTPError carries the status
+        return get
+
+    def run_threads(self, get, path):
+        def timed(index):
+            started = time.perf_counter()
+            status = get(self.path(path, index))
+            return time.perf_counter() - started, status
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            results = list(pool.map(timed, range(self.total)))
+        return self.summarize(results, time.perf_counter() - started)
+
+    async def run_async(self, token, path):
+        # AsyncClient drives the ASGI handler; the semaphore caps requests in flight
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def timed(index):
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.get(self.path(path, index), headers={'Authorization': f'Bearer {token}'})
+                return time.perf_counter() - started, response.status_code
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(timed(index) for index in range(self.total)))
+        return self.summarize(results, time.perf_counter() - started)
+
+    def summarize(self, results, elapsed):
+        latencies = np.array([latency for latency, _status in results]) * 1000
+        return {
+            'rate': len(results) / elapsed if elapsed else 0.0,
+            'p50': float(np.percentile(latencies, 50)),
+            'p95': float(np.percentile(latencies, 95)),
+            'errors': sum(1 for _latency, status in results if status != 200),
+        }
+
+    def report(self, label, server, result):
+        self.stdout.write(
+            f"{label:<22}{server:<7}{result['rate']:>10.1f}{result['p50']:>10.2f}{result['p95']:>10.2f}{result['errors']:>8}"
+        )
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from forecasting import rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute PeriodRollup rows from line items (all models, or the given model ids)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('model_ids', nargs='*', type=int, help="Financial model ids to rebuild.")
+
+    def handle(self, *args, **options):
+        count = rollups.rebuild(options['model_ids'] or None)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} rollup rows."))
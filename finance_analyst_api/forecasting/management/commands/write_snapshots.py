@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from forecasting import columnar
+from forecasting.models import FinancialModel , ModelVersion
+
+
+class Command(BaseCommand):
+    help = (
+        "Write columnar snapshots (forecasting.columnar) of the current revision of every model, or the "
+        "given model ids, skipping those already on disk; --versions also writes every saved version."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('model_ids', nargs='*', type=int, help="Financial model ids to snapshot.")
+        parser.add_argument('--versions', action='store_true', help="Also snapshot the models' saved versions.")
+
+    def handle(self, *args, **options):
+        models = FinancialModel.objects.order_by('id')
+        if options['model_ids']:
+            models = models.filter(id__in=options['model_ids'])
+        count = 0
+        for model_id in models.values_list('id', flat=True).iterator():
+            snapshot = columnar.live_snapshot(model_id)
+            self.stdout.write(f"{snapshot.path}  {len(snapshot)} rows")
+            count += 1
+            if options['versions']:
+                for version in ModelVersion.objects.filter(model_id=model_id).order_by('number'):
+                    snapshot = columnar.version_snapshot(version)
+                    self.stdout.write(f"{snapshot.path}  {len(snapshot)} rows")
+                    count += 1
+        self.stdout.write(self.style.SUCCESS(f"{count} snapshots in {columnar.snapshot_root()}."))
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.20 on 2026-10-18 17:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forecasting', '0004_scenario_user'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='lineitem',
+            index=models.Index(fields=['model', 'scenario', 'period'], name='lineitem_model_scen_per_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lineitem',
+            index=models.Index(fields=['model', 'category'], name='lineitem_model_category_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='period',
+            index=models.Index(fields=['period_type', 'start_date'], name='period_type_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='period',
+            index=models.Index(fields=['start_date', 'end_date'], name='period_start_end_idx'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.20 on 2026-10-18 17:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_rollups(apps, schema_editor):
+    LineItem = apps.get_model('forecasting', 'LineItem')
+    PeriodRollup = apps.get_model('forecasting', 'PeriodRollup')
+    aggregates = (
+        LineItem.objects.values('model_id', 'scenario_id', 'period_id', 'category')
+        .annotate(total=models.Sum('amount'), count=models.Count('id'))
+        .order_by()
+    )
+    PeriodRollup.objects.bulk_create([PeriodRollup(**row) for row in aggregates], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forecasting', '0005_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PeriodRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(choices=[('Revenue', 'Revenue'), ('Expense', 'Expense'), ('Asset', 'Asset'), ('Liability', 'Liability'), ('Equity', 'Equity'), ('Other', 'Other')], max_length=50)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('count', models.IntegerField(default=0)),
+                ('model', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='forecasting.financialmodel')),
+                ('period', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='forecasting.period')),
+                ('scenario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='forecasting.scenario')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='periodrollup',
+            constraint=models.UniqueConstraint(fields=('model', 'scenario', 'period', 'category'), name='unique_period_rollup'),
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.20 on 2026-10-18 17:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forecasting', '0006_periodrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assumption',
+            name='applies_to',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='assumption',
+            name='distribution',
+            field=models.CharField(choices=[('fixed', 'Fixed'), ('normal', 'Normal'), ('uniform', 'Uniform'), ('triangular', 'Triangular')], default='fixed', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='assumption',
+            name='max_value',
+            field=models.DecimalField(blank=True, decimal_places=4, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='assumption',
+            name='min_value',
+            field=models.DecimalField(blank=True, decimal_places=4, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='assumption',
+            name='stdev',
+            field=models.DecimalField(blank=True, decimal_places=4, max_digits=10, null=True),
+        ),
+    ]
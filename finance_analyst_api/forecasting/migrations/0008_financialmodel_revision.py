@@ -0,0 +1,18 @@
+# Generated by Django 4.2.20 on 2026-10-18 17:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forecasting', '0007_assumption_distribution'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='financialmodel',
+            name='revision',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
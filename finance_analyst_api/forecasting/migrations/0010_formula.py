@@ -0,0 +1,33 @@
+# Generated by Django 4.2.20 on 2026-10-18 17:24
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forecasting', '0009_importjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Formula',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('category', models.CharField(choices=[('Revenue', 'Revenue'), ('Expense', 'Expense'), ('Asset', 'Asset'), ('Liability', 'Liability'), ('Equity', 'Equity'), ('Other', 'Other')], max_length=50)),
+                ('expression', models.TextField()),
+                ('model', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='formulas', to='forecasting.financialmodel')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='lineitem',
+            name='formula',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='line_items', to='forecasting.formula'),
+        ),
+        migrations.AddConstraint(
+            model_name='formula',
+            constraint=models.UniqueConstraint(fields=('model', 'name'), name='unique_formula_name'),
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 4.2.20 on 2026-10-18 17:32
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('forecasting', '0010_formula'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ModelVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField()),
+                ('label', models.CharField(blank=True, max_length=50)),
+                ('note', models.TextField(blank=True)),
+                ('scenarios', models.JSONField(blank=True, default=dict)),
+                ('line_items', models.PositiveIntegerField(default=0)),
+                ('assumptions', models.PositiveIntegerField(default=0)),
+                ('changed_rows', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('created_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('model', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='forecasting.financialmodel')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='VersionedLineItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_id', models.BigIntegerField()),
+                ('scenario_id', models.BigIntegerField()),
+                ('valid_from', models.PositiveIntegerField()),
+                ('valid_to', models.PositiveIntegerField(blank=True, null=True)),
+                ('name', models.CharField(max_length=255)),
+                ('category', models.CharField(choices=[('Revenue', 'Revenue'), ('Expense', 'Expense'), ('Asset', 'Asset'), ('Liability', 'Liability'), ('Equity', 'Equity'), ('Other', 'Other')], max_length=50)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('derived', models.BooleanField(default=False)),
+                ('model', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='forecasting.financialmodel')),
+                ('period', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='forecasting.period')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['model', 'valid_from', 'valid_to'], name='versioned_item_range_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='VersionedAssumption',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_id', models.BigIntegerField()),
+                ('scenario_id', models.BigIntegerField()),
+                ('valid_from', models.PositiveIntegerField()),
+                ('valid_to', models.PositiveIntegerField(blank=True, null=True)),
+                ('name', models.CharField(max_length=100)),
+                ('value', models.DecimalField(decimal_places=4, max_digits=10)),
+                ('unit', models.CharField(default='%', max_length=20)),
+                ('distribution', models.CharField(choices=[('fixed', 'Fixed'), ('normal', 'Normal'), ('uniform', 'Uniform'), ('triangular', 'Triangular')], default='fixed', max_length=20)),
+                ('stdev', models.DecimalField(blank=True, decimal_places=4, max_digits=10, null=True)),
+                ('min_value', models.DecimalField(blank=True, decimal_places=4, max_digits=10, null=True)),
+                ('max_value', models.DecimalField(blank=True, decimal_places=4, max_digits=10, null=True)),
+                ('applies_to', models.CharField(blank=True, max_length=255)),
+                ('model', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='forecasting.financialmodel')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['model', 'valid_from', 'valid_to'], name='versioned_assumption_range_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='modelversion',
+            constraint=models.UniqueConstraint(fields=('model', 'number'), name='unique_model_version'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.20 on 2026-10-18 17:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+GRAINS = ('monthly', 'quarterly', 'yearly')
+
+
+def link_parents(apps, schema_editor):
+    # same rule as forecasting.periods.link_periods, per user calendar
+    Period = apps.get_model('forecasting', 'Period')
+    periods = list(Period.objects.order_by('start_date', 'id').values('id', 'user_id', 'period_type', 'start_date', 'end_date'))
+    changed = []
+    for period in periods:
+        if period['period_type'] not in GRAINS[:-1]:
+            continue
+        coarser = GRAINS[GRAINS.index(period['period_type']) + 1]
+        parent = None
+        for candidate in periods:
+            if candidate['start_date'] > period['start_date']:
+                break
+            if (candidate['user_id'] == period['user_id'] and candidate['period_type'] == coarser
+                    and candidate['end_date'] >= period['end_date']):
+                parent = candidate['id']
+        if parent is not None:
+            changed.append(Period(id=period['id'], parent_id=parent))
+    Period.objects.bulk_update(changed, ['parent'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forecasting', '0011_model_versions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='period',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='children', to='forecasting.period'),
+        ),
+        migrations.RunPython(link_parents, migrations.RunPython.noop),
+    ]
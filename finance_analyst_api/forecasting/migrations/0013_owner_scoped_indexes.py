@@ -0,0 +1,46 @@
+# Generated by Django 4.2.20 on 2026-10-18 17:53
+
+from django.db import migrations, models
+
+
+def scenario_owners(apps, schema_editor):
+    # Scenario.user is now what scopes scenarios; it must be the model's owner
+    Scenario = apps.get_model('forecasting', 'Scenario')
+    FinancialModel = apps.get_model('forecasting', 'FinancialModel')
+    owner = FinancialModel.objects.filter(id=models.OuterRef('model_id')).values('user_id')[:1]
+    Scenario.objects.exclude(user_id=models.Subquery(owner)).update(user_id=models.Subquery(owner))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forecasting', '0012_period_parent'),
+    ]
+
+    operations = [
+        migrations.RunPython(scenario_owners, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='period',
+            name='period_type_start_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='period',
+            name='period_start_end_idx',
+        ),
+        migrations.AddIndex(
+            model_name='financialmodel',
+            index=models.Index(fields=['user', 'id'], name='finmodel_user_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='period',
+            index=models.Index(fields=['user', 'period_type', 'start_date'], name='period_user_type_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='period',
+            index=models.Index(fields=['user', 'start_date', 'end_date'], name='period_user_start_end_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='scenario',
+            index=models.Index(fields=['user', 'model', 'id'], name='scenario_user_model_id_idx'),
+        ),
+    ]
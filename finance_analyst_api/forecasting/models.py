@@ -1,8 +1,20 @@
 # modelsheet/models.py
 
+import uuid
 from django.db import models
 from accounts.models import User  # assuming you have custom users
 
+# Tenant scoping shared by the forecasting models: Model.objects.owned_by(user) keeps one
+# user's rows; owner_field is the lookup from a row to the user who owns it
+class OwnedQuerySet(models.QuerySet):
+    def owned_by(self, user):
+        return self.filter(**{self.model.owner_field: user})
+
+class PeriodQuerySet(OwnedQuerySet):
+    def owned_by(self, user):
+        # periods without a user are a shared calendar every tenant may use
+        return self.filter(models.Q(user=user) | models.Q(user__isnull=True))
+
 # Periods (Monthly, Quarterly, Yearly)
 class Period(models.Model):
     PERIOD_TYPES = [
@@ -15,6 +27,18 @@ class Period(models.Model):
     end_date = models.DateField()
     period_type = models.CharField(max_length=20, choices=PERIOD_TYPES)
     user = models.ForeignKey(User, on_delete=models.CASCADE , null=True)
+    # the next coarser period containing this one (month -> quarter -> year), see forecasting.periods
+    parent = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, related_name='children')
+
+    objects = PeriodQuerySet.as_manager()
+    owner_field = 'user'
+
+    class Meta:
+        indexes = [
+            # PeriodView filters within one user: period_type (+ start_date), start_date + end_date
+            models.Index(fields=['user', 'period_type', 'start_date'], name='period_user_type_start_idx'),
+            models.Index(fields=['user', 'start_date', 'end_date'], name='period_user_start_end_idx'),
+        ]
 
     def __str__(self):
         return f"{self.label} ({self.period_type})"
@@ -45,16 +69,50 @@ class FinancialModel(models.Model):
     version = models.CharField(max_length=50)
     model_type = models.CharField(max_length=20, choices=MODEL_TYPES)
     created_at = models.DateTimeField(auto_now_add=True)
+    # bumped on every write to the model's scenarios, line items or assumptions
+    revision = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = OwnedQuerySet.as_manager()
+    owner_field = 'user'
+
+    class Meta:
+        indexes = [
+            # a user's models in list order
+            models.Index(fields=['user', 'id'], name='finmodel_user_id_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} (v{self.version}) - {self.model_type}"
 
+    def save(self, *args, **kwargs):
+        # revision only moves through bump_revision(); a full save of a stale instance
+        # must not write an old value back
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields if not field.primary_key and field.name != 'revision'
+            ]
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def bump_revision(cls, model_id):
+        # invalidates everything memoized against the previous revision
+        cls.objects.filter(pk=model_id).update(revision=models.F('revision') + 1)
+
 # Scenarios (Base, Worst Case, Best Case)
 class Scenario(models.Model):
     model = models.ForeignKey(FinancialModel, on_delete=models.CASCADE, related_name='scenarios')
     name = models.CharField(max_length=100)
     description = models.TextField(blank=True)
-    user = models.ForeignKey(User, on_delete=models.CASCADE , null=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE , null=True)  # the model's owner
+
+    objects = OwnedQuerySet.as_manager()
+    owner_field = 'user'
+
+    class Meta:
+        indexes = [
+            # ScenarioView lists: a user's scenarios, narrowed by ?model_id=
+            models.Index(fields=['user', 'model', 'id'], name='scenario_user_model_id_idx'),
+        ]
 
     def __str__(self):
         return f"{self.model.name} - {self.name}"
@@ -77,17 +135,169 @@ class LineItem(models.Model):
     category = models.CharField(max_length=50, choices=CATEGORY_CHOICES)
     amount = models.DecimalField(max_digits=15, decimal_places=2)
     # currency  choice field :To Do
+    # set on rows computed by a Formula; those are rewritten by forecasting.formulas
+    formula = models.ForeignKey('Formula', on_delete=models.CASCADE, null=True, blank=True, related_name='line_items')
+
+    objects = OwnedQuerySet.as_manager()
+    owner_field = 'model__user'
+
+    class Meta:
+        indexes = [
+            # per-model reads narrowed by scenario and period (summary, export, list)
+            models.Index(fields=['model', 'scenario', 'period'], name='lineitem_model_scen_per_idx'),
+            models.Index(fields=['model', 'category'], name='lineitem_model_category_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} - {self.period.label}: ${self.amount}"
 
 # Assumptions
 class Assumption(models.Model):
+    DISTRIBUTIONS = [
+        ('fixed', 'Fixed'),
+        ('normal', 'Normal'),
+        ('uniform', 'Uniform'),
+        ('triangular', 'Triangular'),
+    ]
+
     model = models.ForeignKey(FinancialModel, on_delete=models.CASCADE, related_name='assumptions')
     scenario = models.ForeignKey(Scenario, on_delete=models.CASCADE)
     name = models.CharField(max_length=100)  # e.g., Growth Rate
     value = models.DecimalField(max_digits=10, decimal_places=4)
     unit = models.CharField(max_length=20, default='%')  # %, $, ratio
+    # simulation inputs: value is the mean (normal) or mode (triangular)
+    distribution = models.CharField(max_length=20, choices=DISTRIBUTIONS, default='fixed')
+    stdev = models.DecimalField(max_digits=10, decimal_places=4, null=True, blank=True)
+    min_value = models.DecimalField(max_digits=10, decimal_places=4, null=True, blank=True)
+    max_value = models.DecimalField(max_digits=10, decimal_places=4, null=True, blank=True)
+    applies_to = models.CharField(max_length=255, blank=True)  # line item name or category it drives
+
+    objects = OwnedQuerySet.as_manager()
+    owner_field = 'model__user'
 
     def __str__(self):
         return f"{self.name} ({self.value}{self.unit})"
+
+# Driver formula: line item `name` = expression over assumptions and other line items,
+# e.g. "Units * Price" or "[Unit Price] * (1 + [Growth Rate] / 100)"
+class Formula(models.Model):
+    model = models.ForeignKey(FinancialModel, on_delete=models.CASCADE, related_name='formulas')
+    name = models.CharField(max_length=255)  # line item it produces
+    category = models.CharField(max_length=50, choices=LineItem.CATEGORY_CHOICES)
+    expression = models.TextField()
+
+    objects = OwnedQuerySet.as_manager()
+    owner_field = 'model__user'
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['model', 'name'], name='unique_formula_name'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} = {self.expression}"
+
+# Pre-aggregated line item sums per (model, scenario, period, category),
+# kept current by forecasting.rollups on every line item write
+class PeriodRollup(models.Model):
+    model = models.ForeignKey(FinancialModel, on_delete=models.CASCADE, related_name='rollups')
+    scenario = models.ForeignKey(Scenario, on_delete=models.CASCADE)
+    period = models.ForeignKey(Period, on_delete=models.CASCADE)
+    category = models.CharField(max_length=50, choices=LineItem.CATEGORY_CHOICES)
+    total = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['model', 'scenario', 'period', 'category'], name='unique_period_rollup'),
+        ]
+
+    def __str__(self):
+        return f"{self.model_id}/{self.scenario_id}/{self.period_id} {self.category}: {self.total}"
+
+# Background spreadsheet import started from /line-item/upload/
+class ImportJob(models.Model):
+    STATUSES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    file_name = models.CharField(max_length=255)
+    status = models.CharField(max_length=20, choices=STATUSES, default='pending')
+    processed_rows = models.PositiveIntegerField(default=0)
+    created_rows = models.PositiveIntegerField(default=0)
+    failed_rows = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)  # first MAX_STORED_ERRORS row errors
+    detail = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.file_name} ({self.status})"
+
+# Frozen snapshot of a model's line items and assumptions. Rows live in the Versioned*
+# tables with a [valid_from, valid_to) range of snapshot numbers: a snapshot only writes
+# the rows that changed since the previous one, every unchanged row is shared.
+class ModelVersion(models.Model):
+    model = models.ForeignKey(FinancialModel, on_delete=models.CASCADE, related_name='snapshots')
+    number = models.PositiveIntegerField()
+    label = models.CharField(max_length=50, blank=True)
+    note = models.TextField(blank=True)
+    scenarios = models.JSONField(default=dict, blank=True)  # {id: name} when the snapshot was taken
+    line_items = models.PositiveIntegerField(default=0)
+    assumptions = models.PositiveIntegerField(default=0)
+    changed_rows = models.PositiveIntegerField(default=0)  # rows written for this snapshot
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['model', 'number'], name='unique_model_version'),
+        ]
+
+    def __str__(self):
+        return f"{self.model_id} v{self.number} {self.label}"
+
+
+class VersionedRow(models.Model):
+    model = models.ForeignKey(FinancialModel, on_delete=models.CASCADE)
+    source_id = models.BigIntegerField()  # id of the live row
+    scenario_id = models.BigIntegerField()  # plain id, the snapshot outlives deleted scenarios
+    valid_from = models.PositiveIntegerField()
+    valid_to = models.PositiveIntegerField(null=True, blank=True)  # null: still current
+
+    class Meta:
+        abstract = True
+
+
+class VersionedLineItem(VersionedRow):
+    period = models.ForeignKey(Period, on_delete=models.CASCADE)
+    name = models.CharField(max_length=255)
+    category = models.CharField(max_length=50, choices=LineItem.CATEGORY_CHOICES)
+    amount = models.DecimalField(max_digits=15, decimal_places=2)
+    derived = models.BooleanField(default=False)  # produced by a formula
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['model', 'valid_from', 'valid_to'], name='versioned_item_range_idx'),
+        ]
+
+
+class VersionedAssumption(VersionedRow):
+    name = models.CharField(max_length=100)
+    value = models.DecimalField(max_digits=10, decimal_places=4)
+    unit = models.CharField(max_length=20, default='%')
+    distribution = models.CharField(max_length=20, choices=Assumption.DISTRIBUTIONS, default='fixed')
+    stdev = models.DecimalField(max_digits=10, decimal_places=4, null=True, blank=True)
+    min_value = models.DecimalField(max_digits=10, decimal_places=4, null=True, blank=True)
+    max_value = models.DecimalField(max_digits=10, decimal_places=4, null=True, blank=True)
+    applies_to = models.CharField(max_length=255, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['model', 'valid_from', 'valid_to'], name='versioned_assumption_range_idx'),
+        ]
@@ -0,0 +1,60 @@
+from rest_framework.pagination import PageNumberPagination , CursorPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param , replace_query_param
+
+MAX_PAGE_SIZE = 1000
+
+
+# keyset pagination on the primary key: WHERE id > last_seen, no OFFSET and no COUNT(*)
+class KeysetPagination(CursorPagination):
+    ordering = 'id'
+    page_size_query_param = 'page_size'
+    max_page_size = MAX_PAGE_SIZE
+
+
+# Page-number pagination stays the default so existing ?page=N clients keep working.
+#   ?cursor=... or ?pagination=cursor  -> keyset pages (constant time at any depth)
+#   ?count=false                       -> page numbers without the COUNT(*) query
+#   ?page_size=N                       -> client page size, capped at MAX_PAGE_SIZE
+class ForecastingPagination(PageNumberPagination):
+    page_size_query_param = 'page_size'
+    max_page_size = MAX_PAGE_SIZE
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.keyset = None
+        if 'cursor' in request.query_params or request.query_params.get('pagination') == 'cursor':
+            self.keyset = KeysetPagination()
+            return self.keyset.paginate_queryset(queryset, request, view)
+
+        self.with_count = request.query_params.get('count', '').lower() not in ('0', 'false', 'no')
+        if self.with_count:
+            return super().paginate_queryset(queryset, request, view)
+
+        # fetch one extra row to know whether there is a next page
+        page_size = self.get_page_size(request)
+        try:
+            self.number = max(1, int(request.query_params.get(self.page_query_param, 1)))
+        except ValueError:
+            self.number = 1
+        offset = (self.number - 1) * page_size
+        rows = list(queryset[offset:offset + page_size + 1])
+        self.has_next = len(rows) > page_size
+        return rows[:page_size]
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        if self.with_count:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_uncounted_link(self.number + 1) if self.has_next else None,
+            'previous': self.get_uncounted_link(self.number - 1) if self.number > 1 else None,
+            'results': data,
+        })
+
+    def get_uncounted_link(self, number):
+        url = self.request.build_absolute_uri()
+        if number == 1:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.page_query_param, number)
@@ -0,0 +1,112 @@
+import calendar
+from bisect import bisect_right
+from datetime import date , timedelta
+from django.db import transaction
+from django.db.models import F , Q
+from .models import FinancialModel , Period
+
+# finest to coarsest; every period's parent is the period of the next grain containing it
+GRAINS = ('monthly', 'quarterly', 'yearly')
+LEVEL = {grain: level for level, grain in enumerate(GRAINS)}
+STEP_MONTHS = {'monthly': 1, 'quarterly': 3, 'yearly': 12}
+MAX_CALENDAR_YEARS = 50
+
+
+def add_months(day, months):
+    month = day.month - 1 + months
+    year = day.year + month // 12
+    month = month % 12 + 1
+    return date(year, month, min(day.day, calendar.monthrange(year, month)[1]))
+
+
+def period_label(start_date, period_type):
+    if period_type == 'quarterly':
+        return f"Q{(start_date.month - 1) // 3 + 1} {start_date.year}"
+    if period_type == 'yearly':
+        return f"FY {start_date.year}"
+    return start_date.strftime('%b %Y')
+
+
+def grain_start(day, grain):
+    if grain == 'yearly':
+        return date(day.year, 1, 1)
+    if grain == 'quarterly':
+        return date(day.year, (day.month - 1) // 3 * 3 + 1, 1)
+    return date(day.year, day.month, 1)
+
+
+def spans(start, end, grain):
+    # calendar-aligned (start, end) pairs of `grain` covering start..end
+    result = []
+    current = grain_start(start, grain)
+    while current <= end:
+        following = add_months(current, STEP_MONTHS[grain])
+        result.append((current, following - timedelta(days=1)))
+        current = following
+    return result
+
+
+def ancestor_path(source, grain):
+    # lookup from a PeriodRollup / LineItem to the period of `grain` containing its `source` period
+    depth = LEVEL[grain] - LEVEL[source]
+    if depth < 0:
+        raise ValueError(f"Cannot roll {source} periods up to {grain}.")
+    return '__'.join(['period'] + ['parent'] * depth)
+
+
+def link_periods(user):
+    # Store each period's parent (the next grain's period containing it) for one user's
+    # calendar; runs on period writes so reads follow the links instead of comparing dates.
+    periods = list(Period.objects.filter(user=user).values('id', 'period_type', 'start_date', 'end_date', 'parent_id'))
+    by_grain = {grain: [] for grain in GRAINS}
+    for period in periods:
+        if period['period_type'] in by_grain:
+            by_grain[period['period_type']].append(period)
+    starts = {}
+    for grain, candidates in by_grain.items():
+        candidates.sort(key=lambda period: (period['start_date'], period['id']))
+        starts[grain] = [candidate['start_date'] for candidate in candidates]
+
+    changed = []
+    for period in periods:
+        parent_id = None
+        level = LEVEL.get(period['period_type'])
+        if level is not None and level + 1 < len(GRAINS):
+            candidates = by_grain[GRAINS[level + 1]]
+            index = bisect_right(starts[GRAINS[level + 1]], period['start_date']) - 1
+            if index >= 0 and candidates[index]['end_date'] >= period['end_date']:
+                parent_id = candidates[index]['id']
+        if parent_id != period['parent_id']:
+            changed.append(Period(id=period['id'], parent_id=parent_id))
+    Period.objects.bulk_update(changed, ['parent'], batch_size=1000)
+    if changed:
+        # grain rollups and nested line items follow the links; move the revisions their
+        # cached responses are keyed on (a relinked period is at most two levels up)
+        ids = [period.id for period in changed]
+        models = FinancialModel.objects.filter(
+            Q(line_items__period_id__in=ids) | Q(line_items__period__parent_id__in=ids)
+        ).values('id')
+        FinancialModel.objects.filter(id__in=models).update(revision=F('revision') + 1)
+    return len(changed)
+
+
+def generate_calendar(user, start, end, grains=GRAINS):
+    # every monthly / quarterly / yearly period between start and end, reusing existing
+    # rows; missing ones are created with one insert and linked to their parents
+    wanted = [(grain, *span) for grain in grains for span in spans(start, end, grain)]
+    with transaction.atomic():
+        existing = {
+            (period['period_type'], period['start_date'], period['end_date']): period['id']
+            for period in Period.objects.filter(
+                user=user, period_type__in=grains, start_date__in={key[1] for key in wanted},
+            ).values('id', 'period_type', 'start_date', 'end_date')
+        }
+        missing = [
+            Period(label=period_label(start_date, grain), start_date=start_date, end_date=end_date, period_type=grain, user=user)
+            for grain, start_date, end_date in wanted if (grain, start_date, end_date) not in existing
+        ]
+        for period in Period.objects.bulk_create(missing, batch_size=1000):
+            existing[(period.period_type, period.start_date, period.end_date)] = period.id
+        link_periods(user)
+    ids = [existing[key] for key in wanted]
+    return len(missing), Period.objects.filter(id__in=ids).order_by('start_date', '-end_date', 'id')
@@ -0,0 +1,109 @@
+from collections import defaultdict
+from decimal import Decimal
+from django.db import IntegrityError , transaction
+from django.db.models import Count , F , Sum
+from .models import LineItem , PeriodRollup
+from .periods import ancestor_path
+
+KEY_FIELDS = ('model_id', 'scenario_id', 'period_id', 'category')
+
+
+def rollup_key(item):
+    return (item.model_id, item.scenario_id, item.period_id, item.category)
+
+
+def deltas_for_rows(rows, sign=1):
+    # rows are (model_id, scenario_id, period_id, name, category, amount) tuples as written by ingest
+    deltas = defaultdict(lambda: [Decimal(0), 0])
+    for model_id, scenario_id, period_id, _name, category, amount in rows:
+        delta = deltas[(model_id, scenario_id, period_id, category)]
+        delta[0] += sign * amount
+        delta[1] += sign
+    return deltas
+
+
+def apply_deltas(deltas):
+    # add (amount, count) deltas to the rollup rows, creating or dropping rows as needed
+    with transaction.atomic():
+        for key, (amount, count) in deltas.items():
+            if not amount and not count:
+                continue
+            lookup = dict(zip(KEY_FIELDS, key))
+            rows = PeriodRollup.objects.filter(**lookup)
+            if rows.update(total=F('total') + amount, count=F('count') + count):
+                if count < 0:
+                    rows.filter(count__lte=0).delete()
+                continue
+            if count <= 0:
+                continue  # nothing to subtract from, e.g. the rollup was cascaded away
+            try:
+                with transaction.atomic():
+                    PeriodRollup.objects.create(total=amount, count=count, **lookup)
+            except IntegrityError:
+                # created concurrently since the update above
+                rows.update(total=F('total') + amount, count=F('count') + count)
+
+
+def line_item_saved(item, previous=None):
+    deltas = defaultdict(lambda: [Decimal(0), 0])
+    if previous is not None:
+        key, amount = previous
+        deltas[key][0] -= amount
+        deltas[key][1] -= 1
+    deltas[rollup_key(item)][0] += Decimal(item.amount)
+    deltas[rollup_key(item)][1] += 1
+    apply_deltas(deltas)
+
+
+def line_item_deleted(item):
+    apply_deltas({rollup_key(item): [-Decimal(item.amount), -1]})
+
+
+def rebuild(model_ids=None):
+    # drift repair: recompute rollups from line items in one aggregate query per call
+    with transaction.atomic():
+        stale = PeriodRollup.objects.all()
+        items = LineItem.objects.all()
+        if model_ids:
+            stale = stale.filter(model_id__in=model_ids)
+            items = items.filter(model_id__in=model_ids)
+        stale.delete()
+        aggregates = items.values(*KEY_FIELDS).annotate(total=Sum('amount'), count=Count('id')).order_by()
+        rollups = [PeriodRollup(**row) for row in aggregates]
+        PeriodRollup.objects.bulk_create(rollups, batch_size=1000)
+    return len(rollups)
+
+
+def period_rollups(model_id, scenario_ids=None, grain=None, source='monthly'):
+    # per scenario and period: category totals, line counts and net income. With a grain,
+    # the `source` periods are summed into their monthly/quarterly/yearly ancestor by
+    # following the stored Period.parent links
+    queryset = PeriodRollup.objects.filter(model_id=model_id)
+    if scenario_ids:
+        queryset = queryset.filter(scenario_id__in=scenario_ids)
+    if grain is None:
+        rows = queryset.order_by('scenario_id', 'period__start_date', 'period_id').values_list(
+            'scenario_id', 'period_id', 'period__label', 'category', 'total', 'count',
+        )
+    else:
+        path = ancestor_path(source, grain)
+        rows = (
+            queryset.filter(period__period_type=source, **{f'{path}__isnull': False})
+            .values('scenario_id', 'category', target=F(f'{path}__id'), label=F(f'{path}__label'), start=F(f'{path}__start_date'))
+            .annotate(sum_total=Sum('total'), sum_count=Sum('count'))
+            .order_by('scenario_id', 'start', 'target', 'category')
+            .values_list('scenario_id', 'target', 'label', 'category', 'sum_total', 'sum_count')
+        )
+    results = []
+    for scenario_id, period_id, label, category, total, count in rows:
+        if not results or (results[-1]['scenario_id'], results[-1]['period_id']) != (scenario_id, period_id):
+            results.append({'scenario_id': scenario_id, 'period_id': period_id, 'period': label,
+                            'totals': {}, 'counts': {}, 'net_income': Decimal('0.00')})
+        entry = results[-1]
+        entry['totals'][category] = total
+        entry['counts'][category] = count
+        if category == 'Revenue':
+            entry['net_income'] += total
+        elif category == 'Expense':
+            entry['net_income'] -= total
+    return results
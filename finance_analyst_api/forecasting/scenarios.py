@@ -0,0 +1,104 @@
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import F , Q , Sum
+from .ingest import DEFAULT_CHUNK_SIZE , parse_amount , write_rows
+from .models import Assumption , FinancialModel , LineItem , PeriodRollup , Scenario
+from .rollups import apply_deltas , deltas_for_rows
+from . import formulas
+
+CENT = Decimal('0.01')
+ASSUMPTION_FIELDS = ('name', 'value', 'unit', 'distribution', 'stdev', 'min_value', 'max_value', 'applies_to')
+# rows listed in an AmountOutOfRange error
+MAX_REPORTED_ROWS = 100
+
+
+# adjusted amounts that don't fit LineItem.amount; rows are
+# {'id', 'name', 'period_id', 'amount', 'error'} of the source line items
+class AmountOutOfRange(ValueError):
+    def __init__(self, rows):
+        super().__init__(f"{len(rows)} adjusted amounts are out of range.")
+        self.rows = rows
+
+
+def adjustment_factors(adjustments):
+    # [{'name' | 'category', 'percent'}] -> ({name: factor}, {category: factor})
+    by_name, by_category = {}, {}
+    for adjustment in adjustments or []:
+        factor = 1 + Decimal(str(adjustment['percent'])) / 100
+        if adjustment.get('name'):
+            by_name[adjustment['name']] = factor
+        else:
+            by_category[adjustment['category']] = factor
+    return by_name, by_category
+
+
+def clone_scenario(source, user, name, description='', adjustments=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    # Copy a scenario with its assumptions and hand-entered line items in bulk.
+    # A line item's amount is scaled by the adjustment for its name, else for its
+    # category; formula items are re-derived for the copy rather than copied.
+    by_name, by_category = adjustment_factors(adjustments)
+    with transaction.atomic():
+        clone = Scenario.objects.create(model_id=source.model_id, name=name, description=description, user=user)
+        Assumption.objects.bulk_create([
+            Assumption(model_id=source.model_id, scenario=clone, **values)
+            for values in Assumption.objects.filter(scenario=source).order_by('id').values(*ASSUMPTION_FIELDS)
+        ])
+
+        rows = (
+            LineItem.objects.filter(scenario=source, formula__isnull=True)
+            .order_by('id')
+            .values_list('id', 'period_id', 'name', 'category', 'amount')
+        )
+        items, invalid = [], []
+        for item_id, period_id, item_name, category, amount in rows.iterator(chunk_size=chunk_size):
+            factor = by_name.get(item_name, by_category.get(category))
+            if factor is not None:
+                amount = (amount * factor).quantize(CENT)
+                _amount, error = parse_amount(amount)
+                if error:
+                    invalid.append({'id': item_id, 'name': item_name, 'period_id': period_id, 'amount': str(amount), 'error': error})
+                    continue
+            items.append((source.model_id, clone.id, period_id, item_name, category, amount))
+        if invalid:
+            # raised inside the transaction, so the clone and its assumptions go too
+            raise AmountOutOfRange(invalid[:MAX_REPORTED_ROWS])
+        write_rows(items, chunk_size)
+        apply_deltas(deltas_for_rows(items))
+        FinancialModel.bump_revision(source.model_id)
+        formulas.recompute(source.model_id, scenario_ids=[clone.id])
+    return clone, len(items)
+
+
+def diff_scenarios(base, other, by='category'):
+    # per period and category (or line item name) totals of both scenarios side by side,
+    # one aggregate query; categories come from the rollups, names from the line items
+    if by == 'name':
+        rows = LineItem.objects.filter(scenario_id__in=[base.id, other.id])
+        group = ('period_id', 'category', 'name')
+        amount = 'amount'
+    else:
+        rows = PeriodRollup.objects.filter(scenario_id__in=[base.id, other.id])
+        group = ('period_id', 'category')
+        amount = 'total'
+    rows = (
+        rows.values(*group, label=F('period__label'), start_date=F('period__start_date'))
+        .annotate(
+            base_total=Sum(amount, filter=Q(scenario_id=base.id)),
+            other_total=Sum(amount, filter=Q(scenario_id=other.id)),
+        )
+        .order_by('start_date', 'period_id', *group[1:])
+    )
+    results = []
+    for row in rows:
+        base_total = row['base_total'] or Decimal('0.00')
+        other_total = row['other_total'] or Decimal('0.00')
+        results.append({
+            'period_id': row['period_id'],
+            'label': row['label'],
+            **{field: row[field] for field in group[1:]},
+            'base': base_total,
+            'other': other_total,
+            'difference': other_total - base_total,
+            'percent_change': round(float((other_total - base_total) / base_total * 100), 4) if base_total else None,
+        })
+    return results
@@ -0,0 +1,86 @@
+import numpy as np
+from .simulation import get_executor , load_inputs , project
+from .valuation import npv , periodic_rates , periods_per_year_for
+
+MAX_GRID_POINTS = 1000000
+# grid points per batch, and the grid size from which batches go to the process pool
+CHUNK_POINTS = 50000
+POOL_THRESHOLD = 100000
+
+
+def evaluate_points(values, assumptions, drivers, n_periods, rate):
+    # values (points, assumptions) -> net income over the horizon and NPV per point
+    shape = (values.shape[0], n_periods)
+    draws = [values[:, [index]] for index in range(len(assumptions))]
+    revenue, expense = project(draws, assumptions, drivers, shape)
+    cash_flows = revenue - expense
+    return cash_flows.sum(axis=1), npv(cash_flows, [rate])[:, 0]
+
+
+def evaluate_grid(values, assumptions, drivers, n_periods, rate):
+    # batches of grid points, fanned out to the process pool for large grids
+    chunks = [values[start:start + CHUNK_POINTS] for start in range(0, len(values), CHUNK_POINTS)]
+    jobs = [(chunk, assumptions, drivers, n_periods, rate) for chunk in chunks]
+    if len(values) >= POOL_THRESHOLD and len(jobs) > 1:
+        results = list(get_executor().map(evaluate_points, *zip(*jobs)))
+    else:
+        results = [evaluate_points(*job) for job in jobs]
+    return np.concatenate([r[0] for r in results]), np.concatenate([r[1] for r in results])
+
+
+# assumption names in the ranges that the scenario doesn't have (or applies to nothing)
+class UnknownAssumptions(ValueError):
+    def __init__(self, names):
+        super().__init__(f"Unknown or unapplied assumptions: {', '.join(names)}")
+        self.names = list(names)
+
+
+def sensitivity(model_id, scenario_id, ranges, mode='grid', discount_rate=0.1, periods_per_year=None):
+    # ranges: {assumption name: [values]}; names missing from the scenario raise UnknownAssumptions
+    periods, assumptions, drivers = load_inputs(model_id, scenario_id)
+    index = {assumption['name']: i for i, assumption in enumerate(assumptions)}
+    missing = [name for name in ranges if name not in index]
+    if missing:
+        raise UnknownAssumptions(missing)
+
+    n_periods = len(periods)
+    rate = periodic_rates([discount_rate], periods_per_year or periods_per_year_for(periods))[0]
+    base = np.array([assumption['value'] for assumption in assumptions], dtype=np.float64)
+    names = list(ranges)
+    axes = [np.asarray(ranges[name], dtype=np.float64) for name in names]
+
+    base_net, base_npv = evaluate_points(base[None, :], assumptions, drivers, n_periods, rate)
+    result = {
+        'discount_rate': discount_rate,
+        'base': {'net_income': round(float(base_net[0]), 2), 'npv': round(float(base_npv[0]), 2)},
+    }
+
+    if mode == 'tornado':
+        # one assumption at a time at its lowest and highest value, the rest at base
+        rows = []
+        for name, axis in zip(names, axes):
+            points = np.repeat(base[None, :], 2, axis=0)
+            points[:, index[name]] = [axis.min(), axis.max()]
+            net, present = evaluate_points(points, assumptions, drivers, n_periods, rate)
+            rows.append({
+                'name': name,
+                'low': float(axis.min()),
+                'high': float(axis.max()),
+                'net_income': [round(float(v), 2) for v in net],
+                'npv': [round(float(v), 2) for v in present],
+                'swing': round(float(abs(net[1] - net[0])), 2),
+            })
+        result['tornado'] = sorted(rows, key=lambda row: row['swing'], reverse=True)
+        return result
+
+    # full cartesian grid, one row of assumption values per point
+    mesh = np.meshgrid(*axes, indexing='ij')
+    points = np.repeat(base[None, :], mesh[0].size, axis=0)
+    for name, column in zip(names, mesh):
+        points[:, index[name]] = column.ravel()
+    net, present = evaluate_grid(points, assumptions, drivers, n_periods, rate)
+    shape = [len(axis) for axis in axes]
+    result['axes'] = [{'name': name, 'values': axis.tolist()} for name, axis in zip(names, axes)]
+    result['net_income'] = np.round(net, 2).reshape(shape).tolist()
+    result['npv'] = np.round(present, 2).reshape(shape).tolist()
+    return result
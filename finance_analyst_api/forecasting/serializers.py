@@ -1,43 +1,252 @@
 from rest_framework import serializers
-from .models import FinancialModel , Period , Scenario , LineItem
+from .models import FinancialModel , Period , Scenario , LineItem , Assumption , ImportJob , Formula , ModelVersion , VersionedLineItem
+from .formulas import FormulaError , compile_formulas
+from .forecast import METHODS as FORECAST_METHODS , MAX_HORIZON
+from .periods import GRAINS , MAX_CALENDAR_YEARS
+from .simulation import DEFAULT_TRIALS , MAX_TRIALS , DEFAULT_PERCENTILES
+from .sensitivity import MAX_GRID_POINTS
 
 
+# primary key input limited to the requesting user's rows (see OwnedQuerySet)
+class OwnedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        request = self.context.get('request')
+        if request is not None:
+            queryset = queryset.owned_by(request.user)
+        return queryset
+
 class FinanceModelSerializer(serializers.ModelSerializer):
     class Meta:
         model = FinancialModel
-        fields = ['id', 'name', 'version', 'model_type', 'created_at']
+        fields = ['id', 'name', 'version', 'model_type', 'created_at', 'revision']
         
 class PeriodModelSerializer(serializers.ModelSerializer):
     class Meta:
         model = Period
-        fields = ['id' , 'label', 'start_date' , 'end_date' , 'period_type']
+        fields = ['id' , 'label', 'start_date' , 'end_date' , 'period_type' , 'parent_id']
+        read_only_fields = ['parent_id']
 
 class ScenarioModelSerializer(serializers.ModelSerializer):
     model = FinanceModelSerializer(read_only=True)
-    model_id = serializers.PrimaryKeyRelatedField(
+    model_id = OwnedPrimaryKeyRelatedField(
         queryset=FinancialModel.objects.all(), source='model', write_only=True
     )
     class Meta:
         model = Scenario
         fields = ['id' , 'name' , 'description' ,'model' , 'model_id']
 
+# percentage applied to one line item name, or to a whole category, while cloning
+class ScenarioAdjustmentSerializer(serializers.Serializer):
+    name = serializers.CharField(required=False)
+    category = serializers.ChoiceField(choices=LineItem.CATEGORY_CHOICES, required=False)
+    percent = serializers.DecimalField(max_digits=10, decimal_places=4, min_value=-100, max_value=10000)
+
+    def validate(self, attrs):
+        if ('name' in attrs) == ('category' in attrs):
+            raise serializers.ValidationError("Provide either name or category.")
+        return attrs
+
+class ScenarioCloneSerializer(serializers.Serializer):
+    name = serializers.CharField(max_length=Scenario._meta.get_field('name').max_length)
+    description = serializers.CharField(required=False, allow_blank=True, default='')
+    adjustments = ScenarioAdjustmentSerializer(many=True, required=False, default=list)
+
 class LineItemModelSerializer(serializers.ModelSerializer):
     model = FinanceModelSerializer(read_only=True)
-    model_id = serializers.PrimaryKeyRelatedField(
+    model_id = OwnedPrimaryKeyRelatedField(
         queryset=FinancialModel.objects.all(), source='model', write_only=True
     )
     
     scenario = ScenarioModelSerializer(read_only=True)
-    scenario_id = serializers.PrimaryKeyRelatedField(
+    scenario_id = OwnedPrimaryKeyRelatedField(
         queryset=Scenario.objects.all(), source='scenario', write_only=True
     )
     
     period = PeriodModelSerializer(read_only=True)
-    period_id = serializers.PrimaryKeyRelatedField(
+    period_id = OwnedPrimaryKeyRelatedField(
         queryset=Period.objects.all(), source='period', write_only=True
     )
         
     class Meta:
         model = LineItem
         fields = ['name' , 'category' , 'amount' , 'model_id' ,'model' , 'scenario_id' , 'scenario' , 'period_id' , 'period']
-        
\ No newline at end of file
+
+class FormulaModelSerializer(serializers.ModelSerializer):
+    model_id = OwnedPrimaryKeyRelatedField(
+        queryset=FinancialModel.objects.all(), source='model'
+    )
+
+    class Meta:
+        model = Formula
+        fields = ['id' , 'name' , 'category' , 'expression' , 'model_id']
+
+    def validate(self, attrs):
+        model = attrs.get('model', getattr(self.instance, 'model', None))
+        formula = Formula(
+            id=getattr(self.instance, 'id', None), model=model,
+            name=attrs.get('name', getattr(self.instance, 'name', None)),
+            category=attrs.get('category', getattr(self.instance, 'category', None)),
+            expression=attrs.get('expression', getattr(self.instance, 'expression', '')),
+        )
+        others = Formula.objects.filter(model=model).exclude(id=formula.id)
+        if others.filter(name=formula.name).exists():
+            raise serializers.ValidationError({"name": "This model already has a formula with this name."})
+        try:
+            compiled = {item.name: item for item in compile_formulas(list(others) + [formula])}
+        except FormulaError as error:
+            raise serializers.ValidationError({"expression": str(error)})
+        known = set(compiled)
+        known |= set(LineItem.objects.filter(model=model, formula__isnull=True).values_list('name', flat=True).distinct())
+        known |= set(Assumption.objects.filter(model=model).values_list('name', flat=True).distinct())
+        unknown = sorted(compiled[formula.name].dependencies - known)
+        if unknown:
+            raise serializers.ValidationError({"expression": f"Unknown names: {', '.join(unknown)}"})
+        return attrs
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ImportJob
+        fields = ['id' , 'file_name' , 'status' , 'processed_rows' , 'created_rows' , 'failed_rows' , 'errors' , 'detail' , 'created_at' , 'finished_at']
+        read_only_fields = fields
+
+class ModelVersionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ModelVersion
+        fields = ['id' , 'number' , 'label' , 'note' , 'scenarios' , 'line_items' , 'assumptions' , 'changed_rows' , 'created_at']
+        read_only_fields = ['id' , 'number' , 'scenarios' , 'line_items' , 'assumptions' , 'changed_rows' , 'created_at']
+
+# line item as stored in a snapshot; id is the live row it was taken from
+class VersionedLineItemSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source='source_id')
+
+    class Meta:
+        model = VersionedLineItem
+        fields = ['id' , 'name' , 'category' , 'amount' , 'derived' , 'scenario_id' , 'period_id']
+        read_only_fields = fields
+
+# compact representation for bulk consumers: related objects as plain ids
+class LineItemFlatSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = LineItem
+        fields = ['id' , 'name' , 'category' , 'amount' , 'model_id' , 'scenario_id' , 'period_id']
+        read_only_fields = fields
+
+class AssumptionModelSerializer(serializers.ModelSerializer):
+    model_id = OwnedPrimaryKeyRelatedField(
+        queryset=FinancialModel.objects.all(), source='model'
+    )
+    scenario_id = OwnedPrimaryKeyRelatedField(
+        queryset=Scenario.objects.all(), source='scenario'
+    )
+
+    class Meta:
+        model = Assumption
+        fields = ['id' , 'name' , 'value' , 'unit' , 'distribution' , 'stdev' , 'min_value' , 'max_value' , 'applies_to' , 'model_id' , 'scenario_id']
+
+    def validate(self, attrs):
+        model = attrs.get('model', getattr(self.instance, 'model', None))
+        scenario = attrs.get('scenario', getattr(self.instance, 'scenario', None))
+        if scenario.model_id != model.id:
+            raise serializers.ValidationError({"scenario_id": "Scenario does not belong to this model."})
+
+        def current(field):
+            return attrs.get(field, getattr(self.instance, field, None))
+        distribution = current('distribution') or 'fixed'
+        min_value, max_value = current('min_value'), current('max_value')
+        if min_value is not None and max_value is not None and min_value > max_value:
+            raise serializers.ValidationError({"min_value": "Must not be greater than max_value."})
+        stdev = current('stdev')
+        if stdev is not None and stdev < 0:
+            raise serializers.ValidationError({"stdev": "Must not be negative."})
+        if distribution == 'normal' and stdev is None:
+            raise serializers.ValidationError({"stdev": "Required for a normal distribution."})
+        if distribution in ('uniform', 'triangular') and (min_value is None or max_value is None):
+            raise serializers.ValidationError({"min_value": f"min_value and max_value are required for a {distribution} distribution."})
+        return attrs
+
+# Monte Carlo request parameters
+class SimulationSerializer(serializers.Serializer):
+    scenario_id = serializers.IntegerField()
+    trials = serializers.IntegerField(min_value=1, max_value=MAX_TRIALS, default=DEFAULT_TRIALS)
+    seed = serializers.IntegerField(min_value=0, required=False, allow_null=True, default=None)
+    percentiles = serializers.ListField(
+        child=serializers.FloatField(min_value=0, max_value=100), required=False, default=list(DEFAULT_PERCENTILES)
+    )
+
+# DCF / NPV / IRR request parameters; rates are annual
+class ValuationSerializer(serializers.Serializer):
+    discount_rates = serializers.ListField(
+        child=serializers.FloatField(min_value=-0.99), min_length=1, max_length=1000, default=[0.1]
+    )
+    scenario_ids = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+    terminal_growth = serializers.FloatField(min_value=-0.99, required=False, allow_null=True, default=None)
+    periods_per_year = serializers.ChoiceField(choices=[1, 4, 12], required=False, allow_null=True, default=None)
+
+class ForecastSerializer(serializers.Serializer):
+    scenario_id = serializers.IntegerField()
+    periods = serializers.IntegerField(min_value=1, max_value=MAX_HORIZON)
+    method = serializers.ChoiceField(choices=FORECAST_METHODS, default='trend')
+    season_length = serializers.IntegerField(min_value=1, required=False, allow_null=True, default=None)
+    alpha = serializers.FloatField(min_value=0, max_value=1, default=0.5)
+    beta = serializers.FloatField(min_value=0, max_value=1, required=False, allow_null=True, default=None)
+    history = serializers.IntegerField(min_value=1, required=False, allow_null=True, default=None)
+    dry_run = serializers.BooleanField(default=False)
+
+class PeriodCalendarSerializer(serializers.Serializer):
+    start_date = serializers.DateField()
+    end_date = serializers.DateField()
+    grains = serializers.MultipleChoiceField(choices=GRAINS, required=False, default=GRAINS)
+
+    def validate(self, attrs):
+        if attrs['end_date'] < attrs['start_date']:
+            raise serializers.ValidationError({"end_date": "Must not be before start_date."})
+        if attrs['end_date'].year - attrs['start_date'].year >= MAX_CALENDAR_YEARS:
+            raise serializers.ValidationError({"end_date": f"A calendar spans at most {MAX_CALENDAR_YEARS} years."})
+        return attrs
+
+# query parameters of the budget-vs-actual report
+class VarianceSerializer(serializers.Serializer):
+    budget_id = serializers.IntegerField()
+    actual_id = serializers.IntegerField()
+    by = serializers.ChoiceField(choices=['name', 'category'], default='name')
+    period_type = serializers.ChoiceField(choices=Period.PERIOD_TYPES, required=False, allow_null=True, default=None)
+    min_variance = serializers.FloatField(min_value=0, required=False, allow_null=True, default=None)
+    min_variance_pct = serializers.FloatField(min_value=0, required=False, allow_null=True, default=None)
+
+# one assumption axis: explicit values, or low/high split into steps
+class SensitivityRangeSerializer(serializers.Serializer):
+    name = serializers.CharField()
+    values = serializers.ListField(child=serializers.FloatField(), required=False, min_length=1, max_length=1000)
+    low = serializers.FloatField(required=False)
+    high = serializers.FloatField(required=False)
+    steps = serializers.IntegerField(min_value=2, max_value=1000, default=5)
+
+    def validate(self, attrs):
+        if 'values' not in attrs:
+            if 'low' not in attrs or 'high' not in attrs:
+                raise serializers.ValidationError("Provide either values or low and high.")
+            step = (attrs['high'] - attrs['low']) / (attrs['steps'] - 1)
+            attrs['values'] = [attrs['low'] + step * i for i in range(attrs['steps'])]
+        return attrs
+
+
+class SensitivitySerializer(serializers.Serializer):
+    scenario_id = serializers.IntegerField()
+    mode = serializers.ChoiceField(choices=['grid', 'tornado'], default='grid')
+    ranges = SensitivityRangeSerializer(many=True)
+    discount_rate = serializers.FloatField(min_value=-0.99, default=0.1)
+    periods_per_year = serializers.ChoiceField(choices=[1, 4, 12], required=False, allow_null=True, default=None)
+
+    def validate_ranges(self, ranges):
+        if not ranges:
+            raise serializers.ValidationError("At least one assumption range is required.")
+        names = [item['name'] for item in ranges]
+        if len(set(names)) != len(names):
+            raise serializers.ValidationError("Each assumption may appear only once.")
+        points = 1
+        for item in ranges:
+            points *= len(item['values'])
+        if self.initial_data.get('mode', 'grid') == 'grid' and points > MAX_GRID_POINTS:
+            raise serializers.ValidationError(f"Grid has {points} points, the limit is {MAX_GRID_POINTS}.")
+        return ranges
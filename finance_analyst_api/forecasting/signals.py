@@ -0,0 +1,132 @@
+from django.db.models import F , Q
+from django.db.models.signals import pre_save , post_save , pre_delete , post_delete
+from django.dispatch import receiver
+from .models import FinancialModel , Period , Scenario , LineItem , Assumption , Formula
+from . import columnar , formulas , rollups
+
+
+def deleted_via(origin, *models):
+    # post_delete origin is the instance or queryset whose delete() started the cascade
+    return isinstance(origin, models) or getattr(origin, 'model', None) in models
+
+
+@receiver(pre_save, sender=LineItem)
+def remember_rollup_key(sender, instance, **kwargs):
+    # the stored row, not the in-memory instance, is what the rollup currently counts
+    instance._rollup_previous = None
+    instance._previous_name = None
+    instance._previous_model_id = None
+    if instance.pk:
+        previous = LineItem.objects.filter(pk=instance.pk).values_list(*rollups.KEY_FIELDS, 'amount', 'name').first()
+        if previous is not None:
+            instance._rollup_previous = (previous[:4], previous[4])
+            instance._previous_name = previous[5]
+            instance._previous_model_id = previous[0]
+
+
+@receiver(post_save, sender=LineItem)
+def update_rollup_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_rollup_previous', None)
+    rollups.line_item_saved(instance, previous)
+    if instance.formula_id is None:
+        names = {instance.name, getattr(instance, '_previous_name', None)} - {None}
+        scenario_ids = {instance.scenario_id} | ({previous[0][1]} if previous else set())
+        period_ids = {instance.period_id} | ({previous[0][2]} if previous else set())
+        formulas.recompute(instance.model_id, names, scenario_ids, period_ids)
+        if previous and previous[0][0] != instance.model_id:
+            # moved to another model: the old one loses an input
+            formulas.recompute(previous[0][0], {instance._previous_name}, [previous[0][1]], [previous[0][2]])
+
+
+@receiver(post_delete, sender=LineItem)
+def update_rollup_on_delete(sender, instance, origin=None, **kwargs):
+    # model / scenario / period deletes cascade to the rollups and formulas as well
+    if not deleted_via(origin, LineItem, Formula):
+        return
+    rollups.line_item_deleted(instance)
+    if instance.formula_id is None:
+        formulas.recompute(instance.model_id, {instance.name}, [instance.scenario_id], [instance.period_id])
+
+
+@receiver(pre_save, sender=Assumption)
+def remember_assumption_name(sender, instance, **kwargs):
+    instance._previous_name = None
+    instance._previous_model_id = None
+    if instance.pk:
+        previous = Assumption.objects.filter(pk=instance.pk).values_list('name', 'model_id', 'scenario_id').first()
+        if previous is not None:
+            instance._previous_name, instance._previous_model_id, instance._previous_scenario_id = previous
+
+
+@receiver(post_save, sender=Assumption)
+def recompute_on_assumption_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    names = {instance.name, getattr(instance, '_previous_name', None)} - {None}
+    formulas.recompute(instance.model_id, names, [instance.scenario_id])
+    previous_model_id = getattr(instance, '_previous_model_id', None)
+    if previous_model_id is not None and previous_model_id != instance.model_id:
+        formulas.recompute(previous_model_id, {instance._previous_name}, [instance._previous_scenario_id])
+
+
+@receiver(post_delete, sender=Assumption)
+def recompute_on_assumption_delete(sender, instance, origin=None, **kwargs):
+    if deleted_via(origin, Assumption):
+        formulas.recompute(instance.model_id, {instance.name}, [instance.scenario_id])
+
+
+@receiver(pre_save, sender=Scenario)
+def remember_scenario_model(sender, instance, **kwargs):
+    instance._previous_model_id = None
+    if instance.pk:
+        instance._previous_model_id = Scenario.objects.filter(pk=instance.pk).values_list('model_id', flat=True).first()
+
+
+@receiver(post_save, sender=Scenario)
+@receiver(post_delete, sender=Scenario)
+@receiver(post_save, sender=LineItem)
+@receiver(post_delete, sender=LineItem)
+@receiver(post_save, sender=Assumption)
+@receiver(post_delete, sender=Assumption)
+def bump_model_revision(sender, instance, raw=False, origin=None, created=None, **kwargs):
+    # rows cascaded from a model, scenario or period delete: that delete bumps the
+    # revisions once instead of once per row
+    owners = (FinancialModel,) if sender is Scenario else (FinancialModel, Scenario, Period)
+    if raw or (origin is not None and deleted_via(origin, *owners)):
+        return
+    FinancialModel.bump_revision(instance.model_id)
+    # a save that moved the row to another model changes the old model as well
+    previous_model_id = getattr(instance, '_previous_model_id', None)
+    if created is False and previous_model_id is not None and previous_model_id != instance.model_id:
+        FinancialModel.bump_revision(previous_model_id)
+
+
+@receiver(pre_delete, sender=Period)
+def remember_period_models(sender, instance, **kwargs):
+    # models with line items on the period (cascaded) or below it (their links are cleared)
+    instance._model_ids = list(
+        LineItem.objects.filter(
+            Q(period=instance) | Q(period__parent=instance) | Q(period__parent__parent=instance)
+        ).values_list('model_id', flat=True).distinct()
+    )
+
+
+@receiver(post_delete, sender=Period)
+def bump_period_models(sender, instance, **kwargs):
+    model_ids = getattr(instance, '_model_ids', None)
+    if model_ids:
+        FinancialModel.objects.filter(id__in=model_ids).update(revision=F('revision') + 1)
+
+
+@receiver(post_save, sender=FinancialModel)
+def bump_own_revision(sender, instance, created=False, raw=False, **kwargs):
+    # renames etc. show up in cached list and detail responses too
+    if not created and not raw:
+        FinancialModel.bump_revision(instance.pk)
+
+
+@receiver(post_delete, sender=FinancialModel)
+def delete_columnar_snapshots(sender, instance, **kwargs):
+    columnar.delete_snapshots(instance.pk)
@@ -0,0 +1,165 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from django.conf import settings
+from django.db.models import Sum
+from .models import Assumption , LineItem , Period
+
+DEFAULT_TRIALS = 10000
+MAX_TRIALS = 200000
+DEFAULT_PERCENTILES = (5, 50, 95)
+# trials per worker task; fixed so a seed gives the same result on any core count
+CHUNK_TRIALS = 10000
+# below this many trials the pool start-up costs more than it saves
+POOL_THRESHOLD = 20000
+
+# sign of each category in net income
+NET_SIGNS = {'Revenue': 1.0, 'Expense': -1.0}
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        workers = getattr(settings, 'FORECASTING_SIMULATION_WORKERS', None) or os.cpu_count() or 1
+        _executor = ProcessPoolExecutor(max_workers=workers)
+    return _executor
+
+
+# Inputs of one simulation, reduced to plain arrays so they pickle cheaply to workers.
+#   drivers: one entry per distinct set of assumptions driving a group of line items,
+#            {'revenue': (P,), 'expense': (P,), 'assumptions': [index, ...]}
+#   assumptions: [{'name', 'distribution', 'value', 'stdev', 'min', 'max', 'unit'}]
+def load_inputs(model_id, scenario_id):
+    rows = (
+        LineItem.objects.filter(model_id=model_id, scenario_id=scenario_id, category__in=NET_SIGNS)
+        .values('name', 'category', 'period_id')
+        .annotate(total=Sum('amount'))
+        .order_by()
+    )
+    rows = list(rows)
+    periods = list(
+        Period.objects.filter(id__in={row['period_id'] for row in rows})
+        .order_by('start_date', 'id')
+        .values('id', 'label', 'period_type')
+    )
+    position = {period['id']: index for index, period in enumerate(periods)}
+
+    assumptions = []
+    targets = {}
+    for assumption in Assumption.objects.filter(model_id=model_id, scenario_id=scenario_id).exclude(applies_to='').order_by('id'):
+        targets.setdefault(assumption.applies_to, []).append(len(assumptions))
+        assumptions.append({
+            'name': assumption.name,
+            'distribution': assumption.distribution,
+            'value': float(assumption.value),
+            'stdev': float(assumption.stdev or 0),
+            'min': None if assumption.min_value is None else float(assumption.min_value),
+            'max': None if assumption.max_value is None else float(assumption.max_value),
+            'unit': assumption.unit,
+        })
+
+    # line items driven by the same assumptions share one base series
+    drivers = {}
+    for row in rows:
+        key = tuple(sorted(set(targets.get(row['name'], []) + targets.get(row['category'], []))))
+        driver = drivers.setdefault(key, {
+            'revenue': np.zeros(len(periods)), 'expense': np.zeros(len(periods)), 'assumptions': list(key),
+        })
+        driver['revenue' if row['category'] == 'Revenue' else 'expense'][position[row['period_id']]] += float(row['total'])
+    return periods, assumptions, list(drivers.values())
+
+
+def sample(rng, assumption, shape):
+    value = assumption['value']
+    low, high = assumption['min'], assumption['max']
+    kind = assumption['distribution']
+    if kind == 'normal':
+        draws = rng.normal(value, assumption['stdev'], shape)
+        if low is not None or high is not None:
+            draws = np.clip(draws, low, high)
+        return draws
+    if kind == 'uniform':
+        return rng.uniform(low, high, shape)
+    if kind == 'triangular':
+        if low == high:
+            return np.full(shape, low)
+        return rng.triangular(low, min(max(value, low), high), high, shape)
+    return np.full(shape, value)
+
+
+def apply_assumption(series, draws, unit):
+    # % -> relative shock, ratio -> multiplier, anything else ($) -> additive amount
+    if unit == '%':
+        return series * (1.0 + draws / 100.0)
+    if unit == 'ratio':
+        return series * draws
+    return series + draws
+
+
+def project(draws, assumptions, drivers, shape):
+    # revenue and expense (rows, periods) for one value array per assumption,
+    # each broadcastable to shape
+    revenue = np.zeros(shape)
+    expense = np.zeros(shape)
+    for driver in drivers:
+        base_revenue = np.broadcast_to(driver['revenue'], shape)
+        base_expense = np.broadcast_to(driver['expense'], shape)
+        for index in driver['assumptions']:
+            base_revenue = apply_assumption(base_revenue, draws[index], assumptions[index]['unit'])
+            base_expense = apply_assumption(base_expense, draws[index], assumptions[index]['unit'])
+        revenue += base_revenue
+        expense += base_expense
+    return revenue, expense
+
+
+def run_chunk(seed_sequence, trials, assumptions, drivers, n_periods):
+    # one block of trials: (trials, periods) revenue and expense matrices
+    rng = np.random.default_rng(seed_sequence)
+    shape = (trials, n_periods)
+    draws = [sample(rng, assumption, shape) for assumption in assumptions]
+    revenue, expense = project(draws, assumptions, drivers, shape)
+    return revenue.astype(np.float32), expense.astype(np.float32)
+
+
+def simulate(model_id, scenario_id, trials=DEFAULT_TRIALS, seed=None, percentiles=DEFAULT_PERCENTILES):
+    periods, assumptions, drivers = load_inputs(model_id, scenario_id)
+    n_periods = len(periods)
+    if not n_periods:
+        return {'trials': trials, 'seed': seed, 'periods': []}
+
+    sizes = [CHUNK_TRIALS] * (trials // CHUNK_TRIALS)
+    if trials % CHUNK_TRIALS:
+        sizes.append(trials % CHUNK_TRIALS)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    jobs = [(seeds[i], size, assumptions, drivers, n_periods) for i, size in enumerate(sizes)]
+
+    if trials >= POOL_THRESHOLD and len(jobs) > 1:
+        chunks = list(get_executor().map(run_chunk, *zip(*jobs)))
+    else:
+        chunks = [run_chunk(*job) for job in jobs]
+    revenue = np.concatenate([chunk[0] for chunk in chunks])
+    expense = np.concatenate([chunk[1] for chunk in chunks])
+    net = revenue - expense
+
+    bands = {
+        name: np.percentile(values, percentiles, axis=0)  # (len(percentiles), periods)
+        for name, values in (('revenue', revenue), ('expense', expense), ('net_income', net))
+    }
+    return {
+        'trials': trials,
+        'seed': seed,
+        'percentiles': list(percentiles),
+        'periods': [
+            {
+                'id': period['id'],
+                'label': period['label'],
+                **{
+                    name: {f'p{p:g}': round(float(values[i, index]), 2) for i, p in enumerate(percentiles)}
+                    for name, values in bands.items()
+                },
+            }
+            for index, period in enumerate(periods)
+        ],
+    }
@@ -0,0 +1,99 @@
+from datetime import date , timedelta
+from decimal import Decimal
+import numpy as np
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from accounts.models import User
+from .ingest import DEFAULT_CHUNK_SIZE , write_rows
+from .models import Assumption , FinancialModel , Scenario
+from .periods import add_months , generate_calendar
+from . import rollups
+
+# Synthetic tenants for benchmarks: every user gets a monthly calendar (plus its quarters
+# and years), models with scenarios, and one line item per name, scenario and month.
+# The same seed always produces the same rows.
+
+LINE_ITEM_NAMES = [
+    ('Product Sales', 'Revenue'), ('COGS', 'Expense'), ('Salaries', 'Expense'), ('Services', 'Revenue'),
+    ('Rent', 'Expense'), ('Cash', 'Asset'), ('Loan', 'Liability'), ('Capital', 'Equity'),
+    ('Subscriptions', 'Revenue'), ('Marketing', 'Expense'), ('Receivables', 'Asset'), ('Payables', 'Liability'),
+    ('Licensing', 'Revenue'), ('Utilities', 'Expense'), ('Inventory', 'Asset'), ('Retained Earnings', 'Equity'),
+]
+SCENARIO_NAMES = ['Base', 'Best Case', 'Worst Case']
+SCENARIO_SCALE = [1.0, 1.15, 0.85]
+MODEL_TYPES = ['Budget', 'Forecast', 'Rolling', '3Statement']
+DEFAULT_PASSWORD = 'benchmark'
+DEFAULT_START = date(2020, 1, 1)
+
+
+def line_item_names(count):
+    # the first `count` names, numbered once the list runs out ('Product Sales 2', ...)
+    result = []
+    for index in range(count):
+        name, category = LINE_ITEM_NAMES[index % len(LINE_ITEM_NAMES)]
+        repeat = index // len(LINE_ITEM_NAMES)
+        result.append((f'{name} {repeat + 1}' if repeat else name, category))
+    return result
+
+
+def amounts(rng, names, periods, scale):
+    # (names, periods) int64 cents: a base level per name with trend, seasonality and noise
+    base = rng.lognormal(mean=9.5, sigma=0.8, size=(names, 1))
+    trend = 1 + rng.normal(0.004, 0.003, size=(names, 1)) * np.arange(periods)
+    season = 1 + 0.1 * np.sin(2 * np.pi * (np.arange(periods) % 12) / 12 + rng.uniform(0, 2 * np.pi, size=(names, 1)))
+    noise = rng.normal(1, 0.05, size=(names, periods))
+    return np.maximum(np.rint(base * scale * trend * season * noise * 100), 0).astype(np.int64)
+
+
+def generate(users=1, models=1, scenarios=3, periods=36, items=12, start=DEFAULT_START, seed=0, prefix='bench',
+             chunk_size=DEFAULT_CHUNK_SIZE, password=DEFAULT_PASSWORD, progress=None):
+    # Returns counts of what was created. Emails are <prefix><n>@example.com.
+    rng = np.random.default_rng(seed)
+    end = add_months(start, periods) - timedelta(days=1)
+    names = line_item_names(items)
+    password_hash = make_password(password)  # hashed once, not per user
+    counts = {'users': 0, 'models': 0, 'scenarios': 0, 'periods': 0, 'line_items': 0}
+
+    for number in range(users):
+        with transaction.atomic():
+            user = User.objects.create(
+                email=f'{prefix}{number}@example.com', password=password_hash,
+                first_name='Bench', last_name=str(number), company_name='Synthetic',
+            )
+            created, calendar = generate_calendar(user, start, end)
+            month_ids = [period.id for period in calendar if period.period_type == 'monthly']
+            counts['users'] += 1
+            counts['periods'] += created
+
+        for model_number in range(models):
+            with transaction.atomic():
+                model = FinancialModel.objects.create(
+                    user=user, name=f'Synthetic {number}.{model_number}', version='1',
+                    model_type=MODEL_TYPES[model_number % len(MODEL_TYPES)],
+                )
+                scenario_rows = Scenario.objects.bulk_create([
+                    Scenario(model=model, user=user, name=SCENARIO_NAMES[index] if index < len(SCENARIO_NAMES) else f'Scenario {index + 1}')
+                    for index in range(scenarios)
+                ])
+                Assumption.objects.bulk_create([
+                    Assumption(model=model, scenario=scenario, name='Growth', value=Decimal('5'), unit='%',
+                               distribution='normal', stdev=Decimal('2'), applies_to='Revenue')
+                    for scenario in scenario_rows
+                ])
+                for index, scenario in enumerate(scenario_rows):
+                    scale = SCENARIO_SCALE[index] if index < len(SCENARIO_SCALE) else rng.uniform(0.8, 1.2)
+                    cents = amounts(rng, len(names), len(month_ids), scale)
+                    rows = [
+                        (model.id, scenario.id, period_id, name, category, Decimal(value).scaleb(-2))
+                        for (name, category), values in zip(names, cents.tolist())
+                        for period_id, value in zip(month_ids, values)
+                    ]
+                    write_rows(rows, chunk_size)
+                    counts['line_items'] += len(rows)
+                rollups.rebuild([model.id])
+                FinancialModel.bump_revision(model.id)
+            counts['models'] += 1
+            counts['scenarios'] += scenarios
+            if progress:
+                progress(counts)
+    return counts
@@ -1,3 +1,1119 @@
-from django.test import TestCase
+import io
+import json
+import os
+import tempfile
+from datetime import date
+from importlib.util import find_spec
+from unittest import mock , skipUnless
+from decimal import Decimal
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError , call_command
+from django.db import connection
+from django.test import TestCase , override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from accounts.models import User
+from .models import FinancialModel , Period , Scenario , LineItem , PeriodRollup , Assumption , ImportJob , Formula , VersionedLineItem
+from .importer import process_import_job , run_import_job
+from .forecast import project
+from .cache import get_cache
+from .instrumentation import reset_stats
+from .columnar import COLUMNS , live_snapshot
+from .engine import ScenarioMatrix
+from .formulas import recompute
 
-# Create your tests here.
+
+def use_snapshot_dir(test):
+    # columnar snapshots go to a directory that lives as long as the test
+    directory = tempfile.TemporaryDirectory()
+    test.addCleanup(directory.cleanup)
+    override = override_settings(FORECASTING_SNAPSHOT_DIR=directory.name)
+    override.enable()
+    test.addCleanup(override.disable)
+    return directory.name
+
+
+class ForecastingTestCase(TestCase):
+    def setUp(self):
+        self.snapshot_dir = use_snapshot_dir(self)
+        self.user = User.objects.create_user(email='analyst@example.com', password='pass', first_name='A', last_name='B')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        # ids restart with every test, cached responses must not carry over
+        cache.clear()
+        get_cache().clear()
+        self.model = FinancialModel.objects.create(user=self.user, name='Budget', version='1', model_type='Budget')
+        self.base = Scenario.objects.create(model=self.model, name='Base', user=self.user)
+        self.jan = Period.objects.create(label='Jan 2025', start_date=date(2025, 1, 1), end_date=date(2025, 1, 31), period_type='monthly', user=self.user)
+        self.feb = Period.objects.create(label='Feb 2025', start_date=date(2025, 2, 1), end_date=date(2025, 2, 28), period_type='monthly', user=self.user)
+
+    def add_item(self, name, category, amount, period=None, scenario=None):
+        return LineItem.objects.create(
+            model=self.model, scenario=scenario or self.base, period=period or self.jan,
+            name=name, category=category, amount=Decimal(amount),
+        )
+
+
+class SummaryTests(ForecastingTestCase):
+    def test_summary_totals_and_margins(self):
+        self.add_item('Sales', 'Revenue', '1000.00')
+        self.add_item('Services', 'Revenue', '500.50')
+        self.add_item('Rent', 'Expense', '300.25')
+        self.add_item('Sales', 'Revenue', '200.00', period=self.feb)
+
+        response = self.client.get(f'/api/v1/finance-model/{self.model.id}/summary/')
+        self.assertEqual(response.status_code, 200)
+        scenario = response.data['scenarios'][0]
+        self.assertEqual(scenario['totals']['Revenue'], '1700.50')
+        self.assertEqual(scenario['net_income'], '1400.25')
+        self.assertEqual([p['label'] for p in scenario['periods']], ['Jan 2025', 'Feb 2025'])
+        self.assertEqual(scenario['periods'][0]['net_income'], '1200.25')
+        self.assertEqual(scenario['periods'][1]['net_margin'], 1.0)
+
+    def test_summary_of_empty_model(self):
+        response = self.client.get(f'/api/v1/finance-model/{self.model.id}/summary/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['scenarios'], [])
+
+    def test_scenario_ids_must_be_integers(self):
+        self.add_item('Sales', 'Revenue', '10.00')
+        for action in ('summary', 'rollup', 'kpis'):
+            url = f'/api/v1/finance-model/{self.model.id}/{action}/'
+            response = self.client.get(url, {'scenario_id': [self.base.id, 'abc']})
+            self.assertEqual((response.status_code, list(response.data)), (400, ['scenario_id']), action)
+            self.assertEqual(self.client.get(url, {'scenario_id': self.base.id}).status_code, 200, action)
+
+
+class QueryCountTests(ForecastingTestCase):
+    def add_rows(self, count):
+        for i in range(count):
+            scenario = Scenario.objects.create(model=self.model, name=f'S{i}', user=self.user)
+            period = Period.objects.create(label=f'P{i}', start_date=date(2025, 1, 1), end_date=date(2025, 1, 31), period_type='monthly', user=self.user)
+            self.add_item(f'Item {i}', 'Revenue', '10.00', period=period, scenario=scenario)
+
+    def test_line_item_list_is_constant_in_queries(self):
+        self.add_rows(3)
+        with self.assertNumQueries(3):  # revision check + COUNT + one joined SELECT
+            response = self.client.get('/api/v1/line-item/')
+        self.assertEqual(len(response.data['results']), 3)
+        self.add_rows(7)
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/v1/line-item/')
+        self.assertEqual(len(response.data['results']), 10)
+        self.assertEqual(response.data['results'][0]['scenario']['model']['id'], self.model.id)
+
+    def test_line_item_flat_list(self):
+        self.add_rows(5)
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/v1/line-item/', {'flat': 'true'})
+        row = response.data['results'][0]
+        self.assertEqual(row['model_id'], self.model.id)
+        self.assertNotIn('model', row)
+
+    def test_scenario_list_is_constant_in_queries(self):
+        self.add_rows(9)
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/v1/scenario/')
+        self.assertEqual(len(response.data['results']), 10)
+
+
+class BulkIngestTests(ForecastingTestCase):
+    def row(self, **overrides):
+        return {'name': 'Sales', 'category': 'Revenue', 'amount': '12.50', 'model_id': self.model.id,
+                'scenario_id': self.base.id, 'period_id': self.jan.id, **overrides}
+
+    def test_bulk_json(self):
+        rows = [self.row(amount=str(i)) for i in range(25)]
+        response = self.client.post('/api/v1/line-item/bulk/?chunk_size=10', rows, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 25)
+        self.assertEqual(LineItem.objects.count(), 25)
+
+    def test_bulk_csv_with_defaults(self):
+        body = 'name,category,amount\nSales,Revenue,100.00\nRent,Expense,40.00\n'
+        response = self.client.post(
+            f'/api/v1/line-item/bulk/?model_id={self.model.id}&scenario_id={self.base.id}&period_id={self.feb.id}',
+            body, content_type='text/csv',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(LineItem.objects.filter(period=self.feb).count(), 2)
+        self.assertEqual(LineItem.objects.get(name='Rent').amount, Decimal('40.00'))
+
+    def test_bulk_errors_reject_batch(self):
+        other = FinancialModel.objects.create(user=self.user, name='Other', version='1', model_type='Budget')
+        rows = [self.row(), self.row(amount='1.234'), self.row(category='Bogus'), self.row(model_id=other.id)]
+        response = self.client.post('/api/v1/line-item/bulk/', rows, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['row'] for error in response.data['errors']], [1, 2, 3])
+        self.assertIn('scenario_id', response.data['errors'][2]['errors'])
+        self.assertEqual(LineItem.objects.count(), 0)
+
+        response = self.client.post('/api/v1/line-item/bulk/?partial=true', rows, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 1)
+
+    def test_amount_limits_count_positive_exponents(self):
+        rows = [self.row(amount='1E+20'), self.row(amount='1E+12'), self.row(amount='0E+20'), self.row(amount='99999999999999')]
+        response = self.client.post('/api/v1/line-item/bulk/', rows, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([(error['row'], list(error['errors'])) for error in response.data['errors']], [(0, ['amount']), (3, ['amount'])])
+
+    def test_bulk_queries_do_not_grow_with_rows(self):
+        # 3 lookups + insert + rollup upsert + revision bump + formula lookup, whatever the batch size
+        with self.assertNumQueries(14):
+            self.client.post('/api/v1/line-item/bulk/', [self.row() for _ in range(50)], format='json')
+        with self.assertNumQueries(11):  # rollup row now exists: update only
+            self.client.post('/api/v1/line-item/bulk/', [self.row() for _ in range(500)], format='json')
+
+class ExportTests(ForecastingTestCase):
+    def test_export_csv_with_filters(self):
+        self.add_item('Sales', 'Revenue', '100.00')
+        self.add_item('Rent', 'Expense', '40.00')
+        self.add_item('Sales', 'Revenue', '120.00', period=self.feb)
+        response = self.client.get(f'/api/v1/finance-model/{self.model.id}/export/', {'category': 'Revenue', 'period_start': '2025-02-01'})
+        self.assertEqual(response.status_code, 200)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(',')[:3], ['id', 'scenario_id', 'scenario'])
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].endswith('Sales,Revenue,120.00'))
+
+    def test_export_ndjson(self):
+        self.add_item('Sales', 'Revenue', '100.00')
+        response = self.client.get(f'/api/v1/finance-model/{self.model.id}/export/', {'output': 'ndjson'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(rows[0]['amount'], '100.00')
+        self.assertEqual(rows[0]['period'], 'Jan 2025')
+
+    def test_export_rejects_malformed_filters(self):
+        url = f'/api/v1/finance-model/{self.model.id}/export/'
+        for params in ({'period_start': 'garbage'}, {'period_end': '2025-02-30'}, {'scenario_id': 'abc'}):
+            response = self.client.get(url, params)
+            self.assertEqual((response.status_code, list(response.data)), (400, list(params)), params)
+
+
+class PaginationTests(ForecastingTestCase):
+    def setUp(self):
+        super().setUp()
+        for i in range(25):
+            self.add_item(f'Item {i}', 'Revenue', '1.00')
+
+    def test_cursor_pages_cover_all_rows_without_count(self):
+        names = []
+        url = '/api/v1/line-item/?pagination=cursor&page_size=10&flat=true'
+        while url:
+            with self.assertNumQueries(2):  # revision check + page
+                response = self.client.get(url)
+            self.assertNotIn('count', response.data)
+            names += [row['name'] for row in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(names, [f'Item {i}' for i in range(25)])
+
+    def test_page_size_is_capped(self):
+        response = self.client.get('/api/v1/line-item/', {'page_size': 100000, 'flat': 'true'})
+        self.assertEqual(len(response.data['results']), 25)
+        self.assertEqual(response.data['count'], 25)
+
+    def test_page_numbers_without_count(self):
+        with self.assertNumQueries(2):  # revision check + page
+            response = self.client.get('/api/v1/line-item/', {'count': 'false', 'page': 3, 'flat': 'true'})
+        self.assertNotIn('count', response.data)
+        self.assertEqual(len(response.data['results']), 5)
+        self.assertIsNone(response.data['next'])
+        self.assertIn('page=2', response.data['previous'])
+
+
+class RollupTests(ForecastingTestCase):
+    def rollup(self, category='Revenue', period=None):
+        return PeriodRollup.objects.get(model=self.model, scenario=self.base, period=period or self.jan, category=category)
+
+    def test_rollup_follows_create_update_delete(self):
+        sales = self.add_item('Sales', 'Revenue', '100.00')
+        self.add_item('Services', 'Revenue', '50.00')
+        self.assertEqual((self.rollup().total, self.rollup().count), (Decimal('150.00'), 2))
+
+        sales.amount = Decimal('80.00')
+        sales.period = self.feb
+        sales.save()
+        self.assertEqual((self.rollup().total, self.rollup().count), (Decimal('50.00'), 1))
+        self.assertEqual(self.rollup(period=self.feb).total, Decimal('80.00'))
+
+        sales.delete()
+        self.assertFalse(PeriodRollup.objects.filter(period=self.feb).exists())
+
+    def test_rollup_endpoint_and_rebuild(self):
+        self.add_item('Sales', 'Revenue', '100.00')
+        self.add_item('Rent', 'Expense', '30.00')
+        PeriodRollup.objects.update(total=0)  # simulate drift
+        call_command('rebuild_rollups', self.model.id, stdout=io.StringIO())
+
+        response = self.client.get(f'/api/v1/finance-model/{self.model.id}/rollup/')
+        period = response.data['results'][0]
+        self.assertEqual(period['period'], 'Jan 2025')
+        self.assertEqual(period['net_income'], Decimal('70.00'))
+        self.assertEqual(period['counts'], {'Expense': 1, 'Revenue': 1})
+
+
+class SimulationTests(ForecastingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.add_item('Sales', 'Revenue', '1000.00')
+        self.add_item('Sales', 'Revenue', '1000.00', period=self.feb)
+        self.add_item('Rent', 'Expense', '400.00')
+        Assumption.objects.create(model=self.model, scenario=self.base, name='Demand', value=Decimal('0'), unit='%',
+                                  distribution='normal', stdev=Decimal('10'), min_value=Decimal('-50'), applies_to='Sales')
+
+    def run_simulation(self, **params):
+        return self.client.post(f'/api/v1/finance-model/{self.model.id}/simulate/', {'scenario_id': self.base.id, **params}, format='json')
+
+    def test_percentile_bands_are_seeded(self):
+        first = self.run_simulation(trials=5000, seed=7).data
+        second = self.run_simulation(trials=5000, seed=7).data
+        self.assertEqual(first['periods'], second['periods'])
+        jan = first['periods'][0]
+        self.assertEqual(jan['expense'], {'p5': 400.0, 'p50': 400.0, 'p95': 400.0})
+        self.assertLess(jan['revenue']['p5'], 1000)
+        self.assertGreater(jan['revenue']['p95'], 1000)
+        self.assertAlmostEqual(jan['revenue']['p50'], 1000, delta=10)
+        self.assertAlmostEqual(jan['net_income']['p95'] - jan['net_income']['p5'], 2 * 1.645 * 100, delta=15)
+
+    def test_scenario_must_belong_to_model(self):
+        other = FinancialModel.objects.create(user=self.user, name='Other', version='1', model_type='MonteCarlo')
+        scenario = Scenario.objects.create(model=other, name='Base', user=self.user)
+        response = self.run_simulation(scenario_id=scenario.id)
+        self.assertEqual(response.status_code, 400)
+
+    def test_assumption_requires_distribution_parameters(self):
+        response = self.client.post('/api/v1/assumption/', {
+            'model_id': self.model.id, 'scenario_id': self.base.id, 'name': 'Price', 'value': '5', 'distribution': 'uniform',
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('min_value', response.data)
+        for stdev in ('-5', None):
+            response = self.client.post('/api/v1/assumption/', {
+                'model_id': self.model.id, 'scenario_id': self.base.id, 'name': 'Price', 'value': '5', 'distribution': 'normal', 'stdev': stdev,
+            }, format='json')
+            self.assertEqual((response.status_code, list(response.data)), (400, ['stdev']), stdev)
+
+
+class ValuationTests(ForecastingTestCase):
+    def test_npv_and_irr_match_closed_form(self):
+        from .valuation import irr , npv
+        flows = np.array([[-100.0, 60.0, 60.0], [-100.0, 0.0, 121.0], [10.0, 10.0, 10.0]])
+        rates = irr(flows)
+        self.assertAlmostEqual(rates[0], 0.130662, places=5)
+        self.assertAlmostEqual(rates[1], 0.1, places=8)
+        self.assertTrue(np.isnan(rates[2]))
+        self.assertAlmostEqual(npv(flows[:1], [0.1])[0, 0], -100 / 1.1 + 60 / 1.21 + 60 / 1.331)
+
+    def test_valuation_is_memoized_per_revision(self):
+        self.add_item('Capex', 'Expense', '1000.00')
+        self.add_item('Sales', 'Revenue', '1200.00', period=self.feb)
+        url = f'/api/v1/finance-model/{self.model.id}/valuation/'
+        body = {'discount_rates': [0.0, 0.12], 'periods_per_year': 1}
+        first = self.client.post(url, body, format='json').data
+        scenario = first['scenarios'][0]
+        self.assertEqual(scenario['cash_flows'], [-1000.0, 1200.0])
+        self.assertAlmostEqual(scenario['irr'], 0.2, places=6)
+        self.assertEqual(scenario['valuations'][0]['npv'], 200.0)
+
+        with self.assertNumQueries(1):  # the model lookup only
+            self.client.post(url, body, format='json')
+        get_cache().clear()  # kept in the 'forecasting' alias with the other cached results
+        with self.assertNumQueries(4):
+            self.client.post(url, body, format='json')
+        self.add_item('Sales', 'Revenue', '100.00', period=self.feb)
+        self.assertEqual(self.client.post(url, body, format='json').data['scenarios'][0]['cash_flows'], [-1000.0, 1300.0])
+
+
+class SensitivityTests(ForecastingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.add_item('Units', 'Revenue', '1000.00')
+        self.add_item('Wages', 'Expense', '500.00')
+        for name, target in (('Price', 'Units'), ('Pay rise', 'Wages')):
+            Assumption.objects.create(model=self.model, scenario=self.base, name=name, value=Decimal('0'), unit='%', applies_to=target)
+
+    def run_sensitivity(self, **params):
+        body = {'scenario_id': self.base.id, 'discount_rate': 0, **params}
+        return self.client.post(f'/api/v1/finance-model/{self.model.id}/sensitivity/', body, format='json')
+
+    def test_grid(self):
+        response = self.run_sensitivity(ranges=[
+            {'name': 'Price', 'low': -10, 'high': 10, 'steps': 3},
+            {'name': 'Pay rise', 'values': [0, 20]},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['base']['net_income'], 500.0)
+        self.assertEqual(response.data['net_income'], [[400.0, 300.0], [500.0, 400.0], [600.0, 500.0]])
+
+    def test_tornado_orders_by_swing(self):
+        response = self.run_sensitivity(mode='tornado', ranges=[
+            {'name': 'Pay rise', 'values': [-10, 10]},
+            {'name': 'Price', 'values': [-10, 10]},
+        ])
+        self.assertEqual([row['name'] for row in response.data['tornado']], ['Price', 'Pay rise'])
+        self.assertEqual(response.data['tornado'][0]['swing'], 200.0)
+
+    def test_unknown_assumption(self):
+        response = self.run_sensitivity(ranges=[{'name': 'Nope', 'values': [1]}, {'name': 'Also missing', 'values': [1]}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['ranges'], ["Unknown or unapplied assumptions: Nope, Also missing"])
+
+    def test_engine_key_errors_are_not_reported_as_unknown_assumptions(self):
+        with mock.patch('forecasting.views.sensitivity', side_effect=KeyError('revenue')), self.assertRaises(KeyError):
+            self.run_sensitivity(ranges=[{'name': 'Price', 'values': [1]}])
+
+
+@skipUnless(find_spec('openpyxl'), "openpyxl is not installed")
+class UploadTests(ForecastingTestCase):
+    def workbook(self, rows):
+        from openpyxl import Workbook
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(['Name', 'Category', 'Amount'])
+        for row in rows:
+            sheet.append(row)
+        buffer = io.BytesIO()
+        workbook.save(buffer)
+        return SimpleUploadedFile('actuals.xlsx', buffer.getvalue())
+
+    def upload(self, upload):
+        return self.client.post('/api/v1/line-item/upload/', {
+            'file': upload, 'model_id': self.model.id, 'scenario_id': self.base.id, 'period_id': self.jan.id,
+        }, format='multipart')
+
+    def test_small_upload_finishes_inline(self):
+        response = self.upload(self.workbook([['Sales', 'Revenue', 1200.5], ['Rent', 'Expense', 300], ['Bad', 'Revenue', 'n/a']]))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['created_rows'], response.data['failed_rows']), (2, 1))
+        self.assertEqual(response.data['errors'][0]['row'], 4)
+        self.assertEqual(LineItem.objects.get(name='Sales').amount, Decimal('1200.50'))
+
+        status = self.client.get(f"/api/v1/line-item/upload/{response.data['id']}/")
+        self.assertEqual(status.data['status'], 'done')
+
+    def test_large_upload_runs_as_job(self):
+        with mock.patch('forecasting.importer.INLINE_MAX_BYTES', 0), mock.patch('forecasting.importer.get_executor') as executor:
+            response = self.upload(self.workbook([['Sales', 'Revenue', 10]]))
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], 'pending')
+        job_id, path = executor.return_value.submit.call_args.args[1:3]
+        process_import_job(job_id, path, {'model_id': self.model.id, 'scenario_id': self.base.id, 'period_id': self.jan.id})
+        self.assertEqual(ImportJob.objects.get(pk=job_id).created_rows, 1)
+
+    def test_failures_outside_the_rows_are_logged_and_recorded(self):
+        with mock.patch('forecasting.importer.os.unlink', side_effect=OSError('disk gone')) as unlink, \
+                self.assertLogs('forecasting.importer', 'ERROR') as logs:
+            response = self.upload(self.workbook([['Sales', 'Revenue', 10]]))
+        os.remove(unlink.call_args.args[0])
+        self.assertEqual((response.data['status'], response.data['detail']), ('failed', 'disk gone'))
+        self.assertIn('Traceback', logs.output[0])
+        with mock.patch('forecasting.importer.INLINE_MAX_BYTES', 0), mock.patch('forecasting.importer.get_executor') as executor:
+            response = self.upload(self.workbook([['Sales', 'Revenue', 10]]))
+        job_id, path = executor.return_value.submit.call_args.args[1:3]
+        with mock.patch('forecasting.importer.iter_rows', side_effect=RuntimeError('corrupt')), \
+                mock.patch('forecasting.importer.close_old_connections'), mock.patch('forecasting.importer.connections'), \
+                self.assertLogs('forecasting.importer', 'ERROR'):
+            run_import_job(job_id, path)
+        self.assertEqual(ImportJob.objects.values_list('status', 'detail').get(pk=job_id), ('failed', 'corrupt'))
+
+    def test_rejects_unsupported_files(self):
+        response = self.upload(SimpleUploadedFile('actuals.xls', b'legacy'))
+        self.assertEqual(response.status_code, 400)
+
+
+class FormulaTests(ForecastingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.add_item('Units', 'Revenue', '10.00')
+        self.add_item('Units', 'Revenue', '20.00', period=self.feb)
+        self.price = Assumption.objects.create(model=self.model, scenario=self.base, name='Price', value=Decimal('5'), unit='$')
+
+    def add_formula(self, name, expression, category='Revenue'):
+        return self.client.post('/api/v1/formula/', {
+            'model_id': self.model.id, 'name': name, 'category': category, 'expression': expression,
+        }, format='json')
+
+    def derived(self, name):
+        return dict(LineItem.objects.filter(name=name, formula__isnull=False).values_list('period_id', 'amount'))
+
+    def test_formula_derives_line_items(self):
+        self.assertEqual(self.add_formula('Revenue', '[Units] * [Price]').status_code, 201)
+        self.assertEqual(self.derived('Revenue'), {self.jan.id: Decimal('50.00'), self.feb.id: Decimal('100.00')})
+        self.assertEqual(PeriodRollup.objects.get(period=self.jan, category='Revenue').total, Decimal('60.00'))
+
+    def test_category_change_moves_derived_items_and_rollups(self):
+        formula_id = self.add_formula('Fees', '[Units] * [Price]').data['id']
+        response = self.client.patch(f'/api/v1/formula/{formula_id}/', {'category': 'Expense'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(LineItem.objects.filter(formula_id=formula_id).values_list('category', flat=True)), {'Expense'})
+        self.assertEqual(PeriodRollup.objects.get(period=self.jan, category='Revenue').total, Decimal('10.00'))
+        self.assertEqual(PeriodRollup.objects.get(period=self.jan, category='Expense').total, Decimal('50.00'))
+        rebuilt = sorted(PeriodRollup.objects.values_list('period_id', 'category', 'total', 'count'))
+        call_command('rebuild_rollups', stdout=io.StringIO())
+        self.assertEqual(sorted(PeriodRollup.objects.values_list('period_id', 'category', 'total', 'count')), rebuilt)
+
+    def test_inputs_recompute_downstream_only(self):
+        self.add_formula('Revenue', '[Units] * [Price]')
+        self.add_formula('Cost', 'Revenue * 0.4', category='Expense')
+        self.price.value = Decimal('6')
+        self.price.save()
+        self.assertEqual(self.derived('Cost'), {self.jan.id: Decimal('24.00'), self.feb.id: Decimal('48.00')})
+        units = LineItem.objects.get(name='Units', period=self.jan)
+        units.amount = Decimal('15')
+        units.save()
+        self.assertEqual(self.derived('Revenue')[self.jan.id], Decimal('90.00'))
+        units.delete()
+        self.assertNotIn(self.jan.id, self.derived('Revenue'))
+
+    def test_rejects_cycles_and_unknown_names(self):
+        self.add_formula('A', '[Units] + 1')
+        Formula.objects.filter(name='A').update(expression='B + 1')
+        response = self.add_formula('B', 'A * 2')
+        self.assertIn('Circular reference', str(response.data['expression']))
+        response = self.add_formula('C', '[Headcount] * 2')
+        self.assertIn('Headcount', str(response.data['expression']))
+        response = self.add_formula('D', '__import__("os")')
+        self.assertEqual(response.status_code, 400)
+
+    def test_constants_are_floats_and_bad_results_are_rejected(self):
+        self.assertEqual(self.add_formula('Half', '[Units] * 2 ** -1').status_code, 201)
+        self.assertEqual(self.derived('Half'), {self.jan.id: Decimal('5.00'), self.feb.id: Decimal('10.00')})
+        for expression in ('[Units] * 10 ** 30', '[Units] / 0', '[Units] * 0 / 0'):
+            response = self.add_formula('Bad', expression)
+            self.assertEqual(response.status_code, 400, expression)
+            self.assertIn('no valid amount', str(response.data['expression']))
+        self.assertFalse(Formula.objects.filter(name='Bad').exists())
+        self.assertEqual(self.derived('Bad'), {})
+
+    def test_cells_without_a_valid_amount_are_not_stored(self):
+        self.add_formula('Per Unit', '[Price] / [Units]')
+        LineItem.objects.get(name='Units', period=self.jan).delete()
+        self.add_item('Units', 'Revenue', '0.00')
+        self.assertEqual(self.derived('Per Unit'), {self.feb.id: Decimal('0.25')})
+
+    def test_deleting_formula_removes_derived_items(self):
+        formula_id = self.add_formula('Revenue', '[Units] * [Price]').data['id']
+        self.client.delete(f'/api/v1/formula/{formula_id}/')
+        self.assertEqual(self.derived('Revenue'), {})
+        self.assertEqual(PeriodRollup.objects.get(period=self.jan, category='Revenue').total, Decimal('10.00'))
+
+
+
+class ForecastTests(ForecastingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.mar = Period.objects.create(label='Mar 2025', start_date=date(2025, 3, 1), end_date=date(2025, 3, 31), period_type='monthly', user=self.user)
+        for period, sales, rent in ((self.jan, '100', '50'), (self.feb, '110', '50'), (self.mar, '120', '50')):
+            self.add_item('Sales', 'Revenue', sales, period=period)
+            self.add_item('Rent', 'Expense', rent, period=period)
+
+    def run_forecast(self, **params):
+        return self.client.post(f'/api/v1/finance-model/{self.model.id}/forecast/', {'scenario_id': self.base.id, **params}, format='json')
+
+    def test_methods(self):
+        values = np.array([[100.0, 110.0, 120.0, 130.0], [10.0, 20.0, 30.0, 40.0]])
+        self.assertEqual(project(values, 2, 'trend').tolist(), [[140.0, 150.0], [50.0, 60.0]])
+        self.assertEqual(project(values, 3, 'seasonal_naive', season_length=2).tolist(), [[120.0, 130.0, 120.0], [30.0, 40.0, 30.0]])
+        self.assertEqual(project(values, 2, 'linear_regression').tolist(), [[140.0, 150.0], [50.0, 60.0]])
+        self.assertEqual(project(values, 1, 'exponential_smoothing', alpha=1.0).tolist(), [[130.0], [40.0]])
+        self.assertEqual(project(values, 1, 'exponential_smoothing', alpha=1.0, beta=1.0).tolist(), [[140.0], [50.0]])
+        self.assertEqual(project(-values, 5, 'trend')[0, -1], -180.0)
+        self.assertEqual(project(values[:, ::-1], 20, 'trend')[0, -1], 0.0)  # never went negative, doesn't now
+
+    def test_writes_periods_and_items(self):
+        response = self.run_forecast(periods=2, method='linear_regression')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['series'], response.data['created'], response.data['created_periods']), (2, 4, 2))
+        self.assertEqual([period['label'] for period in response.data['periods']], ['Apr 2025', 'May 2025'])
+        may = Period.objects.get(id=response.data['periods'][1]['id'])
+        self.assertEqual((may.start_date, may.end_date), (date(2025, 5, 1), date(2025, 5, 31)))
+        self.assertEqual(LineItem.objects.get(name='Sales', period=may).amount, Decimal('140.00'))
+        self.assertEqual(PeriodRollup.objects.get(period=may, category='Expense').total, Decimal('50.00'))
+        # the next run continues after the forecast and reuses existing periods
+        Period.objects.create(label='Jun 2025', start_date=date(2025, 6, 1), end_date=date(2025, 6, 30), period_type='monthly', user=self.user)
+        self.assertEqual(self.run_forecast(periods=1).data['created_periods'], 0)
+
+    def test_dry_run_writes_nothing(self):
+        response = self.run_forecast(periods=3, method='trend', dry_run=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['forecast'][1], {'name': 'Sales', 'category': 'Revenue', 'values': [130.0, 140.0, 150.0]})
+        self.assertEqual(LineItem.objects.count(), 6)
+
+    def test_many_series_in_one_pass(self):
+        LineItem.objects.bulk_create([
+            LineItem(model=self.model, scenario=self.base, period=period, name=f'Item {i}', category='Expense', amount=Decimal(i))
+            for i in range(2000) for period in (self.jan, self.feb, self.mar)
+        ])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.run_forecast(periods=12, method='exponential_smoothing')
+        self.assertEqual(response.data['created'], 2002 * 12)
+        # rollup upserts are per period and category; nothing runs per series
+        self.assertLess(len(queries), 150)
+
+
+class ResponseCacheTests(ForecastingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.add_item('Sales', 'Revenue', '100.00')
+
+    def test_summary_is_served_from_cache_until_a_write(self):
+        url = f'/api/v1/finance-model/{self.model.id}/summary/'
+        first = self.client.get(url)
+        with self.assertNumQueries(1):  # the model lookup only
+            cached = self.client.get(url)
+        self.assertEqual(cached.data, first.data)
+        self.add_item('Rent', 'Expense', '40.00')
+        fresh = self.client.get(url)
+        self.assertNotEqual(fresh['ETag'], first['ETag'])
+        self.assertEqual(fresh.data['scenarios'][0]['periods'][0]['net_income'], '60.00')
+
+    def test_conditional_get_returns_not_modified(self):
+        url = f'/api/v1/line-item/?model_id={self.model.id}'
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        Assumption.objects.create(model=self.model, scenario=self.base, name='Growth', value=Decimal('5'), unit='%')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_model_updates_invalidate_lists(self):
+        self.client.get('/api/v1/finance-model/')
+        revision = FinancialModel.objects.get(id=self.model.id).revision
+        response = self.client.patch(f'/api/v1/finance-model/{self.model.id}/', {'name': 'Plan'}, format='json')
+        self.assertEqual(response.data['revision'], revision + 1)
+        self.assertEqual(self.client.get('/api/v1/finance-model/').data['results'][0]['name'], 'Plan')
+        other = User.objects.create_user(email='other@example.com', password='pass', first_name='O', last_name='P')
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get('/api/v1/finance-model/').data['count'], 0)
+
+
+
+class AsyncReadTests(ForecastingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.add_item('Sales', 'Revenue', '100.00')
+        self.add_item('Rent', 'Expense', '40.00', period=self.feb)
+        self.auth = {'headers': {'Authorization': f'Bearer {RefreshToken.for_user(self.user).access_token}'}}
+
+    async def test_lists_match_the_drf_endpoints(self):
+        for path in ('finance-model/', f'scenario/?model_id={self.model.id}', f'line-item/?model_id={self.model.id}', f'line-item/?flat=true&page_size=1'):
+            response = await self.async_client.get(f'/api/v1/async/{path}', **self.auth)
+            self.assertEqual(response.status_code, 200)
+            expected = await sync_to_async(lambda: self.client.get(f'/api/v1/{path}').json())()
+            # same body, links point back at the async path
+            self.assertEqual(json.loads(response.content.decode().replace('/api/v1/async/', '/api/v1/')), expected)
+
+    async def test_summary_matches_the_drf_endpoint(self):
+        response = await self.async_client.get(f'/api/v1/async/finance-model/{self.model.id}/summary/', **self.auth)
+        expected = await sync_to_async(lambda: self.client.get(f'/api/v1/finance-model/{self.model.id}/summary/').json())()
+        self.assertEqual(response.json(), expected)
+        self.assertEqual(response.json()['scenarios'][0]['periods'][1]['net_income'], '-40.00')
+
+    async def test_uncounted_pages(self):
+        response = await self.async_client.get('/api/v1/async/line-item/?count=false&page_size=1', **self.auth)
+        data = response.json()
+        self.assertNotIn('count', data)
+        self.assertIn('/async/line-item/?count=false&page=2', data['next'])
+        self.assertEqual(len(data['results']), 1)
+
+    async def test_requires_token_and_ownership(self):
+        self.assertEqual((await self.async_client.get('/api/v1/async/finance-model/')).status_code, 401)
+        self.assertEqual((await self.async_client.post('/api/v1/async/finance-model/', **self.auth)).status_code, 405)
+        other = await User.objects.acreate(email='other@example.com', first_name='O', last_name='P')
+        auth = {'headers': {'Authorization': f'Bearer {RefreshToken.for_user(other).access_token}'}}
+        response = await self.async_client.get(f'/api/v1/async/finance-model/{self.model.id}/summary/', **auth)
+        self.assertEqual(response.status_code, 404)  # other tenants' rows are outside the queryset
+        self.assertEqual((await self.async_client.get('/api/v1/async/finance-model/', **auth)).json()['count'], 0)
+
+    async def test_malformed_ids_are_400(self):
+        for url in (f'/api/v1/async/finance-model/{self.model.id}/summary/?scenario_id=abc',
+                    '/api/v1/async/scenario/?model_id=abc', '/api/v1/async/line-item/?model_id=1.5'):
+            response = await self.async_client.get(url, **self.auth)
+            self.assertEqual(response.status_code, 400, url)
+        response = await self.async_client.get(f'/api/v1/async/scenario/?model_id={self.model.id}', **self.auth)
+        self.assertEqual(response.json()['count'], 1)
+
+    async def test_malformed_authorization_is_401(self):
+        for header in ('Bearer', 'Bearer a b', 'Bearer not-a-token'):
+            response = await self.async_client.get('/api/v1/async/finance-model/', headers={'Authorization': header})
+            self.assertEqual(response.status_code, 401, header)
+
+
+@override_settings(FORECASTING_INSTRUMENTATION=True, FORECASTING_STATS_USERS=['analyst@example.com'])
+class InstrumentationTests(ForecastingTestCase):
+    def setUp(self):
+        super().setUp()
+        reset_stats()
+        self.add_item('Sales', 'Revenue', '100.00')
+
+    def test_server_timing_counts_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/api/v1/line-item/?model_id={self.model.id}')
+        self.assertIn(f'desc="{len(queries)} queries"', response['Server-Timing'])
+        self.assertIn('serialize;dur=', response['Server-Timing'])
+
+    def test_stats_endpoint_reports_percentiles_per_endpoint(self):
+        for _ in range(3):
+            self.client.get(f'/api/v1/finance-model/{self.model.id}/summary/')
+        stats = self.client.get('/api/v1/instrumentation/stats/').data['endpoints']
+        summary = stats['GET financialmodel-summary']
+        self.assertEqual(summary['samples'], 3)
+        self.assertGreater(summary['response_bytes']['p50'], 0)
+        self.assertLessEqual(summary['latency_ms']['p50'], summary['latency_ms']['p99'])
+        other = User.objects.create_user(email='other@example.com', password='pass', first_name='O', last_name='P')
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get('/api/v1/instrumentation/stats/').status_code, 403)
+
+    async def test_async_views_are_measured(self):
+        auth = {'Authorization': f'Bearer {RefreshToken.for_user(self.user).access_token}'}
+        response = await self.async_client.get(f'/api/v1/async/finance-model/{self.model.id}/summary/', headers=auth)
+        self.assertIn('desc="5 queries"', response['Server-Timing'])  # user + model + rollups + periods + scenarios
+
+    @override_settings(FORECASTING_SLOW_QUERY_MS=0)
+    def test_slow_queries_are_logged_with_the_view(self):
+        with self.assertLogs('forecasting.instrumentation', 'WARNING') as logs:
+            self.client.get(f'/api/v1/finance-model/{self.model.id}/summary/')
+        self.assertIn('FinanceModelView.summary', logs.output[0])
+
+    @override_settings(FORECASTING_INSTRUMENTATION=False)
+    def test_disabled_by_default(self):
+        self.assertNotIn('Server-Timing', self.client.get('/api/v1/finance-model/'))
+        self.assertEqual(self.client.get('/api/v1/instrumentation/stats/').status_code, 404)
+
+
+class BenchmarkTests(TestCase):
+    def setUp(self):
+        use_snapshot_dir(self)
+
+    def test_generate_data_is_bulk_and_deterministic(self):
+        out = io.StringIO()
+        call_command('generate_data', users=2, models=1, scenarios=2, periods=12, items=5, seed=7, stdout=out)
+        self.assertEqual(LineItem.objects.count(), 2 * 2 * 12 * 5)
+        self.assertEqual(Period.objects.filter(user__email='bench0@example.com').count(), 12 + 4 + 1)
+        self.assertTrue(PeriodRollup.objects.exists())
+        first = list(LineItem.objects.filter(model__user__email='bench0@example.com').order_by('id').values_list('amount', flat=True))
+        with self.assertRaises(CommandError):
+            call_command('generate_data', stdout=out)
+        call_command('generate_data', users=2, models=1, scenarios=2, periods=12, items=5, seed=7, reset=True, stdout=out)
+        again = list(LineItem.objects.filter(model__user__email='bench0@example.com').order_by('id').values_list('amount', flat=True))
+        self.assertEqual(first, again)
+
+    def test_benchmark_reports_every_endpoint_as_json(self):
+        call_command('generate_data', periods=6, items=4, stdout=io.StringIO())
+        out = io.StringIO()
+        call_command('benchmark', iterations=2, warmup=0, only=['list', 'summary', 'auth'], stdout=out, stderr=io.StringIO())
+        report = json.loads(out.getvalue())
+        results = {result['name']: result for result in report['results']}
+        self.assertIn('finance-model summary', results)
+        self.assertIn('async line-item list', results)
+        self.assertEqual(results['auth login']['status'], 200)
+        self.assertEqual({result['errors'] for result in report['results']}, {0})
+        self.assertEqual(set(results['line-item list']['latency_ms']), {'p50', 'p95', 'p99', 'mean', 'max'})
+        self.assertGreater(results['line-item list']['queries']['max'], 0)
+        self.assertEqual(report['meta']['dataset']['line_items'], 3 * 6 * 4)
+
+
+class OwnerScopingTests(ForecastingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.item = self.add_item('Sales', 'Revenue', '100.00')
+        self.other = User.objects.create_user(email='other@example.com', password='pass', first_name='O', last_name='P')
+        self.shared = Period.objects.create(label='FY 2025', start_date=date(2025, 1, 1), end_date=date(2025, 12, 31), period_type='yearly')
+
+    def test_lists_and_details_hold_only_the_users_rows(self):
+        self.client.force_authenticate(self.other)
+        for prefix in ('finance-model', 'scenario', 'line-item', 'assumption', 'formula'):
+            self.assertEqual(self.client.get(f'/api/v1/{prefix}/').data['count'], 0, prefix)
+        self.assertEqual(self.client.get(f'/api/v1/scenario/{self.base.id}/').status_code, 404)
+        self.assertEqual(self.client.get(f'/api/v1/line-item/{self.item.id}/').status_code, 404)
+        self.assertEqual(self.client.delete(f'/api/v1/scenario/{self.base.id}/').status_code, 404)
+        self.assertTrue(Scenario.objects.filter(id=self.base.id).exists())
+        # the shared calendar stays visible to everyone
+        self.assertEqual([period['id'] for period in self.client.get('/api/v1/period/').data['results']], [self.shared.id])
+
+    def test_writes_cannot_reference_other_users_rows(self):
+        self.client.force_authenticate(self.other)
+        response = self.client.post('/api/v1/line-item/', {
+            'name': 'Sales', 'category': 'Revenue', 'amount': '1.00',
+            'model_id': self.model.id, 'scenario_id': self.base.id, 'period_id': self.jan.id,
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data), {'model_id', 'scenario_id', 'period_id'})
+        response = self.client.post('/api/v1/assumption/', {
+            'name': 'Growth', 'value': '5', 'model_id': self.model.id, 'scenario_id': self.base.id,
+        }, format='json')
+        self.assertEqual((response.status_code, set(response.data)), (400, {'model_id', 'scenario_id'}))
+        response = self.client.post('/api/v1/formula/', {
+            'name': 'Double', 'category': 'Revenue', 'expression': 'Sales * 2', 'model_id': self.model.id,
+        }, format='json')
+        self.assertEqual((response.status_code, set(response.data)), (400, {'model_id'}))
+
+    def test_scoped_queries_filter_on_the_owner(self):
+        self.assertIn('"user_id" =', str(Scenario.objects.owned_by(self.user).query))
+        self.assertIn('"user_id" =', str(LineItem.objects.owned_by(self.user).query))
+        self.assertEqual(list(Period.objects.owned_by(self.other)), [self.shared])
+
+
+class MoveBetweenModelsTests(ForecastingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.other = FinancialModel.objects.create(user=self.user, name='Plan', version='1', model_type='Budget')
+        self.other_base = Scenario.objects.create(model=self.other, name='Base', user=self.user)
+        self.units = self.add_item('Units', 'Revenue', '10.00')
+        Formula.objects.create(model=self.model, name='Double', category='Revenue', expression='Units * 2')
+        recompute(self.model.id)
+
+    def summary(self, model):
+        return self.client.get(f'/api/v1/finance-model/{model.id}/summary/').data['scenarios']
+
+    def test_moved_line_item_leaves_the_old_model(self):
+        self.assertEqual(self.summary(self.model)[0]['totals']['Revenue'], '30.00')
+        response = self.client.put(f'/api/v1/line-item/{self.units.id}/', {
+            'name': 'Units', 'category': 'Revenue', 'amount': '10.00',
+            'model_id': self.other.id, 'scenario_id': self.other_base.id, 'period_id': self.jan.id,
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.summary(self.model), [])  # the derived Double went with its input
+        self.assertFalse(LineItem.objects.filter(model=self.model).exists())
+        self.assertEqual(self.summary(self.other)[0]['totals']['Revenue'], '10.00')
+
+    def test_moved_scenario_bumps_both_models(self):
+        revisions = dict(FinancialModel.objects.values_list('id', 'revision'))
+        scenario = Scenario.objects.create(model=self.model, name='Spare', user=self.user)
+        scenario.model = self.other
+        scenario.save()
+        after = dict(FinancialModel.objects.values_list('id', 'revision'))
+        self.assertEqual(after[self.other.id], revisions[self.other.id] + 1)
+        self.assertEqual(after[self.model.id], revisions[self.model.id] + 2)  # created, then moved away
+
+
+class CascadeRevisionTests(ForecastingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.worst = Scenario.objects.create(model=self.model, name='Worst Case', user=self.user)
+        LineItem.objects.bulk_create([
+            LineItem(model=self.model, scenario=scenario, period=period, name=f'Item {i}', category='Expense', amount=Decimal('1.00'))
+            for scenario in (self.base, self.worst) for period in (self.jan, self.feb) for i in range(50)
+        ])
+        self.revision = FinancialModel.objects.get(pk=self.model.pk).revision
+
+    def revision_updates(self, captured):
+        return [query for query in captured if 'UPDATE' in query['sql'] and '"revision"' in query['sql']]
+
+    def test_scenario_delete_bumps_the_revision_once(self):
+        with CaptureQueriesContext(connection) as captured:
+            self.assertEqual(self.client.delete(f'/api/v1/scenario/{self.worst.id}/').status_code, 204)
+        self.assertEqual(len(self.revision_updates(captured)), 1)
+        self.assertEqual(FinancialModel.objects.get(pk=self.model.pk).revision, self.revision + 1)
+
+    def test_period_delete_bumps_the_revision_once(self):
+        with CaptureQueriesContext(connection) as captured:
+            self.feb.delete()
+        self.assertEqual(len(self.revision_updates(captured)), 1)
+        self.assertEqual(FinancialModel.objects.get(pk=self.model.pk).revision, self.revision + 1)
+        self.assertEqual(LineItem.objects.filter(model=self.model).count(), 100)
+
+
+class ScenarioCloneTests(ForecastingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.add_item('Sales', 'Revenue', '100.00')
+        self.add_item('Sales', 'Revenue', '200.00', period=self.feb)
+        self.add_item('Rent', 'Expense', '50.00')
+        self.add_item('Travel', 'Expense', '10.00')
+        Assumption.objects.create(model=self.model, scenario=self.base, name='Price', value=Decimal('5'), unit='$')
+
+    def test_clone_copies_with_adjustments(self):
+        response = self.client.post(f'/api/v1/scenario/{self.base.id}/clone/', {
+            'name': 'Best Case',
+            'adjustments': [{'category': 'Revenue', 'percent': 10}, {'category': 'Expense', 'percent': -20}, {'name': 'Rent', 'percent': 0}],
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['line_items'], 4)
+        clone = Scenario.objects.get(id=response.data['id'])
+        amounts = {(item.name, item.period_id): item.amount for item in LineItem.objects.filter(scenario=clone)}
+        self.assertEqual(amounts, {
+            ('Sales', self.jan.id): Decimal('110.00'), ('Sales', self.feb.id): Decimal('220.00'),
+            ('Rent', self.jan.id): Decimal('50.00'), ('Travel', self.jan.id): Decimal('8.00'),
+        })
+        self.assertEqual(Assumption.objects.get(scenario=clone).value, Decimal('5'))
+        self.assertEqual(PeriodRollup.objects.get(scenario=clone, period=self.jan, category='Expense').total, Decimal('58.00'))
+
+    def test_clone_rejects_adjusted_amounts_out_of_range(self):
+        big = self.add_item('Deals', 'Revenue', '1000000000000.00')
+        response = self.client.post(f'/api/v1/scenario/{self.base.id}/clone/', {
+            'name': 'Boom', 'adjustments': [{'name': 'Deals', 'percent': 5000}],
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([(row['id'], row['amount']) for row in response.data['line_items']], [(big.id, '51000000000000.00')])
+        self.assertFalse(Scenario.objects.filter(name='Boom').exists())
+
+    def test_clone_rederives_formulas(self):
+        Formula.objects.create(model=self.model, name='Revenue', category='Revenue', expression='Sales * Price')
+        response = self.client.post(f'/api/v1/scenario/{self.base.id}/clone/', {'name': 'Copy'}, format='json')
+        derived = LineItem.objects.get(scenario_id=response.data['id'], name='Revenue', period=self.feb)
+        self.assertEqual(derived.amount, Decimal('1000.00'))
+
+    def test_diff_in_one_query(self):
+        clone_id = self.client.post(f'/api/v1/scenario/{self.base.id}/clone/', {
+            'name': 'Worst', 'adjustments': [{'name': 'Sales', 'percent': -50}],
+        }, format='json').data['id']
+        with self.assertNumQueries(3):  # both scenarios + the aggregate
+            response = self.client.get(f'/api/v1/scenario/{self.base.id}/diff/', {'other': clone_id})
+        jan_revenue = response.data['results'][1]
+        self.assertEqual((jan_revenue['label'], jan_revenue['category']), ('Jan 2025', 'Revenue'))
+        self.assertEqual((jan_revenue['base'], jan_revenue['other'], jan_revenue['difference']), (Decimal('100.00'), Decimal('50.00'), Decimal('-50.00')))
+        self.assertEqual(jan_revenue['percent_change'], -50.0)
+        by_name = self.client.get(f'/api/v1/scenario/{self.base.id}/diff/', {'other': clone_id, 'by': 'name'}).data['results']
+        self.assertEqual(len(by_name), 4)
+
+    def test_cannot_clone_or_diff_other_users_scenarios(self):
+        other = User.objects.create_user(email='other@example.com', password='pass', first_name='O', last_name='P')
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.post(f'/api/v1/scenario/{self.base.id}/clone/', {'name': 'X'}, format='json').status_code, 404)
+
+
+class ModelVersionTests(ForecastingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.sales = self.add_item('Sales', 'Revenue', '100.00')
+        self.rent = self.add_item('Rent', 'Expense', '40.00')
+        for i in range(20):
+            self.add_item(f'Item {i}', 'Expense', '1.00', period=self.feb)
+        Assumption.objects.create(model=self.model, scenario=self.base, name='Growth', value=Decimal('5'), unit='%')
+
+    def snapshot(self, label=''):
+        response = self.client.post(f'/api/v1/finance-model/{self.model.id}/versions/', {'label': label}, format='json')
+        self.assertEqual(response.status_code, 201)
+        return response.data
+
+    def test_versions_share_unchanged_rows(self):
+        first = self.snapshot('v1')
+        self.assertEqual((first['number'], first['line_items'], first['changed_rows']), (1, 22, 23))
+        self.sales.amount = Decimal('150.00')
+        self.sales.save()
+        rent_id = self.rent.id
+        self.rent.delete()
+        self.add_item('Tax', 'Expense', '5.00')
+        second = self.snapshot('v2')
+        # sales closed + reopened, rent closed, tax opened
+        self.assertEqual((second['line_items'], second['changed_rows']), (22, 4))
+        self.assertEqual(VersionedLineItem.objects.filter(model=self.model).count(), 24)  # 22 + 2, not 44
+
+        v1 = self.client.get(f'/api/v1/finance-model/{self.model.id}/versions/1/').data
+        jan = v1['scenarios'][0]['periods'][0]
+        self.assertEqual((jan['totals']['Revenue'], jan['totals']['Expense']), ('100.00', '40.00'))
+        v2 = self.client.get(f'/api/v1/finance-model/{self.model.id}/versions/2/').data
+        self.assertEqual(v2['scenarios'][0]['periods'][0]['totals']['Expense'], '5.00')
+        items = self.client.get(f'/api/v1/finance-model/{self.model.id}/versions/1/line-items/', {'page_size': 100}).data
+        self.assertEqual(items['count'], 22)
+        self.assertIn(rent_id, [row['id'] for row in items['results']])
+
+    def test_unchanged_snapshot_writes_nothing(self):
+        self.snapshot()
+        self.assertEqual(self.snapshot()['changed_rows'], 0)
+
+    def test_restore(self):
+        self.snapshot()
+        self.sales.amount = Decimal('1.00')
+        self.sales.save()
+        Assumption.objects.all().delete()
+        response = self.client.post(f'/api/v1/finance-model/{self.model.id}/versions/1/restore/')
+        self.assertEqual(response.data['line_items'], 22)
+        self.assertEqual(LineItem.objects.get(name='Sales').amount, Decimal('100.00'))
+        self.assertEqual(Assumption.objects.get(model=self.model).name, 'Growth')
+        self.assertEqual(PeriodRollup.objects.get(period=self.jan, category='Revenue').total, Decimal('100.00'))
+        self.assertEqual(self.client.get(f'/api/v1/finance-model/{self.model.id}/versions/9/').status_code, 404)
+
+
+class ColumnarSnapshotTests(ForecastingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.worst = Scenario.objects.create(model=self.model, name='Worst Case', user=self.user)
+        self.add_item('Sales', 'Revenue', '1000.10')
+        self.add_item('Sales', 'Revenue', '900.00', scenario=self.worst)
+        self.add_item('Rent', 'Expense', '300.25', period=self.feb)
+        self.add_item('Sales', 'Revenue', '1200.00', period=self.feb)
+
+    def test_columns_are_typed_memory_maps(self):
+        snapshot = live_snapshot(self.model.id)
+        self.assertEqual(len(snapshot), 4)
+        self.assertIsInstance(snapshot['cents'], np.memmap)
+        self.assertEqual(
+            {column: snapshot[column].dtype for column in COLUMNS},
+            {'cents': np.int64, 'scenario': np.int32, 'period': np.int32, 'name': np.int32, 'category': np.int8},
+        )
+        self.assertEqual(snapshot.names, ['Sales', 'Rent'])
+        self.assertEqual(int(snapshot['cents'][snapshot.mask(names=['Sales'], scenario_ids=[self.base.id])].sum()), 220010)
+        self.assertEqual([period['label'] for period in snapshot.periods], ['Jan 2025', 'Feb 2025'])
+
+    def test_matrix_matches_the_line_items(self):
+        expected = ScenarioMatrix.for_model(self.model.id).summary()
+        live_snapshot(self.model.id)
+        with self.assertNumQueries(1):  # the revision check only
+            self.assertEqual(live_snapshot(self.model.id).matrix().summary(), expected)
+        only_worst = live_snapshot(self.model.id).matrix(scenario_ids=[str(self.worst.id)]).summary()
+        self.assertEqual(only_worst, ScenarioMatrix.for_model(self.model.id, scenario_ids=[self.worst.id]).summary())
+        response = self.client.get(f'/api/v1/finance-model/{self.model.id}/summary/', {'source': 'snapshot'})
+        self.assertEqual(response.data['scenarios'], expected['scenarios'])
+
+    def test_rewritten_only_when_the_revision_moves(self):
+        first = live_snapshot(self.model.id)
+        self.assertEqual(live_snapshot(self.model.id).path, first.path)
+        self.add_item('Tax', 'Expense', '10.00')
+        second = live_snapshot(self.model.id)
+        self.assertNotEqual(second.path, first.path)
+        self.assertFalse(first.path.exists())
+        self.assertEqual(len(second), 5)
+        self.model.delete()
+        self.assertFalse(second.path.parent.exists())
+
+    def test_versions_are_served_from_their_snapshot(self):
+        self.client.post(f'/api/v1/finance-model/{self.model.id}/versions/', {}, format='json')
+        before = self.client.get(f'/api/v1/finance-model/{self.model.id}/versions/1/').data
+        LineItem.objects.filter(model=self.model).delete()
+        out = io.StringIO()
+        call_command('write_snapshots', self.model.id, versions=True, stdout=out)
+        self.assertIn('2 snapshots', out.getvalue())
+        with self.assertNumQueries(2):  # model and version rows, no line items
+            after = self.client.get(f'/api/v1/finance-model/{self.model.id}/versions/1/').data
+        self.assertEqual(after['scenarios'], before['scenarios'])
+        self.assertEqual(after['scenarios'][1]['name'], 'Worst Case')
+
+
+class VarianceTests(ForecastingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.actual = Scenario.objects.create(model=self.model, name='Actual', user=self.user)
+        self.add_item('Sales', 'Revenue', '100.00')
+        self.add_item('Sales', 'Revenue', '100.00', period=self.feb)
+        self.add_item('Rent', 'Expense', '50.00')
+        self.add_item('Rent', 'Expense', '50.00', period=self.feb)
+        self.add_item('Sales', 'Revenue', '90.00', scenario=self.actual)
+        self.add_item('Sales', 'Revenue', '130.00', period=self.feb, scenario=self.actual)
+        self.add_item('Rent', 'Expense', '50.00', scenario=self.actual)
+        self.add_item('Rent', 'Expense', '45.00', period=self.feb, scenario=self.actual)
+        self.add_item('Bonus', 'Expense', '20.00', period=self.feb, scenario=self.actual)
+
+    def get_variance(self, **params):
+        return self.client.get(f'/api/v1/finance-model/{self.model.id}/variance/', {
+            'budget_id': self.base.id, 'actual_id': self.actual.id, **params,
+        })
+
+    def test_variance_and_ytd(self):
+        rows = {(row['name'], row['label']): row for row in self.get_variance().data['results']}
+        feb_sales = rows[('Sales', 'Feb 2025')]
+        self.assertEqual((feb_sales['variance'], feb_sales['variance_pct'], feb_sales['favorable']), ('30.00', 30.0, True))
+        self.assertEqual((feb_sales['ytd_budget'], feb_sales['ytd_actual'], feb_sales['ytd_variance_pct']), ('200.00', '220.00', 10.0))
+        bonus = rows[('Bonus', 'Feb 2025')]
+        self.assertEqual((bonus['budget'], bonus['variance'], bonus['variance_pct'], bonus['favorable']), ('0.00', '20.00', None, False))
+        self.assertEqual(rows[('Rent', 'Feb 2025')]['favorable'], True)
+        self.assertEqual(len(rows), 5)
+
+    def test_ytd_restarts_each_year(self):
+        jan_next = Period.objects.create(label='Jan 2026', start_date=date(2026, 1, 1), end_date=date(2026, 1, 31), period_type='monthly', user=self.user)
+        self.add_item('Sales', 'Revenue', '10.00', period=jan_next)
+        row = [row for row in self.get_variance(by='category').data['results'] if row['label'] == 'Jan 2026'][0]
+        self.assertEqual((row['category'], row['ytd_budget'], row['ytd_actual']), ('Revenue', '10.00', '0.00'))
+
+    def test_thresholds_return_exceptions_only(self):
+        rows = self.get_variance(min_variance=15).data['results']
+        self.assertEqual({(row['name'], row['label']) for row in rows}, {('Sales', 'Feb 2025'), ('Bonus', 'Feb 2025')})
+        rows = self.get_variance(min_variance=5, min_variance_pct=10).data['results']
+        self.assertEqual({(row['name'], row['label']) for row in rows}, {('Sales', 'Jan 2025'), ('Sales', 'Feb 2025'), ('Rent', 'Feb 2025'), ('Bonus', 'Feb 2025')})
+
+    def test_scenarios_must_belong_to_model(self):
+        other = FinancialModel.objects.create(user=self.user, name='Other', version='1', model_type='Budget')
+        scenario = Scenario.objects.create(model=other, name='Base', user=self.user)
+        self.assertEqual(self.get_variance(actual_id=scenario.id).status_code, 400)
+        self.assertEqual(self.get_variance(actual_id='x').status_code, 400)
+
+
+class PeriodHierarchyTests(ForecastingTestCase):
+    def generate(self, start, end, **params):
+        return self.client.post('/api/v1/period/calendar/', {'start_date': start, 'end_date': end, **params}, format='json')
+
+    def test_calendar_is_generated_and_linked(self):
+        response = self.generate('2025-01-15', '2025-12-31')
+        # jan and feb already exist
+        self.assertEqual((response.status_code, response.data['created']), (201, 10 + 4 + 1))
+        self.assertEqual(len(response.data['results']), 12 + 4 + 1)
+        year = Period.objects.get(period_type='yearly')
+        q1 = Period.objects.get(period_type='quarterly', start_date=date(2025, 1, 1))
+        self.assertEqual((q1.label, q1.end_date, q1.parent_id), ('Q1 2025', date(2025, 3, 31), year.id))
+        self.jan.refresh_from_db()
+        self.assertEqual(self.jan.parent_id, q1.id)
+        self.assertEqual(Period.objects.filter(parent=q1).count(), 3)
+        self.assertEqual(self.generate('2025-01-01', '2025-12-31').data['created'], 0)
+
+    def test_new_periods_are_linked(self):
+        self.generate('2025-01-01', '2025-03-31', grains=['quarterly'])
+        response = self.client.post('/api/v1/period/', {'label': 'Mar 2025', 'start_date': '2025-03-01', 'end_date': '2025-03-31', 'period_type': 'monthly'}, format='json')
+        self.assertEqual(Period.objects.get(id=response.data['id']).parent.label, 'Q1 2025')
+        self.jan.refresh_from_db()
+        self.assertEqual(self.jan.parent.label, 'Q1 2025')
+
+    def test_calendar_changes_are_not_served_from_the_cache(self):
+        self.add_item('Sales', 'Revenue', '300.00')
+        url = f'/api/v1/finance-model/{self.model.id}/rollup/'
+        self.assertEqual(self.client.get(url, {'grain': 'quarterly'}).data['results'], [])
+        self.client.get('/api/v1/line-item/')
+        self.assertEqual(self.generate('2025-01-01', '2025-03-31').status_code, 201)
+        quarters = self.client.get(url, {'grain': 'quarterly'}).data['results']
+        self.assertEqual([(row['period'], row['net_income']) for row in quarters], [('Q1 2025', Decimal('300.00'))])
+        q1 = Period.objects.get(period_type='quarterly')
+        self.assertEqual(self.client.get('/api/v1/line-item/').data['results'][0]['period']['parent_id'], q1.id)
+
+    def test_rollup_to_coarser_grain(self):
+        self.generate('2025-01-01', '2025-12-31')
+        apr = Period.objects.get(period_type='monthly', start_date=date(2025, 4, 1))
+        self.add_item('Sales', 'Revenue', '100.00')
+        self.add_item('Sales', 'Revenue', '50.00', period=self.feb)
+        self.add_item('Rent', 'Expense', '30.00', period=apr)
+        url = f'/api/v1/finance-model/{self.model.id}/rollup/'
+        with self.assertNumQueries(2):  # the model, then one aggregate over the parent links
+            quarters = self.client.get(url, {'grain': 'quarterly'}).data['results']
+        self.assertEqual([(row['period'], row['net_income']) for row in quarters], [('Q1 2025', Decimal('150.00')), ('Q2 2025', Decimal('-30.00'))])
+        years = self.client.get(url, {'grain': 'yearly'}).data['results']
+        self.assertEqual((years[0]['period'], years[0]['totals']), ('FY 2025', {'Expense': Decimal('30.00'), 'Revenue': Decimal('150.00')}))
+        self.assertEqual(self.client.get(url, {'grain': 'monthly', 'source': 'yearly'}).status_code, 400)
+
+
+class KPITests(ForecastingTestCase):
+    def setUp(self):
+        super().setUp()
+        for period, scale in ((self.jan, 1), (self.feb, 2)):
+            self.add_item('Sales', 'Revenue', str(1000 * scale), period=period)
+            self.add_item('COGS', 'Expense', str(400 * scale), period=period)
+            self.add_item('Rent', 'Expense', '100', period=period)
+            self.add_item('Cash', 'Asset', str(5000 * scale), period=period)
+            self.add_item('Loan', 'Liability', '2000', period=period)
+            self.add_item('Capital', 'Equity', str(2500 * scale), period=period)
+
+    def test_ratios_for_every_period_in_constant_queries(self):
+        url = f'/api/v1/finance-model/{self.model.id}/kpis/'
+        with self.assertNumQueries(5):  # model + rollups + periods + scenarios + COGS
+            response = self.client.get(url)
+        jan, feb = response.data['scenarios'][0]['periods']
+        self.assertEqual((jan['gross_margin'], jan['net_margin']), (0.6, 0.5))
+        self.assertEqual((jan['current_ratio'], jan['debt_to_equity']), (2.5, 0.8))
+        self.assertEqual((jan['return_on_equity'], jan['return_on_assets'], jan['asset_turnover']), (0.2, 0.1, 0.2))
+        self.assertEqual(feb['net_margin'], 0.55)
+        # whole horizon: flows summed, balances at the last period
+        overall = response.data['scenarios'][0]['ratios']
+        self.assertEqual((overall['net_margin'], overall['return_on_equity']), (0.5333, 0.32))
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url).data, response.data)
+
+    def test_missing_denominators_are_null(self):
+        LineItem.objects.filter(category__in=['Equity', 'Revenue']).delete()
+        jan = self.client.get(f'/api/v1/finance-model/{self.model.id}/kpis/').data['scenarios'][0]['periods'][0]
+        self.assertIsNone(jan['net_margin'])
+        self.assertIsNone(jan['debt_to_equity'])
+        self.assertEqual(jan['current_ratio'], 2.5)
@@ -1,15 +1,24 @@
 from django.urls import path , include
-from .views import FinanceModelView ,PeriodView ,ScenarioView ,LineItemView
+from .views import FinanceModelView ,PeriodView ,ScenarioView ,LineItemView ,AssumptionView ,FormulaView ,InstrumentationStatsView
 from rest_framework.routers import DefaultRouter
+from . import async_views
 
 router = DefaultRouter()
 router.register(r'finance-model', FinanceModelView)
 router.register(r'period', PeriodView)
 router.register(r'scenario', ScenarioView)
 router.register(r'line-item', LineItemView)
+router.register(r'assumption', AssumptionView)
+router.register(r'formula', FormulaView)
 
 
 
 urlpatterns = [
     path('', include(router.urls)),
+    # async read paths for concurrent dashboard reads (served on the event loop under ASGI)
+    path('async/finance-model/', async_views.finance_model_list, name='async-finance-model-list'),
+    path('async/finance-model/<int:pk>/summary/', async_views.finance_model_summary, name='async-finance-model-summary'),
+    path('async/scenario/', async_views.scenario_list, name='async-scenario-list'),
+    path('async/line-item/', async_views.line_item_list, name='async-line-item-list'),
+    path('instrumentation/stats/', InstrumentationStatsView.as_view(), name='instrumentation-stats'),
 ] 
@@ -0,0 +1,143 @@
+import hashlib
+import json
+import numpy as np
+from django.conf import settings
+from .cache import DEFAULT_TIMEOUT , get_cache
+from .engine import ScenarioMatrix
+
+PERIODS_PER_YEAR = {'monthly': 12, 'quarterly': 4, 'yearly': 1}
+IRR_LOW = -0.99
+IRR_HIGH = 10.0
+IRR_TOLERANCE = 1e-10
+IRR_MAX_ITERATIONS = 200
+
+
+def periodic_rates(annual_rates, periods_per_year):
+    return (1.0 + np.asarray(annual_rates, dtype=np.float64)) ** (1.0 / periods_per_year) - 1.0
+
+
+def npv(cash_flows, rates):
+    # cash_flows (N, P), rates (R,) per period -> (N, R); flows are discounted
+    # from the end of their period, t = 1..P
+    cash_flows = np.atleast_2d(np.asarray(cash_flows, dtype=np.float64))
+    t = np.arange(1, cash_flows.shape[1] + 1)
+    factors = (1.0 + np.asarray(rates, dtype=np.float64))[:, None] ** -t  # (R, P)
+    return cash_flows @ factors.T
+
+
+def terminal_value(last_cash_flows, rates, growth):
+    # Gordon growth value at the final period, NaN where rate <= growth; (N,) x (R,) -> (N, R)
+    rates = np.asarray(rates, dtype=np.float64)
+    spread = rates - growth
+    with np.errstate(divide='ignore', invalid='ignore'):
+        value = np.asarray(last_cash_flows, dtype=np.float64)[:, None] * (1.0 + growth) / spread[None, :]
+    return np.where(spread[None, :] > 0, value, np.nan)
+
+
+def _npv_and_slope(cash_flows, rate):
+    # value and derivative of sum(cf_t / (1+r)^t), t = 0..P-1, for one rate per row
+    t = np.arange(cash_flows.shape[1])
+    base = (1.0 + rate)[:, None]
+    with np.errstate(over='ignore', invalid='ignore', divide='ignore'):
+        factors = base ** -t
+        value = (cash_flows * factors).sum(axis=1)
+        slope = (-t * cash_flows * factors / base).sum(axis=1)
+    return value, slope
+
+
+def irr(cash_flows):
+    # vectorized safeguarded Newton: every series keeps a sign-change bracket and falls
+    # back to bisection whenever a Newton step would leave it. NaN where no root exists.
+    cash_flows = np.atleast_2d(np.asarray(cash_flows, dtype=np.float64))
+    n = cash_flows.shape[0]
+    low = np.full(n, IRR_LOW)
+    high = np.full(n, IRR_HIGH)
+    f_low, _ = _npv_and_slope(cash_flows, low)
+    f_high, _ = _npv_and_slope(cash_flows, high)
+    bracketed = np.isfinite(f_low) & np.isfinite(f_high) & (np.sign(f_low) != np.sign(f_high))
+
+    rate = np.full(n, 0.1)
+    done = ~bracketed
+    for _ in range(IRR_MAX_ITERATIONS):
+        if done.all():
+            break
+        value, slope = _npv_and_slope(cash_flows, rate)
+        converged = np.abs(value) <= IRR_TOLERANCE * np.maximum(1.0, np.abs(cash_flows).max(axis=1))
+        done |= converged
+        # shrink the bracket around the root
+        same_as_low = np.sign(value) == np.sign(f_low)
+        low = np.where(same_as_low & ~done, rate, low)
+        f_low = np.where(same_as_low & ~done, value, f_low)
+        high = np.where(~same_as_low & ~done, rate, high)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            newton = rate - value / slope
+        inside = np.isfinite(newton) & (newton > low) & (newton < high)
+        step = np.where(inside, newton, (low + high) / 2.0)
+        rate = np.where(done, rate, step)
+        done |= (high - low) <= IRR_TOLERANCE
+    return np.where(bracketed, rate, np.nan)
+
+
+def periods_per_year_for(periods):
+    types = [period['period_type'] for period in periods]
+    if not types:
+        return 12
+    return PERIODS_PER_YEAR.get(max(set(types), key=types.count), 12)
+
+
+def nan_to_none(value, digits=2):
+    return None if not np.isfinite(value) else round(float(value), digits)
+
+
+def evaluate(matrix, discount_rates, terminal_growth=None, periods_per_year=None):
+    # every scenario against every discount rate in one batched pass
+    periods_per_year = periods_per_year or periods_per_year_for(matrix.periods)
+    cash_flows = matrix.net_income().astype(np.float64) / 100.0  # (S, P) in currency units
+    rates = periodic_rates(discount_rates, periods_per_year)
+    present_values = npv(cash_flows, rates) if cash_flows.size else np.zeros((len(matrix.scenarios), len(rates)))
+    periodic_irr = irr(cash_flows) if cash_flows.size else np.full(len(matrix.scenarios), np.nan)
+
+    if terminal_growth is not None and cash_flows.size:
+        growth = periodic_rates([terminal_growth], periods_per_year)[0]
+        terminal = terminal_value(cash_flows[:, -1], rates, growth)
+        terminal_pv = terminal * (1.0 + rates)[None, :] ** -cash_flows.shape[1]
+    else:
+        terminal = terminal_pv = np.full(present_values.shape, np.nan)
+
+    results = []
+    for s, scenario in enumerate(matrix.scenarios):
+        annual_irr = (1.0 + periodic_irr[s]) ** periods_per_year - 1.0
+        results.append({
+            **scenario,
+            'cash_flows': [round(float(value), 2) for value in cash_flows[s]],
+            'irr': nan_to_none(periodic_irr[s], 6),
+            'irr_annual': nan_to_none(annual_irr, 6),
+            'valuations': [
+                {
+                    'discount_rate': float(rate),
+                    'npv': nan_to_none(present_values[s, r]),
+                    'terminal_value': nan_to_none(terminal[s, r]),
+                    'pv_terminal_value': nan_to_none(terminal_pv[s, r]),
+                    'enterprise_value': nan_to_none(present_values[s, r] + (terminal_pv[s, r] if np.isfinite(terminal_pv[s, r]) else 0.0)),
+                }
+                for r, rate in enumerate(discount_rates)
+            ],
+        })
+    return {
+        'periods_per_year': periods_per_year,
+        'periods': [{'id': period['id'], 'label': period['label']} for period in matrix.periods],
+        'scenarios': results,
+    }
+
+
+def value_model(model, discount_rates, scenario_ids=None, terminal_growth=None, periods_per_year=None):
+    # memoized per model revision: any write to the model changes the key
+    params = json.dumps([sorted(scenario_ids or []), list(discount_rates), terminal_growth, periods_per_year])
+    key = f'valuation:{model.id}:{model.revision}:{hashlib.sha1(params.encode()).hexdigest()}'
+    backend = get_cache()
+    result = backend.get(key)
+    if result is None:
+        matrix = ScenarioMatrix.from_rollups(model.id, scenario_ids=scenario_ids)
+        result = evaluate(matrix, discount_rates, terminal_growth, periods_per_year)
+        backend.set(key, result, getattr(settings, 'FORECASTING_CACHE_TIMEOUT', DEFAULT_TIMEOUT))
+    return result
@@ -0,0 +1,116 @@
+from decimal import Decimal
+import numpy as np
+from django.db.models import Q , Sum
+from .engine import from_cents , to_cents
+from .models import LineItem , Period , PeriodRollup
+
+ZERO = Decimal('0')
+# variance in these categories is good when actuals come in above / below budget
+FAVORABLE_SIGN = {'Revenue': 1, 'Expense': -1}
+
+
+def percent(numerator, denominator):
+    # element-wise percentage of |denominator|, NaN where the denominator is zero
+    numerator = np.asarray(numerator, dtype=np.float64)
+    denominator = np.abs(np.asarray(denominator, dtype=np.float64))
+    return np.divide(numerator * 100.0, denominator, out=np.full(numerator.shape, np.nan), where=denominator != 0)
+
+
+def year_to_date(values, years):
+    # cumulative sums along the period axis that restart with every calendar year
+    totals = np.cumsum(values, axis=1)
+    starts = np.searchsorted(years, years)  # index of each period's first period in its year
+    base = np.where(starts > 0, totals[:, np.maximum(starts - 1, 0)], 0)
+    return totals - base
+
+
+def load_cells(model_id, budget_id, actual_id, by):
+    # one aggregate query: both scenarios side by side per (name,) category and period
+    if by == 'category':
+        rows = PeriodRollup.objects.filter(model_id=model_id, scenario_id__in=[budget_id, actual_id])
+        group, amount = ('category', 'period_id'), 'total'
+    else:
+        rows = LineItem.objects.filter(model_id=model_id, scenario_id__in=[budget_id, actual_id])
+        group, amount = ('name', 'category', 'period_id'), 'amount'
+    return list(
+        rows.values(*group)
+        .annotate(budget=Sum(amount, filter=Q(scenario_id=budget_id)), actual=Sum(amount, filter=Q(scenario_id=actual_id)))
+        .order_by()
+        .values_list(*group, 'budget', 'actual')
+    )
+
+
+def variance(model_id, budget_id, actual_id, by='name', period_type=None, min_variance=None, min_variance_pct=None):
+    rows = load_cells(model_id, budget_id, actual_id, by)
+    periods = Period.objects.filter(id__in={row[-3] for row in rows})
+    if period_type:
+        periods = periods.filter(period_type=period_type)
+    periods = list(periods.order_by('start_date', 'id').values('id', 'label', 'start_date', 'period_type'))
+    if period_type is None and periods:
+        # YTD over mixed grains would double count; keep the dominant one
+        types = [period['period_type'] for period in periods]
+        period_type = max(set(types), key=types.count)
+        periods = [period for period in periods if period['period_type'] == period_type]
+    position = {period['id']: index for index, period in enumerate(periods)}
+    rows = [row for row in rows if row[-3] in position]
+    result = {'by': by, 'period_type': period_type, 'periods': [{'id': p['id'], 'label': p['label']} for p in periods]}
+    if not rows:
+        return {**result, 'results': []}
+
+    # (keys, periods) matrices of cents for both scenarios
+    keys = sorted({row[:-3] for row in rows})
+    key_index = {key: index for index, key in enumerate(keys)}
+    key_codes = np.fromiter((key_index[row[:-3]] for row in rows), dtype=np.intp, count=len(rows))
+    period_codes = np.fromiter((position[row[-3]] for row in rows), dtype=np.intp, count=len(rows))
+    shape = (len(keys), len(periods))
+    budget = np.zeros(shape, dtype=np.int64)
+    actual = np.zeros(shape, dtype=np.int64)
+    present = np.zeros(shape, dtype=bool)
+    budget[key_codes, period_codes] = to_cents([row[-2] or ZERO for row in rows])
+    actual[key_codes, period_codes] = to_cents([row[-1] or ZERO for row in rows])
+    present[key_codes, period_codes] = True
+
+    years = np.array([period['start_date'].year for period in periods])
+    ytd_budget = year_to_date(budget, years)
+    ytd_actual = year_to_date(actual, years)
+    difference = actual - budget
+    ytd_difference = ytd_actual - ytd_budget
+    difference_pct = percent(difference, budget)
+    ytd_difference_pct = percent(ytd_difference, ytd_budget)
+    categories = [key[-1] for key in keys]
+    signs = np.array([FAVORABLE_SIGN.get(category, 0) for category in categories])[:, None]
+
+    # exceptions: cells beyond every threshold given
+    mask = present.copy()
+    if min_variance is not None:
+        mask &= np.abs(difference) >= round(min_variance * 100)
+    if min_variance_pct is not None:
+        mask &= np.nan_to_num(np.abs(difference_pct), nan=np.inf) >= min_variance_pct
+    key_rows, period_columns = np.nonzero(mask)
+
+    def money(matrix):
+        # exact decimal strings, like summary and rollup
+        return [from_cents(cents) for cents in matrix[key_rows, period_columns].tolist()]
+
+    def pct(matrix):
+        values = np.round(matrix[key_rows, period_columns], 4)
+        return [None if np.isnan(value) else value for value in values.tolist()]
+
+    columns = {
+        'budget': money(budget), 'actual': money(actual), 'variance': money(difference), 'variance_pct': pct(difference_pct),
+        'ytd_budget': money(ytd_budget), 'ytd_actual': money(ytd_actual), 'ytd_variance': money(ytd_difference),
+        'ytd_variance_pct': pct(ytd_difference_pct),
+    }
+    favorable = (difference * signs)[key_rows, period_columns].tolist()
+    results = []
+    for index, (k, p) in enumerate(zip(key_rows.tolist(), period_columns.tolist())):
+        key = keys[k]
+        results.append({
+            **({'name': key[0]} if by == 'name' else {}),
+            'category': key[-1],
+            'period_id': periods[p]['id'],
+            'label': periods[p]['label'],
+            **{column: values[index] for column, values in columns.items()},
+            'favorable': None if key[-1] not in FAVORABLE_SIGN else favorable[index] >= 0,
+        })
+    return {**result, 'results': results}
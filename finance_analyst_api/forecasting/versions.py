@@ -0,0 +1,108 @@
+from django.db import connection , transaction
+from django.db.models import Max , Q
+from .ingest import write_rows
+from .models import (
+    Assumption , FinancialModel , LineItem , ModelVersion , Scenario , VersionedAssumption , VersionedLineItem ,
+)
+from . import formulas , rollups
+
+BATCH_SIZE = 2000
+# compared to decide whether a live row changed since the last snapshot
+LINE_ITEM_FIELDS = ('scenario_id', 'period_id', 'name', 'category', 'amount', 'derived')
+ASSUMPTION_FIELDS = ('scenario_id', 'name', 'value', 'unit', 'distribution', 'stdev', 'min_value', 'max_value', 'applies_to')
+
+
+def effective(queryset, number):
+    # rows of snapshot `number`: one range predicate, no walking of the version chain
+    return queryset.filter(Q(valid_to__isnull=True) | Q(valid_to__gt=number), valid_from__lte=number)
+
+
+def version_line_items(model_id, number):
+    return effective(VersionedLineItem.objects.filter(model_id=model_id), number)
+
+
+def version_assumptions(model_id, number):
+    return effective(VersionedAssumption.objects.filter(model_id=model_id), number)
+
+
+def live_line_items(model_id):
+    for row in LineItem.objects.filter(model_id=model_id).values_list('id', *LINE_ITEM_FIELDS[:-1], 'formula_id').iterator(chunk_size=BATCH_SIZE):
+        yield row[0], (*row[1:-1], row[-1] is not None)
+
+
+def live_assumptions(model_id):
+    for row in Assumption.objects.filter(model_id=model_id).values_list('id', *ASSUMPTION_FIELDS).iterator(chunk_size=BATCH_SIZE):
+        yield row[0], row[1:]
+
+
+def store_delta(versioned_model, fields, model_id, number, live_rows):
+    # close the ranges of rows that changed or vanished, open ranges for new values;
+    # returns (effective row count, rows written)
+    current = {
+        row[1]: (row[0], row[2:])
+        for row in versioned_model.objects.filter(model_id=model_id, valid_to__isnull=True)
+        .values_list('id', 'source_id', *fields).iterator(chunk_size=BATCH_SIZE)
+    }
+    closed, opened, total = [], [], 0
+    for source_id, values in live_rows:
+        total += 1
+        stored = current.pop(source_id, None)
+        if stored is not None and stored[1] == values:
+            continue
+        if stored is not None:
+            closed.append(stored[0])
+        opened.append(versioned_model(model_id=model_id, source_id=source_id, valid_from=number, **dict(zip(fields, values))))
+    closed += [pk for pk, _values in current.values()]
+    for start in range(0, len(closed), BATCH_SIZE):
+        versioned_model.objects.filter(id__in=closed[start:start + BATCH_SIZE]).update(valid_to=number)
+    versioned_model.objects.bulk_create(opened, batch_size=BATCH_SIZE)
+    return total, len(closed) + len(opened)
+
+
+def create_version(model, user, label='', note=''):
+    with transaction.atomic():
+        # serializes concurrent snapshots of the same model
+        FinancialModel.objects.select_for_update().get(pk=model.pk)
+        number = (ModelVersion.objects.filter(model=model).aggregate(last=Max('number'))['last'] or 0) + 1
+        line_items, changed_items = store_delta(VersionedLineItem, LINE_ITEM_FIELDS, model.pk, number, live_line_items(model.pk))
+        assumptions, changed_assumptions = store_delta(VersionedAssumption, ASSUMPTION_FIELDS, model.pk, number, live_assumptions(model.pk))
+        return ModelVersion.objects.create(
+            model=model, number=number, label=label or model.version, note=note, created_by=user,
+            scenarios={str(pk): name for pk, name in Scenario.objects.filter(model=model).values_list('id', 'name')},
+            line_items=line_items, assumptions=assumptions, changed_rows=changed_items + changed_assumptions,
+        )
+
+
+def delete_rows(queryset):
+    # one DELETE statement; restore rebuilds rollups and formulas itself so the per-row
+    # signals a queryset delete() would send are not wanted
+    sql, params = queryset.values('id').query.sql_with_params()
+    table = connection.ops.quote_name(queryset.model._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table} WHERE id IN ({sql})', params)
+
+
+def restore_version(version):
+    # Replace the model's live line items and assumptions with the snapshot's. Rows of
+    # scenarios deleted since the snapshot are skipped; formula items are re-derived.
+    model_id = version.model_id
+    scenarios = set(Scenario.objects.filter(model_id=model_id).values_list('id', flat=True))
+    with transaction.atomic():
+        delete_rows(LineItem.objects.filter(model_id=model_id))
+        delete_rows(Assumption.objects.filter(model_id=model_id))
+        Assumption.objects.bulk_create([
+            Assumption(model_id=model_id, **dict(zip(ASSUMPTION_FIELDS, values)))
+            for values in version_assumptions(model_id, version.number).order_by('id').values_list(*ASSUMPTION_FIELDS)
+            if values[0] in scenarios
+        ], batch_size=BATCH_SIZE)
+        items = [
+            (model_id, *values)
+            for values in version_line_items(model_id, version.number).filter(derived=False)
+            .order_by('id').values_list('scenario_id', 'period_id', 'name', 'category', 'amount')
+            if values[0] in scenarios
+        ]
+        write_rows(items)
+        rollups.rebuild([model_id])
+        FinancialModel.bump_revision(model_id)
+        formulas.recompute(model_id)
+    return len(items)
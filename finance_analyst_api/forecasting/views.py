@@ -1,15 +1,67 @@
+import io
+import json
 from django.shortcuts import render
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.utils.dateparse import parse_date
 from rest_framework import status , permissions , generics ,viewsets ,mixins
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from .serializers import FinanceModelSerializer , PeriodModelSerializer ,ScenarioModelSerializer , LineItemModelSerializer
-from .models import FinancialModel , Period , Scenario , LineItem
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound , ValidationError
+from rest_framework.parsers import JSONParser , MultiPartParser , FormParser
+from .serializers import FinanceModelSerializer , PeriodModelSerializer ,ScenarioModelSerializer , LineItemModelSerializer , LineItemFlatSerializer , AssumptionModelSerializer , SimulationSerializer , ValuationSerializer , SensitivitySerializer , ForecastSerializer , ScenarioCloneSerializer , VarianceSerializer , PeriodCalendarSerializer , ImportJobSerializer , FormulaModelSerializer , ModelVersionSerializer , VersionedLineItemSerializer
+from .models import FinancialModel , Period , Scenario , LineItem , Assumption , ImportJob , Formula , ModelVersion
+from .engine import ScenarioMatrix
+from .columnar import live_snapshot , version_snapshot
+from .export import EXPORT_FORMATS , export_queryset , stream_rows
+from .pagination import ForecastingPagination
+from .cache import RevisionCachedListMixin , cached_response
+from .rollups import period_rollups
+from .simulation import simulate
+from .valuation import value_model
+from .sensitivity import UnknownAssumptions , sensitivity
+from .formulas import FormulaError , recompute
+from .forecast import forecast
+from .scenarios import AmountOutOfRange , clone_scenario , diff_scenarios
+from .variance import variance
+from .kpi import compute_kpis
+from .periods import GRAINS , generate_calendar , link_periods
+from .versions import create_version , restore_version , version_line_items
+from .importer import UnsupportedFile , start_import
+from .instrumentation import CanReadInstrumentation , enabled as instrumentation_enabled , endpoint_stats , reset_stats , window_size
+from .ingest import CSVParser , read_csv , ingest_line_items , DEFAULT_CHUNK_SIZE , MAX_CHUNK_SIZE , RELATED_FIELDS
+
+def id_params(request, name):
+    # repeated ?<name>= ids as ints; anything else is a 400 rather than a failing query
+    # (also takes the plain HttpRequest of the async views)
+    values = getattr(request, 'query_params', request.GET).getlist(name)
+    try:
+        return [int(value) for value in values]
+    except ValueError:
+        raise ValidationError({name: ["A valid integer is required."]})
+
+
+def date_param(request, name):
+    # optional ?<name>=YYYY-MM-DD as a date; malformed or impossible dates are a 400
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    try:
+        parsed = parse_date(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValidationError({name: ["Date has wrong format. Use YYYY-MM-DD."]})
+    return parsed
+
 
 # finance  view
-class FinanceModelView(viewsets.ModelViewSet):
+class FinanceModelView(RevisionCachedListMixin, viewsets.ModelViewSet):
     queryset = FinancialModel.objects.all()
     serializer_class = FinanceModelSerializer
     permission_classes = [permissions.IsAuthenticated]
+    cache_scope = 'finance-model'
 
     def perform_create(self, serializer):
         # Automatically assign the logged-in user
@@ -17,27 +69,222 @@ class FinanceModelView(viewsets.ModelViewSet):
 
     def get_queryset(self):
         # Return only models belonging to the logged-in user
-        return FinancialModel.objects.filter(user=self.request.user)
-    
-    def get_object(self):
-        # Override to ensure users can only access their own FinancialModel instances
-        obj = super().get_object()
-        if obj.user != self.request.user:
-            raise permissions.PermissionDenied("You do not have permission to access this resource.")
-        return obj
+        # (ordered, so cached pages stay stable)
+        return FinancialModel.objects.owned_by(self.request.user).order_by('id')
+
+    def cached_models(self):
+        return FinancialModel.objects.owned_by(self.request.user)
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        return cached_response(request, 'finance-model-detail', instance.revision, lambda: Response(self.get_serializer(instance).data))
     
     def perform_update(self, serializer):
-        # Here, you can add custom logic before updating the model
-        # For example, we could ensure that only the owner can update
-        if serializer.instance.user != self.request.user:
-            raise permissions.PermissionDenied("You cannot update someone else's financial model.")
+        # get_queryset only holds the user's own models, other users' ids are 404s
         serializer.save()  # Save the update
+        serializer.instance.refresh_from_db(fields=['revision'])  # bumped by the save
 
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()  # checks ownership
         self.perform_destroy(instance)
         return Response({"detail": "Deleted successfully."}, status=status.HTTP_200_OK)
 
+    @action(detail=True, methods=['get'])
+    def summary(self, request, pk=None):
+        # totals, margins and subtotals per scenario and period, computed in one pass
+        # over the period rollups (?source=line_items recomputes from the raw rows,
+        # ?source=snapshot from the columnar snapshot of the current revision)
+        instance = self.get_object()
+        scenario_ids = id_params(request, 'scenario_id')
+
+        def build():
+            source = request.query_params.get('source')
+            if source == 'line_items':
+                matrix = ScenarioMatrix.for_model(instance.id, scenario_ids=scenario_ids)
+            elif source == 'snapshot':
+                matrix = live_snapshot(instance.id).matrix(scenario_ids=scenario_ids)
+            else:
+                matrix = ScenarioMatrix.from_rollups(instance.id, scenario_ids=scenario_ids)
+            return Response({"model_id": instance.id, **matrix.summary()})
+        return cached_response(request, 'summary', instance.revision, build)
+
+    @action(detail=True, methods=['get'])
+    def rollup(self, request, pk=None):
+        # revenue / expense / net by period, read from PeriodRollup only
+        # ?grain=quarterly|yearly sums finer periods (?source=monthly by default) into coarser ones
+        instance = self.get_object()
+        scenario_ids = id_params(request, 'scenario_id')
+        grain = request.query_params.get('grain')
+        source = request.query_params.get('source', 'monthly')
+        if grain is not None and not (grain in GRAINS and source in GRAINS and GRAINS.index(source) <= GRAINS.index(grain)):
+            return Response({"grain": [f"Cannot roll {source} periods up to '{grain}'."]}, status=status.HTTP_400_BAD_REQUEST)
+        return cached_response(request, 'rollup', instance.revision, lambda: Response({
+            "model_id": instance.id, "grain": grain,
+            "results": period_rollups(instance.id, scenario_ids, grain=grain, source=source),
+        }))
+
+    @action(detail=True, methods=['post'])
+    def simulate(self, request, pk=None):
+        # Monte Carlo over the scenario's line items, Assumption rows as distributions;
+        # ?output=ndjson streams one line of percentile bands per period
+        instance = self.get_object()
+        serializer = SimulationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        if not instance.scenarios.filter(id=params['scenario_id']).exists():
+            return Response({"scenario_id": ["Scenario does not belong to this model."]}, status=status.HTTP_400_BAD_REQUEST)
+        result = simulate(instance.id, params['scenario_id'], trials=params['trials'], seed=params['seed'], percentiles=params['percentiles'])
+        if request.query_params.get('output') == 'ndjson':
+            lines = (json.dumps(period) + '\n' for period in result['periods'])
+            return StreamingHttpResponse(lines, content_type='application/x-ndjson')
+        return Response({"model_id": instance.id, "scenario_id": params['scenario_id'], **result})
+
+    @action(detail=True, methods=['post'])
+    def valuation(self, request, pk=None):
+        # NPV / IRR / terminal value for every requested scenario x discount rate
+        instance = self.get_object()
+        serializer = ValuationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        result = value_model(instance, **serializer.validated_data)
+        return Response({"model_id": instance.id, "revision": instance.revision, **result})
+
+    @action(detail=True, methods=['post'])
+    def sensitivity(self, request, pk=None):
+        # net income and NPV over a grid of assumption values, or one at a time (tornado)
+        instance = self.get_object()
+        serializer = SensitivitySerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        if not instance.scenarios.filter(id=params['scenario_id']).exists():
+            return Response({"scenario_id": ["Scenario does not belong to this model."]}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            result = sensitivity(
+                instance.id, params['scenario_id'],
+                {item['name']: item['values'] for item in params['ranges']},
+                mode=params['mode'], discount_rate=params['discount_rate'], periods_per_year=params['periods_per_year'],
+            )
+        except UnknownAssumptions as error:
+            return Response({"ranges": [str(error)]}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"model_id": instance.id, "scenario_id": params['scenario_id'], "mode": params['mode'], **result})
+
+    @action(detail=True, methods=['post'])
+    def forecast(self, request, pk=None):
+        # project every line item series of a scenario N periods ahead and write the
+        # generated periods and items in bulk (dry_run only returns the projection)
+        instance = self.get_object()
+        serializer = ForecastSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        if not instance.scenarios.filter(id=params['scenario_id']).exists():
+            return Response({"scenario_id": ["Scenario does not belong to this model."]}, status=status.HTTP_400_BAD_REQUEST)
+        result = forecast(
+            instance.id, params['scenario_id'], request.user, params['periods'], method=params['method'],
+            season_length=params['season_length'], alpha=params['alpha'], beta=params['beta'],
+            history=params['history'], dry_run=params['dry_run'],
+        )
+        created = not params['dry_run'] and result['created']
+        return Response(
+            {"model_id": instance.id, "scenario_id": params['scenario_id'], **result},
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+        )
+
+    @action(detail=True, methods=['get'])
+    def kpis(self, request, pk=None):
+        # liquidity, profitability and leverage ratios for every scenario and period from the
+        # rollups plus one COGS aggregate, cached per model revision
+        instance = self.get_object()
+        scenario_ids = id_params(request, 'scenario_id')
+        return cached_response(request, 'kpis', instance.revision, lambda: Response(
+            {"model_id": instance.id, **compute_kpis(instance.id, scenario_ids=scenario_ids)}
+        ))
+
+    @action(detail=True, methods=['get'])
+    def variance(self, request, pk=None):
+        # budget vs actual per (name, category, period) with YTD figures, aggregated in the
+        # database and aligned in one vectorized pass; min_variance(_pct) keeps only exceptions
+        instance = self.get_object()
+        serializer = VarianceSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        scenario_ids = {params['budget_id'], params['actual_id']}
+        if instance.scenarios.filter(id__in=scenario_ids).count() != len(scenario_ids):
+            return Response({"detail": "budget_id and actual_id must be two scenarios of this model."}, status=status.HTTP_400_BAD_REQUEST)
+        return cached_response(request, 'variance', instance.revision, lambda: Response({
+            "model_id": instance.id, "budget_id": params['budget_id'], "actual_id": params['actual_id'],
+            **variance(instance.id, **params),
+        }))
+
+    @action(detail=True, methods=['post'])
+    def recompute(self, request, pk=None):
+        # full re-derivation of every formula line item (normally kept current incrementally)
+        instance = self.get_object()
+        changed = recompute(instance.id)
+        return Response({"model_id": instance.id, "changed": changed})
+
+    @action(detail=True, methods=['get', 'post'])
+    def versions(self, request, pk=None):
+        # GET lists the snapshots, POST takes one (only rows changed since the last are written)
+        instance = self.get_object()
+        if request.method == 'POST':
+            serializer = ModelVersionSerializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            version = create_version(instance, request.user, **serializer.validated_data)
+            return Response(ModelVersionSerializer(version).data, status=status.HTTP_201_CREATED)
+        versions = ModelVersion.objects.filter(model=instance).order_by('number')
+        return Response({"model_id": instance.id, "results": ModelVersionSerializer(versions, many=True).data})
+
+    def get_version(self, number):
+        instance = self.get_object()
+        version = ModelVersion.objects.filter(model=instance, number=number).first()
+        if version is None:
+            raise NotFound("Version not found.")
+        return version
+
+    @action(detail=True, methods=['get'], url_path=r'versions/(?P<number>\d+)')
+    def version(self, request, pk=None, number=None):
+        # snapshot metadata plus the same summary the live model serves, read from the
+        # version's columnar snapshot (written on first request, versions never change)
+        version = self.get_version(number)
+        matrix = version_snapshot(version).matrix()
+        return Response({**ModelVersionSerializer(version).data, "model_id": version.model_id, **matrix.summary()})
+
+    @action(detail=True, methods=['get'], url_path=r'versions/(?P<number>\d+)/line-items')
+    def version_items(self, request, pk=None, number=None):
+        version = self.get_version(number)
+        queryset = version_line_items(version.model_id, version.number)
+        scenario_ids = id_params(request, 'scenario_id')
+        if scenario_ids:
+            queryset = queryset.filter(scenario_id__in=scenario_ids)
+        paginator = ForecastingPagination()
+        page = paginator.paginate_queryset(queryset.order_by('id'), request, view=self)
+        return paginator.get_paginated_response(VersionedLineItemSerializer(page, many=True).data)
+
+    @action(detail=True, methods=['post'], url_path=r'versions/(?P<number>\d+)/restore')
+    def restore(self, request, pk=None, number=None):
+        # make the snapshot the live data again (take a snapshot first to keep the current state)
+        version = self.get_version(number)
+        restored = restore_version(version)
+        return Response({"model_id": version.model_id, "number": version.number, "line_items": restored})
+
+    @action(detail=True, methods=['get'])
+    def export(self, request, pk=None):
+        # streams every line item of the model; ?output=csv|ndjson
+        # ('format' is taken by DRF's format suffix handling)
+        instance = self.get_object()
+        export_format = request.query_params.get('output', 'csv').lower()
+        if export_format not in EXPORT_FORMATS:
+            return Response({"detail": f"Unsupported output '{export_format}'. Use csv or ndjson."}, status=status.HTTP_400_BAD_REQUEST)
+        queryset = export_queryset(
+            instance.id,
+            scenario_ids=id_params(request, 'scenario_id'),
+            categories=request.query_params.getlist('category'),
+            period_start=date_param(request, 'period_start'),
+            period_end=date_param(request, 'period_end'),
+        )
+        response = StreamingHttpResponse(stream_rows(queryset, export_format), content_type=EXPORT_FORMATS[export_format])
+        response['Content-Disposition'] = f'attachment; filename="model-{instance.id}.{export_format}"'
+        return response
+
 # Period view
 class PeriodView(mixins.ListModelMixin,
                  mixins.RetrieveModelMixin,
@@ -46,9 +293,11 @@ class PeriodView(mixins.ListModelMixin,
     queryset = Period.objects.all()
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = PeriodModelSerializer
+    pagination_class = ForecastingPagination
     
     def get_queryset(self):
-        queryset = Period.objects.all()
+        # the user's periods and the shared calendar, see PeriodQuerySet
+        queryset = Period.objects.owned_by(self.request.user)
         start_date = self.request.query_params.get('start_date', None)
         end_date = self.request.query_params.get('end_date', None)
         period_type = self.request.query_params.get('period_type', None)
@@ -58,53 +307,223 @@ class PeriodView(mixins.ListModelMixin,
             queryset = queryset.filter(start_date=start_date)
         if end_date is not None:
             queryset = queryset.filter(end_date=end_date)             
-        return queryset
+        return queryset.order_by('id')
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
+        link_periods(self.request.user)
+
+    @action(detail=False, methods=['post'])
+    def calendar(self, request):
+        # monthly / quarterly / yearly periods for a date range, created in bulk and linked
+        serializer = PeriodCalendarSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        created, periods = generate_calendar(
+            request.user, params['start_date'], params['end_date'], [grain for grain in GRAINS if grain in params['grains']],
+        )
+        return Response(
+            {"created": created, "results": PeriodModelSerializer(periods, many=True).data},
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+        )
     
 # Scenario view
-class ScenarioView(viewsets.ModelViewSet):
+class ScenarioView(RevisionCachedListMixin, viewsets.ModelViewSet):
     queryset = Scenario.objects.all()
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = ScenarioModelSerializer
+    pagination_class = ForecastingPagination
+    cache_scope = 'scenario'
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
     def get_queryset(self):
-        queryset = Scenario.objects.all()
+        # the nested model is serialized for every row, fetch it in the same query
+        queryset = Scenario.objects.owned_by(self.request.user).select_related('model')
         model_id = self.request.query_params.get('model_id', None)
         if model_id is not None:
             queryset = queryset.filter(model_id=model_id)         
-        return queryset
+        return queryset.order_by('id')
     
-    def get_object(self):
-        obj = super().get_object()
-        if obj.user != self.request.user:
-            return Response("You are not authorised",status=status.HTTP_403_FORBIDDEN)
-        return obj
-    
-    def perform_update(self, serializer):
-        if serializer.instance.user != self.request.user:
-            return Response("You are not authorised",status=status.HTTP_403_FORBIDDEN)
-        serializer.save()  # Save the update
+    def owned_scenario(self, pk):
+        # other users' scenarios are outside the queryset, so they are 404s like missing ones
+        scenario = Scenario.objects.owned_by(self.request.user).select_related('model').filter(pk=pk).first()
+        if scenario is None:
+            raise NotFound("Scenario not found.")
+        return scenario
 
-    def perform_destroy(self, instance):
-        if instance.user != self.request.user:
-              return Response("You are not authorised",status=status.HTTP_403_FORBIDDEN)
-        instance.delete()  # Delete the instance
-        return Response("deleted successfully",status=status.HTTP_200_OK)
+    @action(detail=True, methods=['post'])
+    def clone(self, request, pk=None):
+        # copy assumptions and line items server-side, optionally scaled by percentage adjustments
+        source = self.owned_scenario(pk)
+        serializer = ScenarioCloneSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            clone, copied = clone_scenario(source, request.user, **serializer.validated_data)
+        except AmountOutOfRange as error:
+            return Response({"adjustments": [str(error)], "line_items": error.rows}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(
+            {**ScenarioModelSerializer(clone).data, "source_id": source.id, "line_items": copied},
+            status=status.HTTP_201_CREATED,
+        )
+
+    @action(detail=True, methods=['get'])
+    def diff(self, request, pk=None):
+        # ?other=<scenario id>[&by=name]; totals of both scenarios per period and category
+        base = self.owned_scenario(pk)
+        other_id = request.query_params.get('other')
+        if not str(other_id).isdigit():
+            return Response({"other": ["A scenario id is required."]}, status=status.HTTP_400_BAD_REQUEST)
+        other = self.owned_scenario(other_id)
+        by = request.query_params.get('by', 'category')
+        if by not in ('category', 'name'):
+            return Response({"by": ["Use category or name."]}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"base_id": base.id, "other_id": other.id, "by": by, "results": diff_scenarios(base, other, by)})
 
 # Line Item view
-class LineItemView(viewsets.ModelViewSet):
+class LineItemView(RevisionCachedListMixin, viewsets.ModelViewSet):
     queryset = LineItem.objects.all()
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = LineItemModelSerializer
+    pagination_class = ForecastingPagination
+    cache_scope = 'line-item'
+
+    def is_flat(self):
+        # ?flat=true returns related objects as ids instead of nested objects
+        return self.request.query_params.get('flat', '').lower() in ('1', 'true', 'yes')
+
+    def get_serializer_class(self):
+        if self.request.method == 'GET' and self.is_flat():
+            return LineItemFlatSerializer
+        return LineItemModelSerializer
+
     def get_queryset(self):
-        queryset = LineItem.objects.all()
+        queryset = LineItem.objects.owned_by(self.request.user)
+        if not (self.request.method == 'GET' and self.is_flat()):
+            # nested serializers read model, scenario.model and period for every row
+            queryset = queryset.select_related('model', 'scenario__model', 'period')
         model_id = self.request.query_params.get('model_id', None)
         if model_id is not None:
             queryset = queryset.filter(model_id=model_id)         
-        return queryset
+        return queryset.order_by('id')
+
+    @action(detail=False, methods=['post'], parser_classes=[JSONParser, CSVParser, MultiPartParser, FormParser])
+    def bulk(self, request):
+        # JSON array, text/csv body or multipart 'file' CSV; model_id / scenario_id / period_id
+        # given as query params (or form fields) apply to every row that doesn't set them
+        upload = request.FILES.get('file')
+        if upload is not None:
+            rows = read_csv(io.TextIOWrapper(upload, encoding='utf-8'))
+        elif isinstance(request.data, list):
+            rows = request.data
+        elif isinstance(request.data.get('rows'), list):
+            rows = request.data['rows']
+        else:
+            return Response({"detail": "Expected a list of line items or a CSV file."}, status=status.HTTP_400_BAD_REQUEST)
+
+        defaults = {}
+        for field in RELATED_FIELDS:
+            value = request.query_params.get(field) or (request.data.get(field) if upload is not None else None)
+            if value:
+                defaults[field] = value
+        try:
+            chunk_size = int(request.query_params.get('chunk_size', DEFAULT_CHUNK_SIZE))
+        except ValueError:
+            chunk_size = DEFAULT_CHUNK_SIZE
+        chunk_size = max(1, min(chunk_size, MAX_CHUNK_SIZE))
+        partial = request.query_params.get('partial', '').lower() in ('1', 'true', 'yes')
+
+        result = ingest_line_items(rows, request.user, defaults=defaults, chunk_size=chunk_size, partial=partial)
+        if result['errors'] and not partial:
+            return Response(result, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['post'], parser_classes=[MultiPartParser, FormParser])
+    def upload(self, request):
+        # .xlsx / .csv file with name, category, amount columns; model_id / scenario_id / period_id
+        # form fields fill rows that don't set them. Small files finish in the request (201),
+        # larger ones return a pending job (202) to poll at upload/<job id>/
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({"detail": "No file uploaded."}, status=status.HTTP_400_BAD_REQUEST)
+        defaults = {field: request.data[field] for field in RELATED_FIELDS if request.data.get(field)}
+        try:
+            job = start_import(upload, request.user, defaults=defaults, sheet=request.data.get('sheet') or None)
+        except UnsupportedFile as error:
+            return Response({"detail": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        if job.status == 'failed':
+            return Response(ImportJobSerializer(job).data, status=status.HTTP_400_BAD_REQUEST)
+        finished = job.status == 'done'
+        return Response(ImportJobSerializer(job).data, status=status.HTTP_201_CREATED if finished else status.HTTP_202_ACCEPTED)
+
+    @action(detail=False, methods=['get'], url_path=r'upload/(?P<job_id>[0-9a-f-]+)')
+    def upload_status(self, request, job_id=None):
+        job = ImportJob.objects.filter(pk=job_id, user=request.user).first()
+        if job is None:
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(ImportJobSerializer(job).data)
+
+# Assumption view
+class AssumptionView(viewsets.ModelViewSet):
+    queryset = Assumption.objects.all()
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = AssumptionModelSerializer
+    pagination_class = ForecastingPagination
+
+    def get_queryset(self):
+        queryset = Assumption.objects.owned_by(self.request.user)
+        model_id = self.request.query_params.get('model_id', None)
+        scenario_id = self.request.query_params.get('scenario_id', None)
+        if model_id is not None:
+            queryset = queryset.filter(model_id=model_id)
+        if scenario_id is not None:
+            queryset = queryset.filter(scenario_id=scenario_id)
+        return queryset.order_by('id')
+
+# Formula view
+class FormulaView(viewsets.ModelViewSet):
+    queryset = Formula.objects.all()
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = FormulaModelSerializer
+    pagination_class = ForecastingPagination
+
+    def get_queryset(self):
+        queryset = Formula.objects.owned_by(self.request.user)
+        model_id = self.request.query_params.get('model_id', None)
+        if model_id is not None:
+            queryset = queryset.filter(model_id=model_id)
+        return queryset.order_by('id')
+
+    def save_and_recompute(self, serializer, names):
+        # the formula is only kept when every cell it derives has a storable amount
+        try:
+            with transaction.atomic():
+                formula = serializer.save()
+                recompute(formula.model_id, names | {formula.name}, strict=True)
+        except FormulaError as error:
+            raise ValidationError({"expression": [str(error)]})
+
+    def perform_create(self, serializer):
+        self.save_and_recompute(serializer, set())
+
+    def perform_update(self, serializer):
+        self.save_and_recompute(serializer, {serializer.instance.name})
+
+    def perform_destroy(self, instance):
+        model_id, name = instance.model_id, instance.name
+        instance.delete()  # cascades to the formula's line items
+        recompute(model_id, {name})
+
+
+# rolling per-endpoint percentiles of this process (see forecasting/instrumentation.py)
+class InstrumentationStatsView(APIView):
+    permission_classes = [permissions.IsAuthenticated, CanReadInstrumentation]
 
+    def get(self, request):
+        if not instrumentation_enabled():
+            raise NotFound("Instrumentation is disabled.")
+        return Response({"window": window_size(), "endpoints": endpoint_stats()})
 
+    def delete(self, request):
+        reset_stats()
+        return Response(status=status.HTTP_204_NO_CONTENT)